@@ -0,0 +1,64 @@
+"""
+Benchmark: reference vs NumPy analytics engines on a synthetic EventStore.
+
+Usage:
+    python benchmarks/bench_analytics.py [--events N] [--users U]
+"""
+import argparse
+import os
+import sys
+import time
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.analytics import calculate_analytics
+from src.event_store import EventStore
+from src.timestamps import MICROS_PER_SECOND
+
+
+def make_store(n_events, n_users, seed=0):
+    """Builds alternating IN/OUT events for random users at increasing times."""
+    rng = np.random.default_rng(seed)
+    users = rng.integers(0, n_users, n_events, dtype=np.int32)
+    # Alternate IN/OUT per user by numbering each user's events
+    order = np.argsort(users, kind="stable")
+    rank = np.empty(n_events, dtype=np.int64)
+    counts = np.bincount(users, minlength=n_users)
+    rank[order] = np.arange(n_events) - np.repeat(np.cumsum(counts) - counts, counts)
+    event_types = (rank % 2).astype(np.uint8)
+    times = 1_672_531_200 * MICROS_PER_SECOND + np.cumsum(rng.integers(1, 60 * MICROS_PER_SECOND, n_events))
+
+    columns = []
+    for typecode, values in (("i", users), ("B", event_types), ("q", times)):
+        column = array(typecode)
+        column.frombytes(values.tobytes())
+        columns.append(column)
+    return EventStore([f"user-{code}" for code in range(n_users)], *columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+
+    store = make_store(args.events, args.users)
+    print(f"{args.events} events, {args.users} users")
+    timings = {}
+    for engine in ("python", "numpy"):
+        start = time.perf_counter()
+        results = calculate_analytics(store, engine=engine)
+        timings[engine] = time.perf_counter() - start
+        print(f"  {engine:<7} {timings[engine]:8.3f}s  {args.events / timings[engine] / 1e6:7.2f} M events/s")
+        if engine == "python":
+            expected = results
+        elif results != expected:
+            raise SystemExit("Engines disagree!")
+    print(f"  speed-up x{timings['python'] / timings['numpy']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
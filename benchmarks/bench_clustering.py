@@ -0,0 +1,51 @@
+"""
+Benchmark: full-batch vs mini-batch k-means, time and inertia.
+
+Usage:
+    python benchmarks/bench_clustering.py [--users N] [--features F] [--k K]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.clustering import MiniBatchKMeans, k_means_clustering
+
+
+def make_users(n_users, n_features, k, seed=0):
+    """Gaussian blobs standing in for per-user attendance features."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 20, (k, n_features))
+    return centers[rng.integers(k, size=n_users)] + rng.normal(0, 2, (n_users, n_features))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--passes", type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_users(args.users, args.features, args.k)
+    print(f"{args.users} users, {args.features} features, k={args.k}")
+
+    started = time.perf_counter()
+    full = k_means_clustering(data, args.k, seed=0)
+    print(f"  full-batch   {time.perf_counter() - started:7.2f}s  inertia {full['inertia']:.4g}  ({full['n_iter']} iterations)")
+
+    started = time.perf_counter()
+    model = MiniBatchKMeans(args.k, batch_size=args.batch_size, max_passes=args.passes, seed=0).fit(data)
+    seconds = time.perf_counter() - started
+    inertia = model.inertia(data)
+    print(f"  mini-batch   {seconds:7.2f}s  inertia {inertia:.4g}  ({model.n_passes} passes, "
+          f"{inertia / full['inertia'] - 1:+.2%} vs full)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: single-process CSV ingest vs the parallel chunked reader, in MB/s.
+
+Usage:
+    python benchmarks/bench_csv_reader.py [--rows N] [--workers W] [--gzip]
+"""
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.csv_reader import read_csv_parallel
+from src.event_store import EventStore
+
+
+def write_log(file_path, rows, seed=0):
+    """Writes a simple synthetic gate log."""
+    rng = random.Random(seed)
+    users = [f"{rng.getrandbits(128):032x}" for _ in range(1000)]
+    opener = gzip.open if file_path.endswith(".gz") else open
+    with opener(file_path, "wt", newline="") as file:
+        file.write("user_id,event_type,event_time\n")
+        for row in range(rows):
+            seconds = row * 3
+            file.write(f"{rng.choice(users)},{rng.choice(('GATE_IN', 'GATE_OUT'))},"
+                       f"2023-01-{1 + seconds // 86400 % 28:02d}T{seconds // 3600 % 24:02d}:"
+                       f"{seconds // 60 % 60:02d}:{seconds % 60:02d}.000Z\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--gzip", action="store_true", help="Benchmark a .csv.gz input.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "gate_log.csv" + (".gz" if args.gzip else ""))
+        write_log(file_path, args.rows)
+        size = os.path.getsize(file_path)
+
+        started = time.perf_counter()
+        expected = EventStore.from_csv(file_path)
+        seconds = time.perf_counter() - started
+        print(f"{args.rows} rows, {size / 1e6:.1f} MB on disk")
+        print(f"  EventStore.from_csv          {seconds:7.2f}s  {size / 1e6 / seconds:7.1f} MB/s")
+
+        store, report = read_csv_parallel(file_path, workers=args.workers, chunk_bytes=max(size // (4 * args.workers), 1))
+        print(f"  read_csv_parallel ({args.workers} workers) {report['seconds']:7.2f}s  {report['mb_per_s']:7.1f} MB/s"
+              f"  ({report['chunks']} chunks)")
+        if list(store) != list(expected):
+            raise SystemExit("Readers disagree!")
+
+
+if __name__ == "__main__":
+    main()
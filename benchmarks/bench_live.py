@@ -0,0 +1,87 @@
+"""
+Benchmark: load generator for the live service (src/live.py).
+
+Replays a synthetic gate log over TCP as fast as the service takes it, then
+reports throughput and the per-event update latency measured by the service.
+Without --port a service is started in-process on free ports.
+
+Usage:
+    python benchmarks/bench_live.py [--events N] [--port P --query-port Q]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.live import LiveAnalytics, LiveService
+from src.synthetic import iter_gate_log, options_for_events
+from src.timestamps import MICROS_PER_SECOND
+
+BATCH_LINES = 256
+
+
+async def send_lines(host, port, lines):
+    _, writer = await asyncio.open_connection(host, port)
+    for start in range(0, len(lines), BATCH_LINES):
+        writer.write("".join(lines[start:start + BATCH_LINES]).encode("utf-8"))
+        await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+
+
+async def query(host, port, command):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(command.encode("utf-8") + b"\n")
+    await writer.drain()
+    answer = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return answer
+
+
+async def run(args):
+    service = None
+    host, port, query_port = args.host, args.port, args.query_port
+    if port is None:
+        analytics = LiveAnalytics(allowed_lateness=int(args.lateness * MICROS_PER_SECOND))
+        service = await LiveService(analytics, host=host).start()
+        port, query_port = service.port, service.query_port
+
+    lines = list(iter_gate_log(**options_for_events(args.events, out_of_order_rate=args.out_of_order)))[1:]
+
+    started = time.perf_counter()
+    await send_lines(host, port, lines)
+    while True:
+        stats = await query(host, query_port, "STATS")
+        if stats["received"] + stats["invalid"] >= len(lines):
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    stats = await query(host, query_port, "FLUSH")
+    print(f"{len(lines)} events in {elapsed:.3f}s  {len(lines) / elapsed:,.0f} events/s")
+    print(f"  applied {stats['applied']}, late {stats['late']}, invalid {stats['invalid']}")
+    latency = stats["latency_ms"]
+    print(f"  update latency p50 {latency['p50']:.4f} ms  p99 {latency['p99']:.4f} ms  max {latency['max']:.3f} ms")
+    print(f"  headcount {(await query(host, query_port, 'HEADCOUNT'))['headcount']}")
+    if service is not None:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--out-of-order", type=float, default=0.01, help="Fraction of late events in the log.")
+    parser.add_argument("--lateness", type=float, default=900, help="Allowed lateness, in seconds.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Ingest port of a running service.")
+    parser.add_argument("--query-port", type=int, default=9001)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Microbenchmark: fixed-width timestamp parser vs datetime.strptime.
+
+Usage:
+    python benchmarks/bench_timestamps.py [--rows N] [--days D]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.timestamps import TIMESTAMP_FORMAT, parse_timestamp
+
+
+def make_timestamps(rows, days, seed=0):
+    """Builds realistic gate-log timestamps spread over a number of days."""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    return [
+        (start + timedelta(days=rng.randrange(days), seconds=rng.randrange(86_400))).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        for _ in range(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    values = make_timestamps(args.rows, args.days)
+    candidates = {
+        "strptime": lambda: [datetime.strptime(v, TIMESTAMP_FORMAT) for v in values],
+        "parse_timestamp": lambda: [parse_timestamp(v) for v in values],
+        "parse_timestamp(as_micros)": lambda: [parse_timestamp(v, as_micros=True) for v in values],
+    }
+
+    baseline = None
+    print(f"{args.rows} timestamps over {args.days} days (best of {args.repeat})")
+    for name, func in candidates.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        baseline = baseline or best
+        print(f"  {name:<28} {best:8.3f}s  {args.rows / best / 1e6:6.2f} M rows/s  x{baseline / best:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Scaling benchmark suite: every pipeline stage at 10^3 .. 10^8 events.
+
+Each (stage, size) is measured in a fresh process, so the recorded peak RSS
+belongs to that stage alone (including loading its input). Results are
+written as JSON and, with --baseline, compared to a stored run. Throughput
+depends on the machine, so no baseline is shipped: record one with
+--output on the machine the comparison will run on.
+
+Usage:
+    python benchmarks/run_benchmarks.py --max-events 1000000 --output baseline.json
+    python benchmarks/run_benchmarks.py --max-events 1000000 --output bench.json --baseline baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from src.synthetic import options_for_events, write_gate_log
+
+# Largest size each stage is run at; list-of-dict stages run out of memory long before 10^8
+STAGES = {
+    "load_csv": 10 ** 7,
+    "clean_data_for_user_analytics": 10 ** 7,
+    "clean_data_for_longest_session": 10 ** 7,
+    "event_store_from_csv": 10 ** 8,
+    "calculate_time_and_days[python]": 10 ** 7,
+    "calculate_longest_session[python]": 10 ** 7,
+    "calculate_analytics[numpy]": 10 ** 8,
+    "external_sort": 10 ** 8,
+    "k_means_clustering": 10 ** 8,
+    "write_rows[csv.gz]": 10 ** 7,
+}
+EVENT_FIELDS = ["user_id", "event_type", "event_time"]
+
+
+def _prepare(stage, csv_path):
+    """Loads the input a stage needs, outside of the timed region."""
+    from src.analytics import calculate_time_and_days
+    from src.data_process import clean_data_for_longest_session, clean_data_for_user_analytics, load_csv
+    from src.event_store import EventStore
+
+    if stage in ("load_csv", "event_store_from_csv"):
+        return csv_path
+    if stage.startswith("clean_data"):
+        return load_csv(csv_path)
+    if stage == "calculate_time_and_days[python]":
+        return clean_data_for_user_analytics(load_csv(csv_path))
+    if stage == "calculate_longest_session[python]":
+        return clean_data_for_longest_session(load_csv(csv_path))
+    store = EventStore.from_csv(csv_path)
+    if stage == "k_means_clustering":
+        return [[row["average_per_day"], row["days"]] for row in calculate_time_and_days(store, engine="numpy")]
+    return store
+
+
+def _run(stage, data):
+    from src.analytics import calculate_analytics, calculate_longest_session, calculate_time_and_days
+    from src.clustering import k_means_clustering
+    from src.data_process import clean_data_for_longest_session, clean_data_for_user_analytics, load_csv
+    from src.event_store import EventStore
+    from src.external_sort import external_sort
+    from src.sinks import write_rows
+
+    def sort():
+        with external_sort(data) as events:
+            return events.to_store()
+
+    def write():
+        # Stream every event through a gzip CSV sink, as the reports are written
+        rows = (dict(zip(EVENT_FIELDS, event)) for event in data)
+        with tempfile.TemporaryDirectory(prefix="office-bench-write-") as directory:
+            return write_rows(os.path.join(directory, "events.csv.gz"), rows, EVENT_FIELDS)
+
+    return {
+        "load_csv": lambda: load_csv(data),
+        "clean_data_for_user_analytics": lambda: clean_data_for_user_analytics(data),
+        "clean_data_for_longest_session": lambda: clean_data_for_longest_session(data),
+        "event_store_from_csv": lambda: EventStore.from_csv(data),
+        "calculate_time_and_days[python]": lambda: calculate_time_and_days(data),
+        "calculate_longest_session[python]": lambda: calculate_longest_session(data),
+        "calculate_analytics[numpy]": lambda: calculate_analytics(data, engine="numpy"),
+        "external_sort": sort,
+        "k_means_clustering": lambda: k_means_clustering(data, 3, seed=0),
+        "write_rows[csv.gz]": write,
+    }[stage]()
+
+
+def measure(stage, csv_path, events):
+    """Child process: time one stage and report its peak RSS."""
+    with contextlib.redirect_stdout(io.StringIO()):  # Skipped-row messages
+        data = _prepare(stage, csv_path)
+        started, cpu_started = time.perf_counter(), time.process_time()
+        _run(stage, data)
+        seconds, cpu_seconds = time.perf_counter() - started, time.process_time() - cpu_started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024
+    return {
+        "stage": stage,
+        "events": events,
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "events_per_sec": events / seconds if seconds else None,
+        "peak_rss_mb": peak_kb / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Returns human-readable regressions of events/sec against a baseline run."""
+    previous = {(row["stage"], row["events"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        before = previous.get((row["stage"], row["events"]))
+        if not before or not before["events_per_sec"] or not row["events_per_sec"]:
+            continue
+        change = row["events_per_sec"] / before["events_per_sec"] - 1
+        if change < -tolerance:
+            regressions.append(f"{row['stage']} @ {row['events']:.0e}: {change:+.1%} events/sec")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark suite for the analytics pipeline.")
+    parser.add_argument("--min-events", type=int, default=10 ** 3)
+    parser.add_argument("--max-events", type=int, default=10 ** 6)
+    parser.add_argument("--stages", nargs="*", default=list(STAGES), choices=list(STAGES))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed events/sec drop before flagging.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = []
+    size = args.min_events
+    while size <= args.max_events:
+        sizes.append(size)
+        size *= 10
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="office-bench-") as directory:
+        for events in sizes:
+            csv_path = os.path.join(directory, f"gate_log_{events}.csv")
+            rows = write_gate_log(csv_path, **options_for_events(
+                events, seed=args.seed, malformed_rate=0.001, lowercase_rate=0.05, out_of_order_rate=0.01))
+            for stage in args.stages:
+                if events > STAGES[stage]:
+                    continue
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    row = pool.apply(measure, (stage, csv_path, rows))
+                results.append(row)
+                print(f"{stage:<36} {rows:>11,} events  {row['seconds']:9.3f}s  "
+                      f"{row['events_per_sec'] or 0:>12,.0f} ev/s  {row['peak_rss_mb']:8.1f} MB")
+            os.remove(csv_path)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,331 @@
-from src.data_process import load_csv, clean_data_for_user_analytics, clean_data_for_longest_session, write_to_csv
-from src.analytics import calculate_time_and_days, calculate_longest_session
-from src.clustering import employee_clustering, save_clusters_to_csv
+import argparse
+import json
+import os
+import sys
 
-def main():
+from src.data_process import write_to_csv
+from src.instrumentation import Profiler
+from src.pipeline import ArtifactCache, Pipeline
+from src.quarantine import Quarantine
+from src.sinks import EXTENSIONS, FORMATS, AtomicFile, by_field, by_shard, partition_path
+
+# Which outputs each subcommand writes; only the stages behind them are run
+COMMANDS = {
+    "analytics": "Write the user analytics (time, days, average per day, rank).",
+    "sessions": "Write the longest work session of every user.",
+    "cluster": "Write the employee clusters.",
+    "all": "Write every report (the default when no subcommand is given).",
+}
+
+
+def cluster_count(value):
+    """--k value: a positive integer or 'auto'."""
+    if value == "auto":
+        return value
+    try:
+        k = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer or 'auto', got {value!r}") from None
+    if k < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive number of clusters, got {k}")
+    return k
+
+
+def feature_list(value):
+    """--features value: 'all' or comma-separated feature names."""
+    return value if value == "all" else tuple(name.strip() for name in value.split(",") if name.strip())
+
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv = ["all"] + argv  # `main.py --k 5` keeps meaning "run everything"
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--input", nargs="+", default=["data/datapao_homework_2023.csv"],
+                        help="Gate log to process, or several consecutive logs to combine (processed concurrently).")
+    common.add_argument("--output", default="output", metavar="DIR", help="Directory the reports are written to.")
+    common.add_argument("--format", choices=FORMATS, default="csv",
+                        help="Report format: CSV, JSON Lines or columnar (.npz, one array per field).")
+    common.add_argument("--gzip", action="store_true", help="Compress the reports.")
+    common.add_argument("--shards", type=int, default=1,
+                        help="Split the per-user reports into this many files by user_id hash, with a manifest.")
+    common.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for CSV parsing and the analytics (sharded by user_id).")
+    common.add_argument("--engine", choices=["python", "numpy"], default="numpy",
+                        help="Analytics engine; 'python' does not load NumPy.")
+    common.add_argument("--stream", action="store_true",
+                        help="Compute the analytics in one streaming pass over the CSV with the python engine, "
+                             "in memory proportional to the users rather than the events (one input, one worker).")
+    common.add_argument("--state", metavar="PATH",
+                        help="Incremental state file: apply --input as a new batch on top of it and report all batches.")
+    common.add_argument("--sort-events", action="store_true",
+                        help="Sort the events by (user_id, event_time) before the analytics, for unordered logs.")
+    common.add_argument("--sort-memory-mb", type=int, default=256, help="Memory budget of --sort-events, in MB.")
+    common.add_argument("--quarantine", metavar="PATH", help="Write rejected rows to this CSV, with the reason.")
+    common.add_argument("--strict", action="store_true",
+                        help="Fail once the fraction of rejected rows exceeds --max-error-ratio.")
+    common.add_argument("--max-error-ratio", type=float, default=0.01,
+                        help="Largest tolerated fraction of rejected rows with --strict.")
+    common.add_argument("--no-cache", action="store_true", help="Recompute every stage instead of reusing cache/.")
+    common.add_argument("--profile", action="store_true", help="Print a per-stage timing and memory table.")
+    common.add_argument("--profile-json", metavar="PATH", help="Write the per-stage instrumentation report as JSON.")
+    common.add_argument("--profile-stage", action="append", default=[], metavar="STAGE",
+                        help="Run a stage (e.g. analytics, clusters, write_user_analytics, or 'all') under a profiler.")
+    common.add_argument("--profiler", choices=["cprofile", "sampling"], default="cprofile",
+                        help="Profiler used for --profile-stage.")
+    common.add_argument("--trace-memory", action="store_true",
+                        help="Record peak Python allocations per stage with tracemalloc (slower).")
+
+    clustering = argparse.ArgumentParser(add_help=False)
+    clustering.add_argument("--k", type=cluster_count, default=3,
+                            help="Number of employee clusters, or 'auto' to pick it by silhouette over --k-range.")
+    clustering.add_argument("--k-range", nargs=2, type=int, default=[2, 15], metavar=("MIN", "MAX"),
+                            help="Candidate k values (inclusive) for --k auto.")
+    clustering.add_argument("--model", metavar="PATH",
+                            help="Saved clustering model: score users with it, or train and save one if missing.")
+    clustering.add_argument("--retrain", action="store_true",
+                            help="Retrain the --model, warm-started from its centroids (cluster ids stay the same).")
+    clustering.add_argument("--features", type=feature_list, metavar="NAMES",
+                            help="Cluster on the per-user feature matrix: 'all' of its columns or a comma-separated "
+                                 "list (e.g. arrival_mean,arrival_std,longest_session) instead of average_per_day "
+                                 "and days.")
+
+    date_range = argparse.ArgumentParser(add_help=False)
+    date_range.add_argument("--date-range", nargs=2, metavar=("START", "END"),
+                            help="Also write user analytics for sessions between two dates (YYYY-MM-DD, inclusive).")
+
+    extras = argparse.ArgumentParser(add_help=False)
+    extras.add_argument("--occupancy", action="store_true",
+                        help="Also write the peak concurrent occupancy of every day.")
+    extras.add_argument("--occupancy-by-month", action="store_true",
+                        help="Split the --occupancy report into one file per month (date=YYYY-MM), with a manifest.")
+    extras.add_argument("--approximate", action="store_true",
+                        help="Also write a sketch-based summary per input log and for the fleet "
+                             "(distinct counts, percentiles, top sessions).")
+
+    parser = argparse.ArgumentParser(description="Smart Office Analytics")
+    commands = parser.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    parents = {
+        "analytics": [common, date_range],
+        "sessions": [common],
+        "cluster": [common, clustering],
+        "all": [common, clustering, date_range, extras],
+    }
+    for name, description in COMMANDS.items():
+        commands.add_parser(name, parents=parents[name], help=description, description=description)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    command = args.command
+    output_dir = args.output
+    # Columnar reports are deflated inside the .npz, so only the other formats get a ".gz"
+    extension = EXTENSIONS[args.format] + (".gz" if args.gzip and args.format != "columnar" else "")
     config = {
-        "input_path": "data/datapao_homework_2023.csv",
+        "input_path": args.input[0] if len(args.input) == 1 else args.input,
+        "cache_dir": None if args.no_cache else "cache",
         "output_paths": {
-            "analytics": "output/user_analytics.csv",
-            "longest_session": "output/longest_session.csv",
-            "clusters": "output/employee_clusters.csv",
+            "analytics": os.path.join(output_dir, "user_analytics" + extension),
+            "longest_session": os.path.join(output_dir, "longest_session" + extension),
+            "clusters": os.path.join(output_dir, "employee_clusters" + extension),
+            "k_scores": os.path.join(output_dir, "employee_clusters_k_scores" + extension),
+            "range_analytics": os.path.join(output_dir, "user_analytics_{start}_{end}" + extension),
+            "occupancy": os.path.join(output_dir, "daily_occupancy" + extension),
+            "approximate": os.path.join(output_dir, "approximate_summary.json"),
         },
-        "clustering": {"k": 3},
+        "engine": "python" if args.stream else args.engine,
+        "workers": args.workers,
+        "clustering": {"k": getattr(args, "k", 3), "seed": 0},
+        "profile_dir": "profiles",
     }
+    clustering = command in ("cluster", "all")
+    os.makedirs(output_dir, exist_ok=True)
+
+    profiler = Profiler(
+        enabled=bool(args.profile or args.profile_json or args.profile_stage or args.trace_memory),
+        trace_memory=args.trace_memory,
+        profile_stages=args.profile_stage,
+        profiler=args.profiler,
+        profile_dir=config["profile_dir"],
+    )
+
+    quarantine = None
+    if args.quarantine or args.strict:
+        quarantine = Quarantine(args.quarantine, strict=args.strict, max_error_ratio=args.max_error_ratio)
+
+    options = {}
+    if clustering:
+        options = {"k_range": range(args.k_range[0], args.k_range[1] + 1), "model_path": args.model,
+                   "retrain": args.retrain, "features": args.features}
+    pipeline = Pipeline(
+        config["input_path"],
+        cache=ArtifactCache(config["cache_dir"]) if config["cache_dir"] else None,
+        engine=config["engine"],
+        workers=config["workers"],
+        k=config["clustering"]["k"],
+        seed=config["clustering"]["seed"],
+        profiler=profiler,
+        state_path=args.state,
+        sort_events=args.sort_events,
+        sort_memory=args.sort_memory_mb * 1024 * 1024,
+        quarantine=quarantine,
+        stream=args.stream,
+        **options,
+    )
+    saved = []  # (description, path) of every report written
+
+    # Per-user reports can be split into shards; a sharded report is a directory of parts and a manifest
+    # Compression is passed explicitly, as a columnar report's extension does not show it
+    report_options = {"compress": args.gzip}
+    per_user = {**report_options, "partition_by": by_shard("user_id", args.shards)} if args.shards > 1 \
+        else report_options
+
+    def per_user_path(path):
+        return os.path.dirname(partition_path(path, "_")) if args.shards > 1 else path
+
+    def close_quarantine():
+        if quarantine is not None:
+            report = quarantine.close()
+            print(f"Rejected {report['rejected']} of {report['rows']} rows read: {report['reasons']}")
 
     try:
-        print("Loading raw data...")
-        raw_data = load_csv(config["input_path"])
-        print(f"Loaded {len(raw_data)} rows of raw data.")
+        if command == "all":
+            print("Calculating time, days, rankings and longest work sessions...")
+            user_analytics, longest_sessions = pipeline.analytics()
+        elif command == "analytics":
+            print("Calculating time, days and rankings...")
+            user_analytics, longest_sessions = pipeline.user_analytics(), None
+        elif command == "sessions":
+            print("Calculating longest work sessions...")
+            user_analytics, longest_sessions = None, pipeline.longest_sessions()
+        else:
+            user_analytics = longest_sessions = None  # `cluster` only needs them if the clusters are not cached
+        if command != "cluster":
+            users = user_analytics if user_analytics is not None else longest_sessions
+            print(f"Processed events for {len(users)} users.")
+            close_quarantine()
     except Exception as e:
-        print(f"Error loading data: {e}")
+        print(f"Error processing raw data: {e}")
         return
 
-    try:
-        print("Cleaning data for user analytics...")
-        cleaned_data_analytics = clean_data_for_user_analytics(raw_data)
+    if user_analytics is not None:
+        try:
+            print("Saving analytics results...")
+            fieldnames_part1 = ['user_id', 'time', 'days', 'average_per_day', 'rank']
+            with profiler.stage("write_user_analytics", rows_in=len(user_analytics)):
+                write_to_csv(config["output_paths"]["analytics"], user_analytics, fieldnames_part1, **per_user)
+            print(f"User analytics saved to: {per_user_path(config['output_paths']['analytics'])}")
+            saved.append(("User analytics", per_user_path(config["output_paths"]["analytics"])))
+        except Exception as e:
+            print(f"Error processing user analytics: {e}")
+            return
 
-        print("Calculating time, days, and rankings...")
-        user_analytics = calculate_time_and_days(cleaned_data_analytics)
+    if longest_sessions is not None:
+        try:
+            print("Saving longest session results...")
+            fieldnames_part2 = ['user_id', 'session_length']
+            with profiler.stage("write_longest_session", rows_in=len(longest_sessions)):
+                write_to_csv(config["output_paths"]["longest_session"], longest_sessions, fieldnames_part2, **per_user)
+            print(f"Longest session analytics saved to: {per_user_path(config['output_paths']['longest_session'])}")
+            saved.append(("Longest session analytics", per_user_path(config["output_paths"]["longest_session"])))
+        except Exception as e:
+            print(f"Error processing longest session analytics: {e}")
+            return
 
-        print("Saving analytics results...")
-        fieldnames_part1 = ['user_id', 'time', 'days', 'average_per_day', 'rank']
-        write_to_csv(config["output_paths"]["analytics"], user_analytics, fieldnames_part1)
-        print(f"User analytics saved to: {config['output_paths']['analytics']}")
-    except Exception as e:
-        print(f"Error processing user analytics: {e}")
-        return
+    if clustering:
+        try:
+            from src.clustering import save_clusters_to_csv
 
-    try:
-        print("Cleaning data for longest session analytics...")
-        cleaned_data_session = clean_data_for_longest_session(raw_data)
+            if args.k == "auto":
+                print(f"Scoring k = {args.k_range[0]}..{args.k_range[1]} by silhouette and inertia...")
+                best_k, k_scores = pipeline.k_selection()
+                write_to_csv(config["output_paths"]["k_scores"], k_scores,
+                             ['k', 'inertia', 'silhouette', 'iterations', 'seconds', 'best', 'elbow'], **report_options)
+                print(f"Picked k = {best_k}; scores saved to: {config['output_paths']['k_scores']}")
+                saved.append(("Cluster count scores", config["output_paths"]["k_scores"]))
 
-        print("Calculating longest work sessions...")
-        longest_sessions = calculate_longest_session(cleaned_data_session)
+            print("Clustering employees...")
+            cluster_assignments = pipeline.clusters()
+            if command == "cluster":
+                close_quarantine()
 
-        print("Saving longest session results...")
-        fieldnames_part2 = ['user_id', 'session_length']
-        write_to_csv(config["output_paths"]["longest_session"], longest_sessions, fieldnames_part2)
-        print(f"Longest session analytics saved to: {config['output_paths']['longest_session']}")
-    except Exception as e:
-        print(f"Error processing longest session analytics: {e}")
-        return
+            print("Saving cluster assignments...")
+            with profiler.stage("write_clusters", rows_in=len(cluster_assignments)):
+                save_clusters_to_csv(cluster_assignments, config["output_paths"]["clusters"], **per_user)
+            print(f"Cluster assignments saved to: {per_user_path(config['output_paths']['clusters'])}")
+            saved.append(("Employee cluster assignments", per_user_path(config["output_paths"]["clusters"])))
+        except Exception as e:
+            print(f"Error clustering employees: {e}")
+            return
 
-    try:
-        print("Clustering employees...")
-        user_analytics_for_classification = load_csv(config["output_paths"]["analytics"])
-        for entry in user_analytics_for_classification:
-            entry["time"] = float(entry["time"])
-            entry["days"] = int(entry["days"])
-            entry["average_per_day"] = float(entry["average_per_day"])
-            entry["rank"] = int(entry["rank"])
-
-        cluster_assignments = employee_clustering(user_analytics_for_classification, k=config["clustering"]["k"])
-
-        print("Saving cluster assignments...")
-        save_clusters_to_csv(cluster_assignments, config["output_paths"]["clusters"])
-        print(f"Cluster assignments saved to: {config['output_paths']['clusters']}")
-    except Exception as e:
-        print(f"Error clustering employees: {e}")
-        return
+    if getattr(args, "date_range", None):
+        try:
+            start, end = args.date_range
+            print(f"Querying the daily rollup for {start} .. {end}...")
+            range_analytics = pipeline.rollup().query(start, end)
+            range_path = config["output_paths"]["range_analytics"].format(start=start, end=end)
+            with profiler.stage("write_range_analytics", rows_in=len(range_analytics)):
+                write_to_csv(range_path, range_analytics, ['user_id', 'time', 'days', 'average_per_day', 'rank'],
+                             **per_user)
+            print(f"Date-range user analytics saved to: {per_user_path(range_path)}")
+            saved.append(("Date-range user analytics", per_user_path(range_path)))
+        except Exception as e:
+            print(f"Error querying date range: {e}")
+            return
+
+    if getattr(args, "occupancy", False):
+        try:
+            print("Sweeping the occupancy index for daily peaks...")
+            daily_peaks = pipeline.occupancy().daily_peaks()
+            occupancy_path = config["output_paths"]["occupancy"]
+            by_month = {**report_options, "partition_by": by_field("date", lambda day: str(day)[:7])} \
+                if args.occupancy_by_month else report_options
+            with profiler.stage("write_occupancy", rows_in=len(daily_peaks)):
+                write_to_csv(occupancy_path, daily_peaks, ['date', 'peak', 'at'], **by_month)
+            if args.occupancy_by_month:
+                occupancy_path = os.path.dirname(partition_path(occupancy_path, "_"))
+            saved.append(("Daily peak occupancy", occupancy_path))
+        except Exception as e:
+            print(f"Error computing occupancy: {e}")
+            return
+
+    if getattr(args, "approximate", False):
+        try:
+            from src.sketches import SketchAnalytics, site_summaries
+
+            print("Feeding the events through the sketches...")
+            with profiler.stage("approximate"):
+                # One sketch per input log (site), merged into the fleet total
+                if pipeline.input_paths:
+                    # Several logs have no combined events stage: take each log's (cached) events.
+                    # Their rejected rows were already reported by the analytics.
+                    sites = {path: SketchAnalytics().update(
+                        Pipeline(path, cache=pipeline.cache, workers=args.workers,
+                                 quarantine=Quarantine(sample_limit=0)).events())
+                        for path in pipeline.input_paths}
+                else:
+                    sites = {pipeline.input_path: SketchAnalytics().update(pipeline.events())}
+                summary = site_summaries(sites)
+            with AtomicFile(config["output_paths"]["approximate"]) as file:
+                json.dump(summary, file, indent=2)
+            saved.append(("Approximate site and fleet summary", config["output_paths"]["approximate"]))
+        except Exception as e:
+            print(f"Error computing approximate analytics: {e}")
+            return
 
     print("\nSummary:")
-    print(f" - User analytics saved to: {config['output_paths']['analytics']}")
-    print(f" - Longest session analytics saved to: {config['output_paths']['longest_session']}")
-    print(f" - Employee cluster assignments saved to: {config['output_paths']['clusters']}")
+    print(f" - Stages computed: {', '.join(pipeline.computed) or 'none (all reused from cache)'}")
+    for description, path in saved:
+        print(f" - {description} saved to: {path}")
+
+    if args.profile:
+        print("\nProfile:")
+        print(profiler.summary_table())
+    if args.profile_json:
+        profiler.write_json(args.profile_json)
+        print(f" - Instrumentation report saved to: {args.profile_json}")
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,32 @@
-from .analytics import calculate_time_and_days, calculate_longest_session
-from .data_process import load_csv, clean_data_for_user_analytics, clean_data_for_longest_session ,write_to_csv
-from .clustering import employee_clustering, save_clusters_to_csv
-
-__all__ = [
-    "calculate_time_and_days",
-    "calculate_longest_session",
-    "load_csv",
-    "clean_data_for_user_analytics",
-    "clean_data_for_longest_session",
-    "write_to_csv",
-    "employee_clustering",
-    "save_clusters_to_csv"
-
-]
+import importlib
+
+# Public names and the module that defines each. They are imported on first access
+# (PEP 562), so `import src` stays cheap and NumPy is only loaded by the code that needs it.
+_EXPORTS = {
+    "calculate_time_and_days": "analytics",
+    "calculate_longest_session": "analytics",
+    "calculate_analytics": "analytics",
+    "load_csv": "data_process",
+    "stream_events": "data_process",
+    "clean_data_for_user_analytics": "data_process",
+    "clean_data_for_longest_session": "data_process",
+    "write_to_csv": "data_process",
+    "write_rows": "sinks",
+    "employee_clustering": "clustering",
+    "save_clusters_to_csv": "clustering",
+    "FeatureMatrix": "features",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,118 +1,270 @@
-from datetime import datetime, timedelta
-from collections import defaultdict
-from typing import List, Dict
+from itertools import chain
+from typing import Dict, List, Optional
 
+from .event_store import EventStore
+from .leaderboard import rank_rows, top_n
+from .timestamps import MICROS_PER_DAY, MICROS_PER_SECOND, to_epoch_micros
 
-def calculate_time_and_days(data):
+ENGINES = ("python", "numpy")
+IN_EVENTS = {"GATE_IN", "IN"}
+OUT_EVENTS = {"GATE_OUT", "OUT"}
+SESSION_BREAK = 2 * 3600 * MICROS_PER_SECOND  # Two hours, in microseconds
+
+
+def to_hours(micros):
+    """Converts a duration in microseconds to hours, as timedelta.total_seconds() / 3600 would."""
+    return micros / MICROS_PER_SECOND / 3600
+
+
+def _as_store(data):
+    """Returns the events as an EventStore, building one from event dicts or tuples if needed."""
+    if isinstance(data, EventStore):
+        return data
+    if hasattr(data, "to_store"):
+        return data.to_store()
+    store = EventStore()
+    for user_id, event_type, event_time in iter_event_tuples(data):
+        store.append(user_id, event_type, event_time)
+    return store
+
+
+def _check_engine(engine):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine: {engine!r}. Expected one of {ENGINES}.")
+
+
+def iter_event_tuples(data):
     """
-    Calculate the total time, number of days spent in the office, average time per day, and rank for each user.
+    Yields (user_id, event_type, event_time) from an EventStore, event dicts,
+    or an iterable that already yields such tuples (e.g. `external_sort`).
+    """
+    if isinstance(data, EventStore):
+        return iter(data)
+    events = iter(data)
+    first = next(events, None)
+    if first is None:
+        return iter(())
+    events = chain((first,), events)
+    if isinstance(first, tuple):
+        return events
+    return ((row['user_id'], row['event_type'], row['event_time']) for row in events)
 
-    Args:
-        data (list): List of dictionaries containing cleaned event data.
-                     Each dictionary has keys: 'user_id', 'event_type', 'event_time'.
 
-    Returns:
-        list: A list of dictionaries with keys: 
-              'user_id', 'time', 'days', 'average_per_day', 'rank'.
+class TimeAndDaysAggregator:
     """
-    # Dictionary to hold user stats
-    user_stats = defaultdict(lambda: {'time': 0, 'days': set(), 'last_in': None})
+    Incremental per-user state behind `calculate_time_and_days`.
 
-    # Process events
-    for row in data:
-        user_id = row['user_id']
-        event_type = row['event_type']
-        event_time = row['event_time']
-
-        if event_type == "GATE_IN":
-            user_stats[user_id]['last_in'] = event_time
-        elif event_type == "GATE_OUT":
-            last_in = user_stats[user_id]['last_in']
-            if last_in:
-                session_time = (event_time - last_in).total_seconds() / 3600  # Convert to hours
-                user_stats[user_id]['time'] += session_time
-                user_stats[user_id]['days'].add(last_in.date())
-                user_stats[user_id]['last_in'] = None  # Reset after calculating
-
-    # Prepare results
-    results = []
-    for user_id, stats in user_stats.items():
+    Events are fed one at a time with `add`; only a running total, the set of
+    days present and the open GATE_IN are kept per user. Times are held as
+    epoch microseconds.
+    """
+
+    def __init__(self):
+        # Dictionary to hold user stats
+        self.user_stats = {}
+
+    def add(self, user_id, event_type, event_time):
+        """Apply a single event (time as a datetime or epoch microseconds) to the user's state."""
+        if not isinstance(event_time, int):
+            event_time = to_epoch_micros(event_time)
+        stats = self.user_stats.get(user_id)
+        if stats is None:
+            stats = self.user_stats[user_id] = {'time': 0, 'days': set(), 'last_in': None}
+
+        if event_type in IN_EVENTS:
+            stats['last_in'] = event_time
+        elif event_type in OUT_EVENTS:
+            last_in = stats['last_in']
+            if last_in is not None:
+                session_time = to_hours(event_time - last_in)
+                stats['time'] += session_time
+                stats['days'].add(last_in // MICROS_PER_DAY)
+                stats['last_in'] = None  # Reset after calculating
+
+    def row(self, user_id):
+        """The analytics of one user, without the rank."""
+        stats = self.user_stats[user_id]
         total_time = stats['time']
         days_present = len(stats['days'])
         average_per_day = total_time / days_present if days_present > 0 else 0
-        results.append({
+        return {
             'user_id': user_id,
             'time': round(total_time, 2),
             'days': days_present,
             'average_per_day': round(average_per_day, 2)
-        })
+        }
+
+    def results(self, limit=None):
+        """
+        Args:
+            limit (int, optional): Only return the top `limit` users, selected with a bounded heap.
+
+        Returns:
+            list: A list of dictionaries with keys:
+                  'user_id', 'time', 'days', 'average_per_day', 'rank'.
+        """
+        results = [self.row(user_id) for user_id in self.user_stats]
+
+        # Rank users by average_per_day
+        return rank_rows(results, 'average_per_day', limit)
+
+
+class LongestSessionAggregator:
+    """
+    Incremental per-user state behind `calculate_longest_session`.
+
+    Sessions are merged under the two-hour rule as soon as they close, so a user
+    only carries the open IN, the session currently being extended and the
+    longest session seen so far.
+    """
+
+    def __init__(self):
+        self.user_state = {}
+
+    def add(self, user_id, event_type, event_time):
+        """Apply a single event (time as a datetime or epoch microseconds) to the user's state."""
+        if not isinstance(event_time, int):
+            event_time = to_epoch_micros(event_time)
+        state = self.user_state.get(user_id)
+        if state is None:
+            state = self.user_state[user_id] = {'open_in': None, 'start': None, 'end': None, 'longest': None}
+
+        if event_type in IN_EVENTS:
+            state['open_in'] = event_time
+        elif event_type in OUT_EVENTS and state['open_in'] is not None:
+            start = state['open_in']
+            state['open_in'] = None
+            if state['start'] is not None and start - state['end'] <= SESSION_BREAK:
+                # Extend the current session
+                state['end'] = event_time
+            else:
+                # Finalize the current session and start a new one
+                self._finalize(state)
+                state['start'] = start
+                state['end'] = event_time
 
-    # Rank users by average_per_day
-    results.sort(key=lambda x: x['average_per_day'], reverse=True)
-    for rank, result in enumerate(results, start=1):
-        result['rank'] = rank
+    @staticmethod
+    def _finalize(state):
+        state['longest'] = LongestSessionAggregator._longest(state)
 
-    #print(results)
-    return results
+    @staticmethod
+    def _longest(state):
+        """Longest session so far, including the one still being extended."""
+        longest = state['longest']
+        if state['start'] is not None:
+            duration = to_hours(state['end'] - state['start'])
+            if longest is None or duration > longest:
+                longest = duration
+        return longest
 
+    def results(self, limit=None):
+        """
+        Args:
+            limit (int, optional): Only return the `limit` longest, selected with a bounded heap.
 
-def calculate_longest_session(entries: List[Dict[str, str]]) -> List[Dict[str, float]]:
+        Returns:
+            List[Dict[str, float]]: List of dictionaries with 'user_id' and
+            'session_length', sorted by session length in descending order.
+        """
+        longest_sessions = []
+        for user_id, state in self.user_state.items():
+            longest = self._longest(state)
+            max_duration = longest if longest is not None else 0
+            longest_sessions.append({"user_id": user_id, "session_length": max_duration})
+
+        return top_n(longest_sessions, limit, key=lambda x: x["session_length"])
+
+
+def calculate_time_and_days(data, engine="python", limit=None):
+    """
+    Calculate the total time, number of days spent in the office, average time per day, and rank for each user.
+
+    Args:
+        data (iterable): Cleaned event data: an EventStore, or a list (or generator) of
+                         dictionaries with keys: 'user_id', 'event_type', 'event_time'.
+        engine (str): "python" (reference, event-by-event) or "numpy" (vectorized, same output).
+        limit (int, optional): Only return the top `limit` users (the first rows of the full ranking).
+
+    Returns:
+        list: A list of dictionaries with keys: 
+              'user_id', 'time', 'days', 'average_per_day', 'rank'.
+    """
+    _check_engine(engine)
+    if engine == "numpy":
+        from .vectorized import time_and_days_numpy
+        return time_and_days_numpy(_as_store(data), limit=limit)
+
+    aggregator = TimeAndDaysAggregator()
+
+    # Process events
+    for user_id, event_type, event_time in iter_event_tuples(data):
+        aggregator.add(user_id, event_type, event_time)
+
+    return aggregator.results(limit)
+
+
+def calculate_longest_session(entries: List[Dict[str, str]], engine: str = "python",
+                              limit: Optional[int] = None) -> List[Dict[str, float]]:
     """
     Calculate the longest work session for each user, considering the two-hour rule.
 
     Args:
-        entries (List[Dict[str, str]]): List of dictionaries with keys:
+        entries (List[Dict[str, str]]): EventStore, or list (or any iterable) of dictionaries with keys:
             - "user_id": User ID (str)
-            - "event_type": Either "IN" or "OUT" (str)
+            - "event_type": Either "IN"/"GATE_IN" or "OUT"/"GATE_OUT" (str)
             - "event_time": Event timestamp (datetime)
+        engine (str): "python" (reference, event-by-event) or "numpy" (vectorized, same output).
+        limit (int, optional): Only return the `limit` longest sessions.
 
     Returns:
         List[Dict[str, float]]: List of dictionaries with:
             - "user_id": User ID (str)
             - "session_length": Longest session duration in hours (float)
     """
-    user_sessions = defaultdict(list)
-
-    # Group events by user and pair IN/OUT events
-    for entry in entries:
-        user_id = entry["user_id"]
-        event_time = entry["event_time"]
-        event_type = entry["event_type"]
-
-        if event_type == "IN":
-            user_sessions[user_id].append({"start": event_time})
-        elif event_type == "OUT":
-            if user_sessions[user_id] and "start" in user_sessions[user_id][-1] and "end" not in user_sessions[user_id][-1]:
-                user_sessions[user_id][-1]["end"] = event_time
-
-    # Process sessions to respect the two-hour rule
-    longest_sessions = []
-    for user_id, sessions in user_sessions.items():
-        adjusted_sessions = []
-        current_session = None
-
-        for session in sessions:
-            if "start" in session and "end" in session:
-                if current_session and (session["start"] - current_session["end"] <= timedelta(hours=2)):
-                    # Extend the current session
-                    current_session["end"] = session["end"]
-                else:
-                    # Finalize the current session and start a new one
-                    if current_session:
-                        adjusted_sessions.append(current_session)
-                    current_session = {"start": session["start"], "end": session["end"]}
-
-        # Add the last session if it exists
-        if current_session:
-            adjusted_sessions.append(current_session)
-
-        # Calculate the longest session for this user
-        max_duration = max(
-            (s["end"] - s["start"]).total_seconds() / 3600 for s in adjusted_sessions if "end" in s
-        ) if adjusted_sessions else 0
-
-        longest_sessions.append({"user_id": user_id, "session_length": max_duration})
-
-    return sorted(longest_sessions, key=lambda x: x["session_length"], reverse=True)
+    _check_engine(engine)
+    if engine == "numpy":
+        from .vectorized import longest_session_numpy
+        return longest_session_numpy(_as_store(entries), limit=limit)
+
+    aggregator = LongestSessionAggregator()
+
+    # Pair IN/OUT events and merge sessions separated by at most two hours
+    for user_id, event_type, event_time in iter_event_tuples(entries):
+        aggregator.add(user_id, event_type, event_time)
+
+    return aggregator.results(limit)
+
+
+def calculate_analytics(events, engine="python", limit=None):
+    """
+    Compute user analytics and longest sessions in a single pass over the events.
+
+    The events are consumed once, so a generator such as
+    `data_process.stream_events` can be used and memory stays proportional
+    to the number of users rather than the number of events.
+
+    Args:
+        events (iterable): EventStore, or cleaned events with keys 'user_id', 'event_type', 'event_time'.
+        engine (str): "python" or "numpy". The numpy engine needs the events as an
+                      EventStore (one is built if a stream is given).
+        limit (int, optional): Only return the top `limit` rows of each result.
+
+    Returns:
+        tuple: (user_analytics, longest_sessions), as returned by
+               `calculate_time_and_days` and `calculate_longest_session`.
+    """
+    _check_engine(engine)
+    if engine == "numpy":
+        from .vectorized import paired_sessions, time_and_days_numpy, longest_session_numpy
+        store = _as_store(events)
+        pairs = paired_sessions(store)
+        return time_and_days_numpy(store, pairs, limit), longest_session_numpy(store, pairs, limit)
+
+    time_and_days = TimeAndDaysAggregator()
+    sessions = LongestSessionAggregator()
 
+    for user_id, event_type, event_time in iter_event_tuples(events):
+        time_and_days.add(user_id, event_type, event_time)
+        sessions.add(user_id, event_type, event_time)
 
+    return time_and_days.results(limit), sessions.results(limit)
@@ -1,103 +1,542 @@
-import random
-import math
-import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 
-def euclidean_distance(point1, point2):
-    """Calculate Euclidean distance between two points."""
-    return math.sqrt(sum((x - y) ** 2 for x, y in zip(point1, point2)))
+from .analytics import calculate_time_and_days
+from .event_store import EventStore
+from .features import FeatureMatrix
+from .sinks import AtomicFile, write_rows
+
+DISTANCE_BATCH = 65_536  # Points per block of the distance matrix
+FEATURES = ("average_per_day", "days")
+MODEL_VERSION = 1
+DEFAULT_K_RANGE = range(2, 16)
+SILHOUETTE_SAMPLE = 2000
+SILHOUETTE_BLOCK = 1 << 22  # Pairwise distances per block of the silhouette (32 MB)
+
+
+def squared_distances(data, centroids):
+    """Squared Euclidean distances between every point and every centroid (n x k)."""
+    return ((data[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+
+
+def initialize_centroids(data, k, rng):
+    """
+    k-means++ seeding: each new centroid is drawn with probability
+    proportional to the squared distance to the nearest centroid chosen so far.
+    """
+    centroids = np.empty((k, data.shape[1]))
+    centroids[0] = data[rng.integers(len(data))]
+    closest = squared_distances(data, centroids[:1])[:, 0]
+    for i in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(data), p=closest / total) if total > 0 else rng.integers(len(data))
+        centroids[i] = data[index]
+        closest = np.minimum(closest, squared_distances(data, centroids[i:i + 1])[:, 0])
+    return centroids
 
-def initialize_centroids(data, k):
-    """Randomly initialize centroids."""
-    return random.sample(data, k)
 
 def assign_clusters(data, centroids):
-    """Assign each data point to the nearest centroid."""
-    clusters = [[] for _ in centroids]
-    for point in data:
-        distances = [euclidean_distance(point, centroid) for centroid in centroids]
-        closest_centroid = distances.index(min(distances))
-        clusters[closest_centroid].append(point)
-    return clusters
-
-def calculate_new_centroids(clusters):
-    """Calculate new centroids as the mean of each cluster."""
-    return [
-        [sum(values) / len(values) for values in zip(*cluster)]
-        for cluster in clusters if cluster
-    ]
+    """
+    Assign each data point to the nearest centroid.
 
-def k_means_clustering(data, k, max_iterations=100):
+    Returns:
+        tuple: (labels, squared distance of each point to its centroid).
     """
-    Perform k-means clustering.
+    labels = np.empty(len(data), dtype=np.int64)
+    distances = np.empty(len(data))
+    for start in range(0, len(data), DISTANCE_BATCH):
+        block = squared_distances(data[start:start + DISTANCE_BATCH], centroids)
+        labels[start:start + len(block)] = block.argmin(axis=1)
+        distances[start:start + len(block)] = block[np.arange(len(block)), labels[start:start + len(block)]]
+    return labels, distances
+
+
+def calculate_new_centroids(data, labels, centroids):
+    """Calculate new centroids as the mean of each cluster; empty clusters keep their centroid."""
+    k = len(centroids)
+    counts = np.bincount(labels, minlength=k)
+    sums = np.column_stack([np.bincount(labels, weights=column, minlength=k) for column in data.T])
+    new_centroids = centroids.copy()
+    filled = counts > 0
+    new_centroids[filled] = sums[filled] / counts[filled, None]
+    return new_centroids
+
+
+def _lloyd(data, k, rng, max_iterations, tol, init=None):
+    """One k-means run from a k-means++ seed, or from the `init` centroids."""
+    centroids = initialize_centroids(data, k, rng) if init is None else np.array(init, dtype=np.float64)
+    n_iter = 0
+    for n_iter in range(1, max_iterations + 1):
+        labels, _ = assign_clusters(data, centroids)
+        new_centroids = calculate_new_centroids(data, labels, centroids)
+        shift = ((new_centroids - centroids) ** 2).sum()
+        centroids = new_centroids
+        if shift <= tol:
+            break
+    labels, distances = assign_clusters(data, centroids)
+    return centroids, labels, float(distances.sum()), n_iter
+
+
+def k_means_clustering(data, k, max_iterations=100, tol=1e-4, n_init=3, seed=None, init=None):
+    """
+    Perform k-means clustering with k-means++ initialization.
 
     Args:
-        data (list): List of data points, where each point is a list of features.
+        data (list or numpy.ndarray): Data points, where each point is a list of features.
         k (int): Number of clusters.
-        max_iterations (int): Maximum number of iterations.
+        max_iterations (int): Maximum number of iterations per run.
+        tol (float): Stop once the total squared centroid shift falls below
+                     `tol` times the mean feature variance.
+        n_init (int): Number of seeded runs; the one with the lowest inertia is kept.
+        seed (int, optional): Seed for reproducible results.
+        init (array-like, optional): k starting centroids (a warm start); a single run is made from them.
 
     Returns:
-        dict: Cluster assignments and centroids.
+        dict: 'centroids', 'clusters' (points per cluster), 'labels' (cluster
+              index of every point, in input order), 'inertia', 'n_iter' (iterations
+              of the kept run), 'n_iter_runs' (iterations of every run) and
+              'seconds' (time until all runs converged).
     """
-    if not data:
+    if len(data) == 0:
         raise ValueError("Input data is empty. Clustering cannot be performed.")
-    
+
     if k > len(data):
         raise ValueError("Number of clusters (k) cannot exceed the size of the dataset.")
-    
-    centroids = initialize_centroids(data, k)
-    for _ in range(max_iterations):
-        clusters = assign_clusters(data, centroids)
-        new_centroids = calculate_new_centroids(clusters)
-        if centroids == new_centroids:  
-            break
-        centroids = new_centroids
-    return {"centroids": centroids, "clusters": clusters}
 
-def employee_clustering(user_analytics, k=3):
+    points = np.asarray(data, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    threshold = tol * points.var(axis=0).mean()
+
+    started = time.perf_counter()
+    best, runs = None, []
+    if init is not None and len(init) != k:
+        raise ValueError(f"Expected {k} initial centroids, got {len(init)}.")
+    for _ in range(1 if init is not None else max(n_init, 1)):
+        run = _lloyd(points, k, rng, max_iterations, threshold, init)
+        runs.append(run[3])
+        if best is None or run[2] < best[2]:
+            best = run
+    centroids, labels, inertia, n_iter = best
+
+    return {
+        "centroids": centroids.tolist(),
+        "clusters": [points[labels == cluster].tolist() for cluster in range(k)],
+        "labels": labels,
+        "inertia": inertia,
+        "n_iter": n_iter,
+        "n_iter_runs": runs,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+class MiniBatchKMeans:
     """
-    Cluster employees based on attendance features.
+    Mini-batch k-means (Sculley, 2010) with bounded memory.
+
+    Each batch moves every centroid to the running mean of all points ever
+    assigned to it, so memory is O(batch_size x k) whatever the number of
+    users, and new users can be folded in with `partial_fit` as they arrive.
 
     Args:
-        user_analytics (list): List of dictionaries containing user analytics.
         k (int): Number of clusters.
+        batch_size (int): Points per batch.
+        max_passes (int): Maximum passes over the data in `fit`.
+        tol (float): `fit` stops once a pass moves the centroids by less than
+                     `tol` times the mean feature variance (total squared shift).
+        seed (int, optional): Seed for reproducible results.
+    """
 
-    Returns:
-        list: Cluster assignments.
+    def __init__(self, k, batch_size=1024, max_passes=10, tol=1e-4, seed=None):
+        self.k = k
+        self.batch_size = batch_size
+        self.max_passes = max_passes
+        self.tol = tol
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self.counts = None
+        self.n_passes = 0
+
+    def partial_fit(self, data):
+        """
+        Updates the centroids with one batch of points.
+
+        The first batch seeds the centroids with k-means++ and must hold at least k points.
+        """
+        batch = np.asarray(data, dtype=np.float64)
+        if self.centroids is None:
+            if len(batch) < self.k:
+                raise ValueError("Number of clusters (k) cannot exceed the size of the first batch.")
+            self.centroids = initialize_centroids(batch, self.k, self.rng)
+            self.counts = np.zeros(self.k)
+        if not len(batch):
+            return self
+
+        labels, _ = assign_clusters(batch, self.centroids)
+        batch_counts = np.bincount(labels, minlength=self.k)
+        sums = np.column_stack([np.bincount(labels, weights=column, minlength=self.k) for column in batch.T])
+        updated = batch_counts > 0
+        totals = self.counts[updated] + batch_counts[updated]
+        self.centroids[updated] = (
+            self.centroids[updated] * (self.counts[updated] / totals)[:, None] + sums[updated] / totals[:, None]
+        )
+        self.counts[updated] = totals
+        return self
+
+    def fit(self, data):
+        """Runs up to `max_passes` shuffled passes of mini-batches over the data."""
+        points = np.asarray(data, dtype=np.float64)
+        if len(points) == 0:
+            raise ValueError("Input data is empty. Clustering cannot be performed.")
+        if self.k > len(points):
+            raise ValueError("Number of clusters (k) cannot exceed the size of the dataset.")
+
+        threshold = self.tol * points.var(axis=0).mean()
+        if self.centroids is None:
+            # Seed with a small full k-means on a sample, which avoids poor k-means++ draws
+            sample_size = min(len(points), max(3 * self.batch_size, 3 * self.k))
+            sample = points[self.rng.choice(len(points), sample_size, replace=False)]
+            seed = int(self.rng.integers(2 ** 32))
+            self.centroids = np.asarray(k_means_clustering(sample, self.k, seed=seed)["centroids"])
+            self.counts = np.zeros(self.k)
+
+        for self.n_passes in range(1, self.max_passes + 1):
+            previous = self.centroids.copy()
+            order = self.rng.permutation(len(points))
+            for start in range(0, len(points), self.batch_size):
+                self.partial_fit(points[order[start:start + self.batch_size]])
+            if ((self.centroids - previous) ** 2).sum() <= threshold:
+                break
+        return self
+
+    def predict(self, data):
+        """Returns the index of the nearest centroid for every point."""
+        labels, _ = assign_clusters(np.asarray(data, dtype=np.float64), self.centroids)
+        return labels
+
+    def inertia(self, data):
+        """Sum of squared distances of the points to their nearest centroid."""
+        _, distances = assign_clusters(np.asarray(data, dtype=np.float64), self.centroids)
+        return float(distances.sum())
+
+
+def user_features(user_analytics, features=FEATURES):
+    """
+    The clustering features of every user as an (n_users x n_features) array.
+
+    Raises:
+        ValueError: If an entry lacks one of the features.
     """
-    # Verify input structure
     for entry in user_analytics:
-        if "average_per_day" not in entry or "days" not in entry:
+        if any(feature not in entry for feature in features):
             raise ValueError(f"Missing keys in user analytics entry: {entry}")
+    return np.array([[entry[feature] for feature in features] for entry in user_analytics],
+                    dtype=np.float64).reshape(len(user_analytics), len(features))
+
+
+def _user_ids(users):
+    """User IDs of user analytics rows or of a FeatureMatrix, in row order."""
+    return users.user_ids if isinstance(users, FeatureMatrix) else [entry["user_id"] for entry in users]
+
+
+def _group_by_cluster(user_ids, labels):
+    """Cluster assignments ({'user_id', 'cluster'} with 1-based clusters), grouped by cluster."""
+    return [
+        {"user_id": user_ids[index], "cluster": int(labels[index]) + 1}
+        for index in np.argsort(labels, kind="stable").tolist()
+    ]
+
+
+class KMeansModel:
+    """
+    A fitted k-means clustering that can be saved, reused and retrained.
+
+    Features are standardized (zero mean, unit variance, with the mean and
+    scale of the training users) before clustering, so the number of days
+    does not outweigh the hours. The model holds the centroids in that
+    scaled space, the scaling and the seed; new or updated users are
+    assigned to the nearest centroid with `predict` in vectorized blocks,
+    without retraining.
+
+    Cluster ids are kept stable: a fresh model numbers its clusters by
+    centroid (ordered by the first feature, then the next), and a model
+    retrained with `warm_start` starts from the previous centroids, so
+    cluster i of the old model stays cluster i.
 
-    # Extract features for clustering
-    data = [[entry["average_per_day"], entry["days"]] for entry in user_analytics]
+    Args:
+        centroids (array-like): k centroids in the scaled feature space.
+        mean (array-like): Feature means used for scaling.
+        scale (array-like): Feature standard deviations used for scaling.
+        seed (int, optional): Seed the model was trained with.
+        features (tuple): Names of the user analytics features, in order.
+        inertia (float, optional): Sum of squared scaled distances at training time.
+    """
+
+    def __init__(self, centroids, mean, scale, seed=None, features=FEATURES, inertia=None):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.seed = seed
+        self.features = tuple(features)
+        self.inertia = inertia
+
+    @property
+    def k(self):
+        return len(self.centroids)
+
+    @classmethod
+    def fit(cls, data, k, seed=None, warm_start=None, features=FEATURES, **options):
+        """
+        Trains a model on a feature matrix.
+
+        Args:
+            data (array-like): Features per user (see `user_features`).
+            k (int): Number of clusters.
+            seed (int, optional): Seed for reproducible results.
+            warm_start (KMeansModel, optional): Previous model with the same k; training starts
+                from its centroids and keeps its cluster ids.
+            features (tuple): Names of the features.
+            **options: Passed to `k_means_clustering`.
+
+        Returns:
+            KMeansModel: The trained model.
+        """
+        points = np.asarray(data, dtype=np.float64)
+        if len(points) == 0:
+            raise ValueError("Input data is empty. Clustering cannot be performed.")
+        mean = points.mean(axis=0)
+        scale = points.std(axis=0)
+        scale[scale == 0] = 1.0
+        scaled = (points - mean) / scale
+
+        init = None
+        if warm_start is not None:
+            if warm_start.k != k:
+                raise ValueError(f"Cannot warm-start {k} clusters from a model with {warm_start.k}.")
+            init = (warm_start.centroids * warm_start.scale + warm_start.mean - mean) / scale
+        result = k_means_clustering(scaled, k, seed=seed, init=init, **options)
+        centroids = np.asarray(result["centroids"])
+        if init is None:
+            raw = centroids * scale + mean
+            centroids = centroids[np.lexsort(raw.T[::-1])]
+        return cls(centroids, mean, scale, seed=seed, features=features, inertia=result["inertia"])
+
+    def transform(self, data):
+        """Scales raw features like the training data."""
+        return (np.asarray(data, dtype=np.float64) - self.mean) / self.scale
+
+    def predict(self, data):
+        """0-based cluster index of every row of raw features, computed in vectorized blocks."""
+        labels, _ = assign_clusters(self.transform(data), self.centroids)
+        return labels
+
+    def assign(self, user_analytics):
+        """Cluster assignments of user analytics rows (or a FeatureMatrix), as returned by `employee_clustering`."""
+        if isinstance(user_analytics, FeatureMatrix):
+            data = user_analytics.select(self.features).values
+        else:
+            data = user_features(user_analytics, self.features)
+        return _group_by_cluster(_user_ids(user_analytics), self.predict(data))
+
+    def save(self, file_path):
+        """Writes the model as a small JSON file, through a temporary file and a rename."""
+        model = {
+            "version": MODEL_VERSION,
+            "features": list(self.features),
+            "seed": self.seed,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "centroids": self.centroids.tolist(),
+            "inertia": self.inertia,
+        }
+        with AtomicFile(file_path) as file:
+            json.dump(model, file, indent=2)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Reads a model written by `save`.
+
+        Raises:
+            ValueError: If the file was written by an incompatible version.
+        """
+        with open(file_path, encoding="utf-8") as file:
+            model = json.load(file)
+        if model.get("version") != MODEL_VERSION:
+            raise ValueError(f"Unsupported clustering model version: {model.get('version')!r}")
+        return cls(model["centroids"], model["mean"], model["scale"], seed=model["seed"],
+                   features=model["features"], inertia=model["inertia"])
+
+
+def silhouette_score(data, labels, sample_size=SILHOUETTE_SAMPLE, seed=None):
+    """
+    Mean silhouette coefficient, on a random sample of points when there are more than `sample_size`.
+
+    The exact score needs all n^2 pairwise distances; on a sample it costs
+    O(sample_size^2) whatever the number of users. Distances are computed in
+    blocks of rows (`SILHOUETTE_BLOCK` distances at most) as
+    |a|^2 + |b|^2 - 2 a.b, one matrix product instead of an n x n x d array,
+    and summed per cluster with another.
+
+    Args:
+        data (array-like): Data points.
+        labels (array-like): Cluster index of every point.
+        sample_size (int, optional): Points to score; None scores all of them.
+        seed (int, optional): Seed of the sample.
+
+    Returns:
+        float: Between -1 and 1 (higher is better); 0 if there are fewer than two clusters.
+    """
+    points = np.asarray(data, dtype=np.float64)
+    labels = np.asarray(labels)
+    if sample_size is not None and len(points) > sample_size:
+        sample = np.random.default_rng(seed).choice(len(points), sample_size, replace=False)
+        points, labels = points[sample], labels[sample]
+    clusters, labels = np.unique(labels, return_inverse=True)
+    if len(clusters) < 2:
+        return 0.0
+
+    members = np.zeros((len(points), len(clusters)))
+    members[np.arange(len(points)), labels] = 1
+    norms = (points ** 2).sum(axis=1)
+    sums = np.empty((len(points), len(clusters)))  # Total distance from every point to each cluster
+    rows = max(1, SILHOUETTE_BLOCK // len(points))
+    for start in range(0, len(points), rows):
+        block = slice(start, start + rows)
+        squared = norms[block, None] + norms[None, :] - 2 * (points[block] @ points.T)
+        squared[np.arange(len(squared)), np.arange(start, start + len(squared))] = 0  # Exactly 0 to itself
+        sums[block] = np.sqrt(np.maximum(squared, 0)) @ members
+    counts = members.sum(axis=0)
+
+    own = np.arange(len(points)), labels
+    own_size = counts[labels] - 1
+    a = np.divide(sums[own], own_size, out=np.zeros(len(points)), where=own_size > 0)
+    means = sums / counts
+    means[own] = np.inf
+    b = means.min(axis=1)
+    scores = np.where(own_size > 0, (b - a) / np.maximum(np.maximum(a, b), 1e-300), 0.0)
+    return float(scores.mean())
+
+
+def _score_k(data, k, n_init, seed, sample_size):
+    """Worker: the best of `n_init` seeded k-means runs for one k, with its scores."""
+    result = k_means_clustering(data, k, n_init=n_init, seed=None if seed is None else [seed, k])
+    return {
+        "k": k,
+        "inertia": result["inertia"],
+        "silhouette": silhouette_score(data, result["labels"], sample_size, seed),
+        "iterations": result["n_iter"],
+        "seconds": result["seconds"],
+    }
+
+
+def _elbow(table):
+    """k at the elbow of the inertia curve: the point farthest from the line joining its ends."""
+    if len(table) < 3:
+        return table[0]["k"]
+    ks = np.array([row["k"] for row in table], dtype=np.float64)
+    inertia = np.array([row["inertia"] for row in table])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertia - inertia[-1]) / ((inertia[0] - inertia[-1]) or 1.0)
+    return int(ks[np.argmax(np.abs(1 - x - y))])
+
+
+def choose_k(data, k_values=DEFAULT_K_RANGE, n_init=3, seed=0, workers=None, sample_size=SILHOUETTE_SAMPLE):
+    """
+    Picks the number of clusters by scoring a range of k, one k per worker process.
+
+    Every k gets `n_init` seeded k-means++ restarts (the best inertia is
+    kept) and is scored by its inertia and a sampled `silhouette_score`. The
+    best k has the highest silhouette (the smallest k on ties); the elbow of
+    the inertia curve is reported alongside.
+
+    Args:
+        data (array-like): Data points, e.g. `user_features(user_analytics)`.
+        k_values (iterable): Candidate k values; those above the number of points are skipped.
+        n_init (int): Seeded restarts per k.
+        seed (int, optional): Seed of the restarts and silhouette samples.
+        workers (int, optional): Worker processes (defaults to the CPU count); 1 runs in this process.
+        sample_size (int, optional): Points sampled for the silhouette.
+
+    Returns:
+        tuple: (best_k, table), where table has one row per k with 'k', 'inertia',
+               'silhouette', 'iterations', 'seconds', 'best' and 'elbow'.
+    """
+    points = np.asarray(data, dtype=np.float64)
+    k_values = [k for k in k_values if 2 <= k <= len(points)]
+    if not k_values:
+        raise ValueError("No candidate k between 2 and the number of points.")
+
+    tasks = [(points, k, n_init, seed, sample_size) for k in k_values]
+    if workers == 1:
+        table = [_score_k(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            table = list(pool.map(_score_k, *zip(*tasks)))
+
+    best_k = max(table, key=lambda row: (row["silhouette"], -row["k"]))["k"]
+    elbow_k = _elbow(table)
+    for row in table:
+        row["best"] = row["k"] == best_k
+        row["elbow"] = row["k"] == elbow_k
+    return best_k, table
+
+
+def employee_clustering(user_analytics, k=3, seed=None, method="full", batch_size=1024, passes=10, profiler=None):
+    """
+    Cluster employees based on attendance features.
+
+    Args:
+        user_analytics (list, EventStore or FeatureMatrix): List of dictionaries containing user
+            analytics, an EventStore from which they are calculated, or a `FeatureMatrix`,
+            which is clustered directly on its standardized columns.
+        k (int): Number of clusters.
+        seed (int, optional): Seed for reproducible clusters.
+        method (str): "full" (batch k-means) or "minibatch" (`MiniBatchKMeans`, for very large populations).
+        batch_size (int): Users per mini-batch when method is "minibatch".
+        passes (int): Maximum passes over the users when method is "minibatch".
+        profiler (Profiler, optional): Receives iteration counts and convergence time under "kmeans".
+
+    Returns:
+        list: Cluster assignments ({'user_id', 'cluster'}), grouped by cluster.
+    """
+    if isinstance(user_analytics, EventStore):
+        user_analytics = calculate_time_and_days(user_analytics)
+
+    # Verify input structure and extract features for clustering
+    if isinstance(user_analytics, FeatureMatrix):
+        data = user_analytics.standardized().values
+    else:
+        data = user_features(user_analytics)
 
     # Perform clustering
-    clustering_result = k_means_clustering(data, k)
-
-    # Map employees to clusters
-    cluster_assignments = []
-    for cluster_id, cluster in enumerate(clustering_result["clusters"]):
-        for point in cluster:
-            employee = next(
-                (e for e in user_analytics if [e["average_per_day"], e["days"]] == point),
-                None,
-            )
-            if employee:
-                cluster_assignments.append({
-                    "user_id": employee["user_id"],
-                    "cluster": cluster_id + 1
-                })
-
-    return cluster_assignments
-
-
-def save_clusters_to_csv(cluster_assignments, output_path):
-    """Save cluster assignments to a CSV file."""
-    with open(output_path, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["user_id", "cluster"])
-        writer.writeheader()
-        writer.writerows(cluster_assignments)
+    if method == "minibatch":
+        if not len(data):
+            raise ValueError("Input data is empty. Clustering cannot be performed.")
+        started = time.perf_counter()
+        model = MiniBatchKMeans(k, batch_size=batch_size, max_passes=passes, seed=seed).fit(data)
+        labels = model.predict(data)
+        if profiler is not None:
+            profiler.record("kmeans", method=method, users=len(data), passes=model.n_passes,
+                            convergence_seconds=time.perf_counter() - started)
+    elif method == "full":
+        result = k_means_clustering(data, k, seed=seed)
+        labels = result["labels"]
+        if profiler is not None:
+            profiler.record("kmeans", method=method, users=len(data), iterations=result["n_iter"],
+                            iterations_per_run=result["n_iter_runs"], inertia=result["inertia"],
+                            convergence_seconds=result["seconds"])
+    else:
+        raise ValueError(f"Unknown clustering method: {method!r}. Expected 'full' or 'minibatch'.")
+
+    # Map employees to clusters through the per-point labels
+    return _group_by_cluster(_user_ids(user_analytics), labels)
+
+
+def save_clusters_to_csv(cluster_assignments, output_path, **options):
+    """Save cluster assignments to a CSV file, atomically; `options` are passed to `sinks.write_rows`."""
+    return write_rows(output_path, cluster_assignments, ["user_id", "cluster"], **options)
 
 
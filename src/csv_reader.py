@@ -0,0 +1,155 @@
+import csv
+import gzip
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .data_process import iter_normalized
+from .event_store import EventStore
+from .quarantine import Quarantine, discard_rejections
+
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+
+def _parse_lines(text, fieldnames):
+    """
+    Parses header-less CSV text into an EventStore, skipping invalid rows.
+
+    Returns:
+        tuple: (store, rejections), where rejections is the `Quarantine.tracked` file of
+               the chunk, merged into the caller's sink by `read_csv_parallel`.
+    """
+    store = EventStore()
+    append = store.append
+    quarantine = Quarantine(sample_limit=0)
+    quarantine.track()
+    reader = csv.DictReader(io.StringIO(text, newline=""), fieldnames=fieldnames)
+    for user_id, event_type, event_time in iter_normalized(reader, as_micros=True, quarantine=quarantine):
+        append(user_id, event_type, event_time)
+    return store, quarantine.tracked()
+
+
+def _parse_range(file_path, start, end, fieldnames):
+    """Worker: parse the newline-aligned byte range [start, end) of a plain CSV file."""
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return _parse_lines(data.decode("utf-8"), fieldnames)
+
+
+def _read_header(file):
+    """The field names and the length of the header line; an empty file has no fields and no rows."""
+    header = file.readline()
+    if not header:
+        return [], 0
+    return next(csv.reader([header.decode("utf-8") if isinstance(header, bytes) else header])), len(header)
+
+
+def chunk_ranges(file_path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Splits a CSV file into byte ranges that start and end on line boundaries.
+
+    Args:
+        file_path (str): Path to an uncompressed CSV file.
+        chunk_bytes (int): Approximate size of each range.
+
+    Returns:
+        tuple: (fieldnames, ranges), where ranges is a list of (start, end) offsets
+               covering every data line after the header exactly once (both empty
+               for an empty file).
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as file:
+        fieldnames, offset = _read_header(file)
+        ranges = []
+        while offset < size:
+            file.seek(min(offset + chunk_bytes, size))
+            file.readline()  # Advance to the end of the line the target falls in
+            end = min(file.tell(), size)
+            ranges.append((offset, end))
+            offset = end
+    return fieldnames, ranges
+
+
+def _iter_text_blocks(file_path, chunk_bytes):
+    """Streams a gzip-compressed CSV as (fieldnames, blocks of whole lines)."""
+    with gzip.open(file_path, "rt", encoding="utf-8", newline="") as file:
+        fieldnames, _ = _read_header(file)
+        yield fieldnames
+        while True:
+            block = file.read(chunk_bytes)
+            if not block:
+                return
+            if not block.endswith("\n"):
+                block += file.readline()
+            yield block
+
+
+def read_csv_parallel(file_path, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES, quarantine=None):
+    """
+    Reads and cleans a gate log into an EventStore using several processes.
+
+    Plain files are split into newline-aligned byte ranges, each parsed by a
+    worker with the header propagated. `.gz` files are decompressed as a
+    stream in this process, and blocks of whole lines are handed to the
+    workers, with at most two blocks per worker in flight. Per-chunk stores
+    are concatenated in file order, so the result is identical to
+    `EventStore.from_csv`. Fields must not contain embedded newlines.
+
+    Workers write their rejected rows to a temporary file returned with their
+    chunk; they are merged into `quarantine` in file order, so the quarantine file,
+    the counts and the strict check (per chunk) are those of a serial read.
+
+    Args:
+        file_path (str): Path to a `.csv` or `.csv.gz` file.
+        workers (int, optional): Worker processes (defaults to the CPU count).
+        chunk_bytes (int): Approximate size of each chunk, before decompression for plain files.
+        quarantine (Quarantine, optional): Sink for the rejected rows, closed by the caller.
+            By default a sink that prints a sample and a summary line is used.
+
+    Returns:
+        tuple: (store, report), where report holds 'bytes' (on disk), 'rows',
+               'chunks', 'seconds' and 'mb_per_s'.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    sink = quarantine if quarantine is not None else Quarantine()
+    stores, pending = [], []
+
+    def collect(future):
+        store, rejections = future.result()
+        sink.merge(rejections, remove=True)  # Raises QuarantineError in strict mode once too many rows were rejected
+        stores.append(store)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            if str(file_path).endswith(".gz"):
+                blocks = _iter_text_blocks(file_path, chunk_bytes)
+                fieldnames = next(blocks)
+                for block in blocks:
+                    pending.append(executor.submit(_parse_lines, block, fieldnames))
+                    if len(pending) >= 2 * workers:
+                        collect(pending.pop(0))
+            else:
+                fieldnames, ranges = chunk_ranges(file_path, chunk_bytes)
+                pending = [executor.submit(_parse_range, file_path, start, end, fieldnames) for start, end in ranges]
+            while pending:
+                collect(pending.pop(0))
+        except BaseException:
+            discard_rejections(pending)
+            raise
+    if quarantine is None:
+        sink.close()
+
+    store = EventStore.concatenate(stores)
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(file_path)
+    report = {
+        "bytes": size,
+        "rows": len(store),
+        "chunks": len(stores),
+        "seconds": seconds,
+        "mb_per_s": size / 1e6 / seconds if seconds else 0.0,
+    }
+    return store, report
@@ -1,5 +1,27 @@
 import csv
-from datetime import datetime
+import gzip
+
+from .quarantine import InvalidRowError, Quarantine
+from .sinks import write_rows
+from .timestamps import parse_timestamp
+
+VALID_EVENT_TYPES = {"GATE_IN", "GATE_OUT"}
+
+
+def iter_csv(file_path):
+    """
+    Lazily yields raw rows from a CSV file.
+
+    Args:
+        file_path (str): Path to the CSV file; `.gz` files are decompressed on the fly.
+
+    Yields:
+        dict: One row of the CSV keyed by the header.
+    """
+    opener = gzip.open if str(file_path).endswith(".gz") else open
+    with opener(file_path, mode='rt', encoding='utf-8', newline='') as file:
+        yield from csv.DictReader(file)
+
 
 def load_csv(file_path):
     """
@@ -11,99 +33,155 @@ def load_csv(file_path):
     Returns:
         list: List of rows as dictionaries from the CSV.
     """
-    data = []
-    with open(file_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            data.append(row)
-    return data
+    return list(iter_csv(file_path))
 
 
-def clean_data_for_user_analytics(data):
+def normalize_row(row, as_micros=False):
     """
-    Cleans raw data for user analytics.
+    Validates a raw row and normalizes its fields.
 
     Args:
-        data (list): List of dictionaries with raw data.
+        row (dict): Raw row with 'user_id', 'event_type' and 'event_time'.
+        as_micros (bool): Parse the event time to epoch microseconds instead of a datetime.
 
     Returns:
-        list: Cleaned data suitable for user analytics calculations.
+        tuple: (user_id, event_type, event_time) with the event type upper-cased
+               ("GATE_IN" or "GATE_OUT") and the event time parsed.
+
+    Raises:
+        InvalidRowError: A ValueError whose `reason` is "empty_user", "unknown_event_type"
+            or "bad_timestamp".
     """
-    cleaned_data = []
+    user_id = row.get("user_id", "").strip()
+    event_type = row.get("event_type", "").strip().upper()
+
+    # Validate required fields
+    if not user_id:
+        raise InvalidRowError("empty_user")
+    if event_type not in VALID_EVENT_TYPES:
+        raise InvalidRowError("unknown_event_type")
+    try:
+        event_time = parse_timestamp(row.get("event_time", ""), as_micros=as_micros)
+    except (ValueError, TypeError) as e:
+        raise InvalidRowError("bad_timestamp", str(e)) from None
+
+    return user_id, event_type, event_time
+
+
+def iter_normalized(data, as_micros=False, quarantine=None):
+    """
+    Validates raw rows one at a time, handing invalid ones to a rejection sink.
+
+    Args:
+        data (iterable): Raw rows as dictionaries, e.g. from `iter_csv`.
+        as_micros (bool): Parse event times to epoch microseconds instead of datetimes.
+        quarantine (Quarantine, optional): Sink for the rejected rows, closed by the caller.
+            By default a sink that prints a sample and a summary line is used.
+
+    Yields:
+        tuple: (user_id, event_type, event_time), see `normalize_row`.
+    """
+    sink = quarantine if quarantine is not None else Quarantine()
+    accept, reject = sink.accept, sink.reject
     for row in data:
         try:
-            user_id = row.get("user_id", "").strip()
-            event_type = row.get("event_type", "").strip().upper()
-            event_time = datetime.strptime(row.get("event_time", ""), "%Y-%m-%dT%H:%M:%S.%fZ")
-
-            # Validate required fields
-            if not user_id or event_type not in {"GATE_IN", "GATE_OUT"}:
-                raise ValueError("Invalid row data")
-
-            cleaned_data.append({
-                "user_id": user_id,
-                "event_type": event_type,
-                "event_time": event_time
-            })
+            event = normalize_row(row, as_micros)
         except Exception as e:
-            print(f"Skipping invalid row: {row} | Error: {e}")
-    return cleaned_data
+            reject(row, e)
+            continue
+        accept()
+        yield event
+    if quarantine is None:
+        sink.close()
+
+
+def iter_events(data, quarantine=None):
+    """
+    Cleans raw rows one at a time, so a whole log never has to sit in memory.
+
+    Every row is validated and its timestamp parsed exactly once; the resulting
+    events feed both analytics (see `analytics.calculate_analytics`).
 
+    Args:
+        data (iterable): Raw rows as dictionaries, e.g. from `iter_csv`.
+        quarantine (Quarantine, optional): Sink for the rejected rows, see `iter_normalized`.
+
+    Yields:
+        dict: Cleaned event with keys 'user_id', 'event_type' ("GATE_IN"/"GATE_OUT")
+              and 'event_time' (datetime).
+    """
+    for user_id, event_type, event_time in iter_normalized(data, quarantine=quarantine):
+        yield {
+            "user_id": user_id,
+            "event_type": event_type,
+            "event_time": event_time
+        }
 
 
-def clean_data_for_longest_session(data):
+def stream_events(file_path, quarantine=None):
     """
-    Cleans raw data for longest session calculations.
+    Reads and cleans a gate log in a single streaming pass.
+
+    Args:
+        file_path (str): Path to the raw CSV file.
+        quarantine (Quarantine, optional): Sink for the rejected rows, see `iter_normalized`.
+
+    Yields:
+        dict: Cleaned events, as produced by `iter_events`.
+    """
+    return iter_events(iter_csv(file_path), quarantine=quarantine)
+
+
+def clean_data_for_user_analytics(data, quarantine=None):
+    """
+    Cleans raw data for user analytics.
 
     Args:
         data (list): List of dictionaries with raw data.
+        quarantine (Quarantine, optional): Sink for the rejected rows, see `iter_normalized`.
 
     Returns:
-        list: Cleaned data suitable for longest session calculations.
+        list: Cleaned data suitable for user analytics calculations.
     """
-    cleaned_data = []
-    for row in data:
-        try:
-            user_id = row.get("user_id", "").strip()
-            event_type = row.get("event_type", "").strip().upper()
-            event_time_str = row.get("event_time", "")
+    return list(iter_events(data, quarantine=quarantine))
 
-            # Validate user_id and event_type
-            if not user_id or event_type not in {"GATE_IN", "GATE_OUT"}:
-                continue  # Skip invalid rows
 
-            # Normalize event type
-            event_type = "IN" if event_type == "GATE_IN" else "OUT"
+def clean_data_for_longest_session(data, quarantine=None):
+    """
+    Cleans raw data for longest session calculations.
 
-            # Parse event_time (lenient validation)
-            try:
-                event_time = datetime.strptime(event_time_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-            except ValueError:
-                continue  # Skip rows with invalid timestamps
+    Rows are rejected exactly as in `clean_data_for_user_analytics`.
 
-            cleaned_data.append({
-                "user_id": user_id,
-                "event_type": event_type,
-                "event_time": event_time,
-            })
+    Args:
+        data (list): List of dictionaries with raw data.
+        quarantine (Quarantine, optional): Sink for the rejected rows, see `iter_normalized`.
 
-        except Exception as e:
-            # Log unexpected errors
-            print(f"Skipping invalid row (longest_session): {row} | Error: {e}")
+    Returns:
+        list: Cleaned data suitable for longest session calculations.
+    """
+    cleaned_data = []
+    for user_id, event_type, event_time in iter_normalized(data, quarantine=quarantine):
+        # Normalize event type
+        cleaned_data.append({
+            "user_id": user_id,
+            "event_type": "IN" if event_type == "GATE_IN" else "OUT",
+            "event_time": event_time,
+        })
 
     return cleaned_data
 
 
-def write_to_csv(file_path, data, fieldnames):
+def write_to_csv(file_path, data, fieldnames, **options):
     """
-    Writes processed data to a CSV file.
+    Writes processed data to a CSV file, atomically (see `sinks.write_rows`).
 
     Args:
-        file_path (str): Path to the CSV file.
-        data (list): List of dictionaries to write to the file.
+        file_path (str): Path to the CSV file; a `.gz` file is gzip-compressed.
+        data (iterable): Dictionaries to write to the file; a generator is streamed.
         fieldnames (list): List of column headers for the CSV.
+        **options: Passed to `sinks.write_rows`, e.g. `format` or `partition_by`.
+
+    Returns:
+        int: Number of rows written.
     """
-    with open(file_path, mode='w', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
\ No newline at end of file
+    return write_rows(file_path, data, fieldnames, **options)
@@ -0,0 +1,236 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .data_process import iter_csv, iter_normalized
+from .timestamps import to_epoch_micros
+
+EVENT_IN = 0
+EVENT_OUT = 1
+EVENT_NAMES = ("GATE_IN", "GATE_OUT")
+EVENT_CODES = {"GATE_IN": EVENT_IN, "IN": EVENT_IN, "GATE_OUT": EVENT_OUT, "OUT": EVENT_OUT}
+
+# File layout: header, "\n"-joined user table padded to 8 bytes, then the
+# times (int64), users (int32) and event types (uint8) columns.
+_MAGIC = b"EVSTORE1"
+_HEADER = struct.Struct("=8scxxxxxxxQQQ")
+_BYTEORDER = b"<" if sys.byteorder == "little" else b">"
+
+
+def _padding(size):
+    return -size % 8
+
+
+class EventStore:
+    """
+    Compact columnar storage for cleaned gate events.
+
+    Events are held as three parallel columns instead of one dict per event:
+    `users` (int32 codes into the `user_ids` table, assigned in order of first
+    appearance), `event_types` (uint8, `EVENT_IN` or `EVENT_OUT`) and `times`
+    (int64 microseconds since the Unix epoch). That is 13 bytes per event.
+
+    A store can be passed anywhere a list of cleaned events is accepted
+    (`calculate_time_and_days`, `calculate_longest_session`, `calculate_analytics`,
+    `employee_clustering`), and saved to a binary file that `load` maps back
+    into memory without parsing the CSV again.
+    """
+
+    def __init__(self, user_ids=None, users=None, event_types=None, times=None):
+        self.user_ids = list(user_ids) if user_ids is not None else []
+        self.users = users if users is not None else array("i")
+        self.event_types = event_types if event_types is not None else array("B")
+        self.times = times if times is not None else array("q")
+        self._codes = {user_id: code for code, user_id in enumerate(self.user_ids)}
+        self._mmap = None
+
+    @classmethod
+    def from_events(cls, events):
+        """
+        Builds a store from cleaned events.
+
+        Args:
+            events (iterable): Dictionaries with 'user_id', 'event_type' and 'event_time'
+                               (datetime or epoch microseconds), e.g. from `stream_events`.
+
+        Returns:
+            EventStore: The populated store.
+        """
+        store = cls()
+        for event in events:
+            store.append(event["user_id"], event["event_type"], event["event_time"])
+        return store
+
+    @classmethod
+    def from_csv(cls, file_path, quarantine=None):
+        """
+        Reads and cleans a raw gate log straight into a store.
+
+        Timestamps are parsed directly to epoch microseconds; invalid rows are
+        skipped exactly as in `clean_data_for_user_analytics`.
+
+        Args:
+            file_path (str): Path to the raw CSV file.
+            quarantine (Quarantine, optional): Sink for the rejected rows, see `iter_normalized`.
+
+        Returns:
+            EventStore: The populated store.
+        """
+        store = cls()
+        append = store.append
+        for user_id, event_type, event_time in iter_normalized(iter_csv(file_path), True, quarantine):
+            append(user_id, event_type, event_time)
+        return store
+
+    @classmethod
+    def concatenate(cls, stores):
+        """
+        Concatenates stores, re-coding users into one shared table.
+
+        The first store's columns are adopted as-is (no copy) when they are
+        appendable arrays; the others are appended with their user codes remapped.
+
+        Args:
+            stores (iterable): EventStores in event order.
+
+        Returns:
+            EventStore: A store with all events.
+        """
+        stores = list(stores)
+        if not stores:
+            return cls()
+        first = stores[0]
+        if first._mmap is None and all(isinstance(column, array) for column in (first.users, first.event_types, first.times)):
+            result = cls(first.user_ids, first.users, first.event_types, first.times)
+        else:
+            result = cls(first.user_ids, array("i", first.users), array("B", first.event_types), array("q", first.times))
+
+        for store in stores[1:]:
+            mapping = [result.user_code(user_id) for user_id in store.user_ids]
+            result.users.extend(map(mapping.__getitem__, store.users))
+            result.event_types.extend(store.event_types)
+            result.times.extend(store.times)
+        return result
+
+    def user_code(self, user_id):
+        """Returns the interned code of a user, assigning a new one if needed."""
+        code = self._codes.get(user_id)
+        if code is None:
+            code = self._codes[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return code
+
+    def append(self, user_id, event_type, event_time):
+        """
+        Appends a single event.
+
+        Args:
+            user_id (str): User ID.
+            event_type (str): "GATE_IN"/"IN" or "GATE_OUT"/"OUT".
+            event_time (datetime or int): Timestamp, or epoch microseconds.
+        """
+        if self._mmap is not None:
+            raise ValueError("Cannot append to a memory-mapped event store.")
+        if not isinstance(event_time, int):
+            event_time = to_epoch_micros(event_time)
+        self.users.append(self.user_code(user_id))
+        self.event_types.append(EVENT_CODES[event_type])
+        self.times.append(event_time)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        """Yields (user_id, event_type, event_time) tuples, with times in epoch microseconds."""
+        user_ids = self.user_ids
+        for code, event_type, event_time in zip(self.users, self.event_types, self.times):
+            yield user_ids[code], EVENT_NAMES[event_type], event_time
+
+    def save(self, file_path):
+        """
+        Writes the store to a binary file that `load` can memory-map.
+
+        Args:
+            file_path (str): Destination path.
+        """
+        user_table = "\n".join(self.user_ids).encode("utf-8")
+        with open(file_path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _BYTEORDER, len(self), len(self.user_ids), len(user_table)))
+            file.write(user_table + b"\0" * _padding(len(user_table)))
+            for column in (self.times, self.users, self.event_types):
+                file.write(memoryview(column).cast("B"))
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Memory-maps a store written by `save`.
+
+        The columns are read-only views over the file, so loading is
+        independent of the number of events; only the user table is decoded.
+
+        Args:
+            file_path (str): Path of the saved store.
+
+        Returns:
+            EventStore: A read-only store backed by the file.
+
+        Raises:
+            ValueError: If the file is not an event store written on this platform.
+        """
+        with open(file_path, "rb") as file:
+            header = file.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f"Not an event store: {file_path}")
+            magic, byteorder, n_events, n_users, table_size = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError(f"Not an event store: {file_path}")
+            if byteorder != _BYTEORDER:
+                raise ValueError(f"Event store {file_path} was written with a different byte order.")
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = _HEADER.size
+        view = memoryview(buffer)
+        user_table = bytes(view[offset:offset + table_size]).decode("utf-8")
+        offset += table_size + _padding(table_size)
+
+        columns = []
+        for typecode, itemsize in (("q", 8), ("i", 4), ("B", 1)):
+            size = n_events * itemsize
+            columns.append(view[offset:offset + size].cast(typecode))
+            offset += size
+        times, users, event_types = columns
+
+        store = cls(user_table.split("\n") if n_users else [], users, event_types, times)
+        store._mmap = buffer
+        return store
+
+
+def load_event_store(file_path, cache_path=None, workers=1):
+    """
+    Returns the events of a raw gate log, parsing the CSV only when needed.
+
+    If `cache_path` holds a store that is newer than the CSV it is memory-mapped;
+    otherwise the CSV is parsed and, when `cache_path` is given, saved there.
+
+    Args:
+        file_path (str): Path to the raw CSV file.
+        cache_path (str, optional): Path of the binary event store to reuse or create.
+        workers (int): Processes used to parse the CSV (see `csv_reader.read_csv_parallel`).
+
+    Returns:
+        EventStore: The events of the log.
+    """
+    if cache_path and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+        return EventStore.load(cache_path)
+
+    if workers > 1:
+        from .csv_reader import read_csv_parallel
+        store, _ = read_csv_parallel(file_path, workers=workers)
+    else:
+        store = EventStore.from_csv(file_path)
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        store.save(cache_path)
+    return store
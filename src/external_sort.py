@@ -0,0 +1,211 @@
+import heapq
+import os
+import shutil
+import tempfile
+from array import array
+from operator import itemgetter
+
+import numpy as np
+
+from .event_store import EVENT_CODES, EVENT_NAMES, EventStore
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+BYTES_PER_EVENT = 48  # Run buffer columns plus the sort permutation and the sorted copy
+MERGE_BLOCK_EVENTS = 65_536  # Events read from each run at a time while merging
+RUN_RECORD = np.dtype([("user", "<i4"), ("time", "<i8"), ("type", "u1")])
+
+
+def _sorted_columns(users, times):
+    """Whether (users, times) is non-decreasing in lexicographic order."""
+    user_steps = np.diff(users)
+    return bool(np.all((user_steps > 0) | ((user_steps == 0) & (np.diff(times) >= 0))))
+
+
+def is_sorted(store):
+    """
+    Fast check that a store is already ordered by (user, event_time).
+
+    Users are compared by code, i.e. in order of first appearance, so a store
+    is sorted when each user's events are contiguous and chronological.
+
+    Args:
+        store (EventStore): Events to check.
+
+    Returns:
+        bool: True if sorting would not change the store.
+    """
+    return _sorted_columns(np.asarray(store.users), np.asarray(store.times))
+
+
+class SortedEvents:
+    """
+    Events sorted by (user, event_time) with bounded memory, produced by `external_sort`.
+
+    Iterating yields (user_id, event_type, event_time) tuples and can be
+    repeated; `calculate_analytics` and the other analytics accept the object
+    directly. The sorted runs live in a temporary directory until `close` is
+    called or the `with` block ends.
+
+    Attributes:
+        user_ids (list): User IDs in order of first appearance in the input.
+        runs (list): Paths of the spilled runs (empty if everything fit in memory).
+        presorted (bool): True if the input was already in order, in which case
+                          no run was sorted and no merge is needed.
+        events (int): Number of events.
+    """
+
+    def __init__(self, user_ids, runs, memory_run, presorted, events, directory):
+        self.user_ids = user_ids
+        self.runs = runs
+        self.presorted = presorted
+        self.events = events
+        self._memory_run = memory_run
+        self._directory = directory
+
+    def __len__(self):
+        return self.events
+
+    def _iter_run(self, run):
+        if isinstance(run, np.ndarray):
+            records = run
+        else:
+            records = np.memmap(run, dtype=RUN_RECORD, mode="r")
+        for start in range(0, len(records), MERGE_BLOCK_EVENTS):
+            yield from records[start:start + MERGE_BLOCK_EVENTS].tolist()
+
+    def _all_runs(self):
+        return self.runs or ([self._memory_run] if self._memory_run is not None else [])
+
+    def _needs_merge(self):
+        return not self.presorted and len(self._all_runs()) > 1
+
+    def _iter_records(self):
+        iterators = [self._iter_run(run) for run in self._all_runs()]
+        if not self._needs_merge():
+            for iterator in iterators:
+                yield from iterator
+        else:
+            # heapq.merge breaks ties in favour of earlier runs, which hold earlier input
+            yield from heapq.merge(*iterators, key=itemgetter(0, 1))
+
+    def __iter__(self):
+        user_ids = self.user_ids
+        for user, event_time, event_type in self._iter_records():
+            yield user_ids[user], EVENT_NAMES[event_type], event_time
+
+    def to_store(self):
+        """Collects the sorted events into an EventStore, copying whole runs when no merge is needed."""
+        store = EventStore(self.user_ids)
+        if not self._needs_merge():
+            blocks = (run if isinstance(run, np.ndarray) else np.memmap(run, dtype=RUN_RECORD, mode="r")
+                      for run in self._all_runs())
+            for records in blocks:
+                store.users.frombytes(np.ascontiguousarray(records["user"], dtype=np.int32).tobytes())
+                store.times.frombytes(np.ascontiguousarray(records["time"], dtype=np.int64).tobytes())
+                store.event_types.frombytes(np.ascontiguousarray(records["type"]).tobytes())
+            return store
+
+        block = []
+        for record in self._iter_records():
+            block.append(record)
+            if len(block) == MERGE_BLOCK_EVENTS:
+                self._extend(store, block)
+                block = []
+        self._extend(store, block)
+        return store
+
+    @staticmethod
+    def _extend(store, block):
+        if block:
+            users, times, types = zip(*block)
+            store.users.extend(users)
+            store.times.extend(times)
+            store.event_types.extend(types)
+
+    def close(self):
+        """Deletes the spilled runs."""
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+            self.runs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def external_sort(events, memory_budget=DEFAULT_MEMORY_BUDGET, temp_dir=None):
+    """
+    Sorts an event stream by (user, event_time) under a memory budget.
+
+    Events are buffered in compact columns until the budget is reached; each
+    buffer is sorted with a stable NumPy lexsort and spilled to a binary run
+    file, and the runs are k-way merged with a heap on iteration. Users are
+    ordered by first appearance in the input (so rank ties and output order
+    stay as in the unsorted input), and events with equal times keep their
+    input order. A buffer that is already in order is not sorted, and when the
+    whole input is in order the runs are read back one after another without
+    a merge. An input that fits in one buffer is never written to disk.
+
+    Args:
+        events (iterable): (user_id, event_type, event_time) tuples with times in epoch
+                           microseconds, e.g. from `iter_normalized(..., as_micros=True)`
+                           or an EventStore, from one or several sources.
+        memory_budget (int): Approximate bytes to spend on the run buffer.
+        temp_dir (str, optional): Where the temporary run directory is created.
+
+    Returns:
+        SortedEvents: The sorted events, to be iterated or collected with `to_store`.
+    """
+    run_events = max(memory_budget // BYTES_PER_EVENT, 1)
+    user_ids, codes = [], {}
+    runs, memory_run, directory = [], None, None
+    presorted, last = True, None
+    total = 0
+
+    users, times, types = array("i"), array("q"), array("B")
+
+    def flush():
+        nonlocal presorted, last, memory_run, directory
+        run_users, run_times = np.frombuffer(users, dtype=np.int32), np.frombuffer(times, dtype=np.int64)
+        records = np.empty(len(users), dtype=RUN_RECORD)
+        ordered = _sorted_columns(run_users, run_times)
+        order = slice(None) if ordered else np.lexsort((run_times, run_users))
+        records["user"], records["time"] = run_users[order], run_times[order]
+        records["type"] = np.frombuffer(types, dtype=np.uint8)[order]
+        presorted = presorted and ordered and (last is None or (int(run_users[0]), int(run_times[0])) >= last)
+        last = (int(records["user"][-1]), int(records["time"][-1]))
+        if directory is None and memory_run is None:
+            memory_run = records  # Kept in memory unless a second run follows
+            return
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="event-sort-", dir=temp_dir)
+            runs.append(_spill(memory_run, directory, 0))
+            memory_run = None
+        runs.append(_spill(records, directory, len(runs)))
+
+    for user_id, event_type, event_time in events:
+        code = codes.get(user_id)
+        if code is None:
+            code = codes[user_id] = len(user_ids)
+            user_ids.append(user_id)
+        users.append(code)
+        times.append(event_time)
+        types.append(EVENT_CODES[event_type])
+        if len(users) >= run_events:
+            total += len(users)
+            flush()
+            users, times, types = array("i"), array("q"), array("B")
+    if users:
+        total += len(users)
+        flush()
+
+    return SortedEvents(user_ids, runs, memory_run, presorted, total, directory)
+
+
+def _spill(records, directory, index):
+    path = os.path.join(directory, f"run-{index:05d}.bin")
+    records.tofile(path)
+    return path
@@ -0,0 +1,151 @@
+import numpy as np
+
+from .timestamps import MICROS_PER_DAY, MICROS_PER_SECOND
+from .vectorized import _hours, merged_sessions, paired_sessions
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+FEATURE_NAMES = (
+    "average_per_day",     # Hours per day present
+    "days",                # Distinct days present
+    "arrival_mean",        # Hour of day (UTC) of the first GATE_IN of each day: mean ...
+    "arrival_std",         # ... and standard deviation
+    *(f"weekday_{day}" for day in WEEKDAYS),  # Fraction of the days present on each weekday
+    "longest_session",     # Longest merged session, in hours
+    "sessions",            # Number of merged sessions
+)
+MICROS_PER_HOUR = 3600 * MICROS_PER_SECOND
+
+
+class FeatureMatrix:
+    """
+    Dense float32 user x feature matrix for clustering and other models.
+
+    Row i holds the features of `user_ids[i]` (users in order of first
+    appearance, as in the analytics), column j the feature `features[j]`
+    (see `FEATURE_NAMES`). `index` maps a user ID to its row.
+
+    `from_store` derives every feature from a single pairing of the events
+    (`paired_sessions`) with segmented NumPy reductions, instead of one
+    Python loop per feature. Sessions count towards the day of their
+    GATE_IN and merge under the two-hour rule, as in the analytics. Keep
+    it with `save`/`load`; `standardized` gives the scaled copy models
+    are trained on.
+
+    Args:
+        user_ids (list): User ID of every row.
+        features (tuple): Name of every column.
+        values (array-like): n_users x n_features values.
+        mean (array-like, optional): Column means removed by `standardized`.
+        scale (array-like, optional): Column scales divided out by `standardized`.
+    """
+
+    def __init__(self, user_ids, features, values, mean=None, scale=None):
+        self.user_ids = list(user_ids)
+        self.features = tuple(features)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(self.user_ids), len(self.features))
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+        self._index = None
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Builds the matrix of every `FEATURE_NAMES` feature from an EventStore.
+
+        Args:
+            store (EventStore): Cleaned events (`EventStore.from_events` converts a list).
+
+        Returns:
+            FeatureMatrix: One row per user of the store.
+        """
+        user_order, pair_users, starts, ends = paired_sessions(store)
+        n_users = len(store.user_ids)
+        values = np.zeros((n_users, len(FEATURE_NAMES)))
+        column = {name: position for position, name in enumerate(FEATURE_NAMES)}
+
+        if len(starts):
+            # One row per user-day: the first GATE_IN of the day is its earliest session start
+            days = starts // MICROS_PER_DAY
+            keys = (pair_users.astype(np.int64) << 32) | (days - days.min())
+            order = np.lexsort((starts, keys))
+            first = np.flatnonzero(np.append(True, keys[order][1:] != keys[order][:-1]))
+            day_users = pair_users[order][first]
+            arrival = (starts[order][first] % MICROS_PER_DAY) / MICROS_PER_HOUR
+            weekday = (days[order][first] + 3) % 7  # 1970-01-01 was a Thursday
+
+            days_present = np.bincount(day_users, minlength=n_users)
+            per_day = np.maximum(days_present, 1)
+            values[:, column["days"]] = days_present
+            values[:, column["average_per_day"]] = \
+                np.bincount(pair_users, weights=_hours(ends - starts), minlength=n_users) / per_day
+            arrival_mean = np.bincount(day_users, weights=arrival, minlength=n_users) / per_day
+            arrival_square = np.bincount(day_users, weights=arrival * arrival, minlength=n_users) / per_day
+            values[:, column["arrival_mean"]] = arrival_mean
+            values[:, column["arrival_std"]] = np.sqrt(np.maximum(arrival_square - arrival_mean ** 2, 0))
+            weekdays = np.bincount(day_users * 7 + weekday, minlength=n_users * 7).reshape(n_users, 7)
+            start = column["weekday_mon"]
+            values[:, start:start + 7] = weekdays / per_day[:, None]
+
+            merged_users, merged_starts, merged_ends = merged_sessions(pair_users, starts, ends)
+            values[:, column["sessions"]] = np.bincount(merged_users, minlength=n_users)
+            user_first = np.flatnonzero(np.append(True, merged_users[1:] != merged_users[:-1]))
+            values[merged_users[user_first], column["longest_session"]] = \
+                _hours(np.maximum.reduceat(merged_ends - merged_starts, user_first))
+
+        return cls([store.user_ids[code] for code in user_order.tolist()], FEATURE_NAMES, values[user_order])
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @property
+    def index(self):
+        """User ID -> row number."""
+        if self._index is None:
+            self._index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        return self._index
+
+    def row(self, user_id):
+        """The features of one user as a dict."""
+        return dict(zip(self.features, self.values[self.index[user_id]].tolist()))
+
+    def select(self, features):
+        """
+        A matrix with only some of the columns, in the given order.
+
+        Raises:
+            ValueError: If a feature is not in the matrix.
+        """
+        missing = [feature for feature in features if feature not in self.features]
+        if missing:
+            raise ValueError(f"Unknown features: {missing}. Expected some of {self.features}.")
+        columns = [self.features.index(feature) for feature in features]
+        return FeatureMatrix(self.user_ids, features, self.values[:, columns],
+                             None if self.mean is None else self.mean[columns],
+                             None if self.scale is None else self.scale[columns])
+
+    def standardized(self):
+        """
+        A copy with every column scaled to zero mean and unit variance.
+
+        Constant columns are only centered. The copy keeps the `mean` and
+        `scale` that were applied.
+        """
+        values = self.values.astype(np.float64)
+        mean = values.mean(axis=0) if len(values) else np.zeros(len(self.features))
+        scale = values.std(axis=0) if len(values) else np.ones(len(self.features))
+        scale[scale == 0] = 1.0
+        return FeatureMatrix(self.user_ids, self.features, (values - mean) / scale, mean, scale)
+
+    def save(self, file_path):
+        """Writes the matrix, its user and feature names and any scaling to an uncompressed .npz file."""
+        extra = {} if self.mean is None else {"mean": self.mean, "scale": self.scale}
+        with open(file_path, "wb") as file:
+            np.savez(file, user_ids=np.array(self.user_ids, dtype=str), features=np.array(self.features, dtype=str),
+                     values=self.values, **extra)
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a matrix written by `save`."""
+        with np.load(file_path) as arrays:
+            scaling = (arrays["mean"], arrays["scale"]) if "mean" in arrays.files else (None, None)
+            return cls(arrays["user_ids"].tolist(), arrays["features"].tolist(), arrays["values"], *scaling)
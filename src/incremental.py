@@ -0,0 +1,178 @@
+import math
+import os
+import pickle
+from array import array
+
+from .analytics import LongestSessionAggregator, TimeAndDaysAggregator, iter_event_tuples
+from .leaderboard import Leaderboard
+
+STATE_VERSION = 1
+_NO_TIME = -(2 ** 63)  # Stands for None in the int64 time columns
+
+
+def _times(values):
+    return array("q", (_NO_TIME if value is None else value for value in values))
+
+
+def _time(value):
+    return None if value == _NO_TIME else value
+
+
+class IncrementalAnalytics:
+    """
+    Analytics maintained across batches of events, with the per-user state on disk.
+
+    The state is exactly that of `TimeAndDaysAggregator` and
+    `LongestSessionAggregator`: total hours, the epoch days present and the
+    open GATE_IN, plus the open IN, the session being extended under the
+    two-hour rule and the longest session so far. Applying a new batch only
+    touches the users in it, and a session left open at the end of one batch
+    is closed by the next. Feeding the batches in order gives results
+    identical to a full recompute over all of them, including rank ties,
+    since users keep their order of first appearance.
+
+    `rank` and `top` answer from a `Leaderboard` that is built on first use
+    and then refreshed for the users of each batch only, instead of
+    re-ranking everyone.
+
+    Args:
+        time_and_days (TimeAndDaysAggregator, optional): Existing state.
+        sessions (LongestSessionAggregator, optional): Existing state.
+        batches (list, optional): Identifiers of the batches already applied.
+    """
+
+    def __init__(self, time_and_days=None, sessions=None, batches=None):
+        self.time_and_days = time_and_days or TimeAndDaysAggregator()
+        self.sessions = sessions or LongestSessionAggregator()
+        self.batches = list(batches or [])
+        self._leaderboard = None
+
+    def update(self, events, batch_id=None):
+        """
+        Applies a batch of cleaned events, in order.
+
+        Args:
+            events (iterable): EventStore, or cleaned events with keys 'user_id', 'event_type', 'event_time'.
+            batch_id (str, optional): Identifier of the batch, e.g. a file digest. A batch
+                                      that was already applied is skipped.
+
+        Returns:
+            int: Number of events applied (0 if the batch was skipped).
+        """
+        if batch_id is not None:
+            if batch_id in self.batches:
+                return 0
+            self.batches.append(batch_id)
+
+        add_time, add_session = self.time_and_days.add, self.sessions.add
+        touched = {}
+        applied = 0
+        for user_id, event_type, event_time in iter_event_tuples(events):
+            add_time(user_id, event_type, event_time)
+            add_session(user_id, event_type, event_time)
+            touched[user_id] = None
+            applied += 1
+        if self._leaderboard is not None:
+            self._refresh(touched)
+        return applied
+
+    def _refresh(self, user_ids):
+        row = self.time_and_days.row
+        for user_id in user_ids:
+            self._leaderboard.update(user_id, row(user_id)['average_per_day'])
+
+    @property
+    def leaderboard(self):
+        """Users ranked by average hours per day, kept up to date by `update`."""
+        if self._leaderboard is None:
+            self._leaderboard = Leaderboard()
+            self._refresh(self.time_and_days.user_stats)
+        return self._leaderboard
+
+    def rank(self, user_id):
+        """A user's current rank, as in `results`, without re-ranking everyone."""
+        return self.leaderboard.rank(user_id)
+
+    def top(self, n):
+        """The first `n` rows of the user analytics of `results`."""
+        return [dict(self.time_and_days.row(user_id), rank=rank)
+                for rank, (user_id, _) in enumerate(self.leaderboard.top(n), start=1)]
+
+    def results(self):
+        """
+        Returns:
+            tuple: (user_analytics, longest_sessions), as returned by `calculate_analytics`.
+        """
+        return self.time_and_days.results(), self.sessions.results()
+
+    def save(self, file_path):
+        """
+        Writes the state as compact columns (one entry per user, days as a
+        flat int32 array), through a temporary file and a rename.
+        """
+        stats, states = self.time_and_days.user_stats, self.sessions.user_state
+        user_ids = list(stats)
+        days = array("i")
+        day_counts = array("I")
+        for user_id in user_ids:
+            user_days = sorted(stats[user_id]["days"])
+            days.extend(user_days)
+            day_counts.append(len(user_days))
+
+        columns = {
+            "version": STATE_VERSION,
+            "batches": self.batches,
+            "user_ids": user_ids,
+            "session_user_ids": list(states) if list(states) != user_ids else None,
+            "time": array("d", (stats[user_id]["time"] for user_id in user_ids)),
+            "days": days,
+            "day_counts": day_counts,
+            "last_in": _times(stats[user_id]["last_in"] for user_id in user_ids),
+        }
+        session_users = columns["session_user_ids"] or user_ids
+        for field in ("open_in", "start", "end"):
+            columns[field] = _times(states[user_id][field] for user_id in session_users)
+        columns["longest"] = array("d", (math.nan if states[user_id]["longest"] is None else states[user_id]["longest"]
+                                         for user_id in session_users))
+
+        temporary = f"{file_path}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(columns, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, file_path)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Reads a state written by `save`; a missing file gives an empty state.
+
+        Raises:
+            ValueError: If the file was written by an incompatible version.
+        """
+        if not os.path.exists(file_path):
+            return cls()
+        with open(file_path, "rb") as file:
+            columns = pickle.load(file)
+        if columns.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported incremental state version: {columns.get('version')!r}")
+
+        time_and_days = TimeAndDaysAggregator()
+        offset = 0
+        for index, user_id in enumerate(columns["user_ids"]):
+            count = columns["day_counts"][index]
+            time_and_days.user_stats[user_id] = {
+                "time": columns["time"][index],
+                "days": set(columns["days"][offset:offset + count]),
+                "last_in": _time(columns["last_in"][index]),
+            }
+            offset += count
+
+        sessions = LongestSessionAggregator()
+        for index, user_id in enumerate(columns["session_user_ids"] or columns["user_ids"]):
+            longest = columns["longest"][index]
+            sessions.user_state[user_id] = {
+                "open_in": _time(columns["open_in"][index]),
+                "start": _time(columns["start"][index]),
+                "end": _time(columns["end"][index]),
+                "longest": None if math.isnan(longest) else longest,
+            }
+        return cls(time_and_days, sessions, columns["batches"])
@@ -0,0 +1,176 @@
+import collections
+import contextlib
+import cProfile
+import gc
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+
+def peak_rss_mb():
+    """Process-wide peak resident set size, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class SamplingProfiler:
+    """
+    Minimal statistical profiler: a background thread samples the profiled
+    thread's stack every `interval` seconds and counts the innermost frames.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                code = frame.f_code
+                self.samples[f"{code.co_filename}:{frame.f_lineno}({code.co_name})"] += 1
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def top(self, limit=15):
+        total = sum(self.samples.values()) or 1
+        return [{"location": location, "samples": count, "share": count / total}
+                for location, count in self.samples.most_common(limit)]
+
+
+class Profiler:
+    """
+    Records per-stage metrics for the pipeline.
+
+    For every `stage` block it records wall time, CPU time, rows in/out,
+    rows per second, the process peak RSS, the change in allocated memory
+    blocks and garbage collections, and (with `trace_memory`) the Python-level
+    peak allocation from tracemalloc. Stages named in `profile_stages` (or all
+    of them with "all") are additionally run under cProfile or a sampling
+    profiler. A disabled profiler does nothing beyond returning an empty record.
+
+    Args:
+        enabled (bool): Record anything at all.
+        trace_memory (bool): Track peak Python allocations with tracemalloc (slows the run down).
+        profile_stages (iterable): Stage names to profile, or ["all"].
+        profiler (str): "cprofile" or "sampling".
+        profile_dir (str, optional): Where cProfile stats files (`<stage>.prof`) are written.
+    """
+
+    def __init__(self, enabled=True, trace_memory=False, profile_stages=(), profiler="cprofile", profile_dir=None):
+        if profiler not in ("cprofile", "sampling"):
+            raise ValueError(f"Unknown profiler: {profiler!r}. Expected 'cprofile' or 'sampling'.")
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.profile_stages = set(profile_stages)
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.stages = []
+        self.metrics = {}
+
+    def _should_profile(self, name):
+        return "all" in self.profile_stages or name in self.profile_stages
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Measures the enclosed block. The yielded dict can be updated with
+        'rows_out' (or any extra metric) before the block ends.
+        """
+        record = {"stage": name, "rows_in": rows_in}
+        if not self.enabled:
+            yield record
+            return
+
+        profiler = None
+        if self._should_profile(name):
+            profiler = cProfile.Profile() if self.profiler == "cprofile" else SamplingProfiler()
+            profiler.enable() if self.profiler == "cprofile" else profiler.start()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        blocks, collections_before = sys.getallocatedblocks(), sum(gen["collections"] for gen in gc.get_stats())
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall
+            record["cpu_seconds"] = time.process_time() - cpu
+            record["allocated_blocks_delta"] = sys.getallocatedblocks() - blocks
+            record["gc_collections"] = sum(gen["collections"] for gen in gc.get_stats()) - collections_before
+            record["peak_rss_mb"] = peak_rss_mb()
+            if self.trace_memory:
+                record["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            rows = record.get("rows_out") if record.get("rows_in") is None else record["rows_in"]
+            record["rows_per_sec"] = rows / record["wall_seconds"] if rows and record["wall_seconds"] else None
+            if profiler is not None:
+                record["profile"] = self._finish_profile(name, profiler)
+            self.stages.append(record)
+
+    def _finish_profile(self, name, profiler):
+        if isinstance(profiler, SamplingProfiler):
+            profiler.stop()
+            return {"profiler": "sampling", "top": profiler.top()}
+
+        profiler.disable()
+        result = {"profiler": "cprofile"}
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            result["stats_file"] = os.path.join(self.profile_dir, f"{name}.prof")
+            profiler.dump_stats(result["stats_file"])
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(15)
+        result["top"] = text.getvalue()
+        return result
+
+    def record(self, name, **metrics):
+        """Attaches extra metrics, e.g. k-means iteration counts, under `name`."""
+        if self.enabled:
+            self.metrics.setdefault(name, {}).update(metrics)
+
+    def report(self):
+        """The recorded stages and metrics as a JSON-serializable dict."""
+        return {"stages": self.stages, "metrics": self.metrics}
+
+    def write_json(self, file_path):
+        with open(file_path, "w") as file:
+            json.dump(self.report(), file, indent=2, default=str)
+
+    def summary_table(self):
+        """A fixed-width table of the recorded stages."""
+        lines = [f"{'stage':<22}{'wall s':>9}{'cpu s':>9}{'rows in':>12}{'rows out':>12}{'rows/s':>13}{'peak MB':>10}"]
+        for record in self.stages:
+            lines.append(
+                f"{record['stage']:<22}{record['wall_seconds']:>9.3f}{record['cpu_seconds']:>9.3f}"
+                f"{_format_count(record.get('rows_in')):>12}{_format_count(record.get('rows_out')):>12}"
+                f"{_format_count(record.get('rows_per_sec')):>13}{record['peak_rss_mb']:>10.1f}"
+            )
+        for name, metrics in self.metrics.items():
+            lines.append(f"{name}: " + ", ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                                 for key, value in metrics.items()))
+        return "\n".join(lines)
+
+
+def _format_count(value):
+    return "-" if value is None else f"{value:,.0f}"
+
+
+NULL_PROFILER = Profiler(enabled=False)
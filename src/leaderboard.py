@@ -0,0 +1,180 @@
+import heapq
+import random
+from operator import itemgetter
+
+
+def top_n(rows, n, key):
+    """
+    The `n` rows with the largest key, with a bounded heap.
+
+    Same result as `sorted(rows, key=key, reverse=True)[:n]`, ties included
+    (equal keys keep their input order), in O(len(rows) log n) instead of a
+    full sort. `n=None` sorts everything.
+    """
+    if n is None:
+        return sorted(rows, key=key, reverse=True)
+    return heapq.nlargest(n, rows, key=key)
+
+
+def rank_rows(rows, field, limit=None):
+    """
+    Orders rows by a field, descending, and numbers them in a 'rank' field.
+
+    Args:
+        rows (list): Dictionaries, in order of first appearance of the users.
+        field (str): Field to rank by.
+        limit (int, optional): Only keep the top `limit` rows.
+
+    Returns:
+        list: The ranked rows.
+    """
+    ranked = top_n(rows, limit, itemgetter(field))
+    for rank, row in enumerate(ranked, start=1):
+        row['rank'] = rank
+    return ranked
+
+
+class _Node:
+    __slots__ = ("key", "user_id", "priority", "size", "left", "right")
+
+    def __init__(self, key, user_id, priority):
+        self.key = key
+        self.user_id = user_id
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _split(node, key):
+    """Splits a treap into the nodes with keys < key and >= key."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.size = 1 + _size(node.left) + _size(node.right)
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return left, node
+
+
+def _merge(left, right):
+    """Joins two treaps where every key of `left` is below every key of `right`."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.size = 1 + _size(left.left) + _size(left.right)
+        return left
+    right.left = _merge(left, right.left)
+    right.size = 1 + _size(right.left) + _size(right.right)
+    return right
+
+
+def _remove(node, key):
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    node.size -= 1
+    return node
+
+
+class Leaderboard:
+    """
+    Order-statistics treap of users ranked by a score, for rankings that change one user at a time.
+
+    Users are ordered by descending score, ties by the order in which they
+    were first added, which is how `calculate_time_and_days` breaks ties when
+    scores are added in order of first appearance. Every node stores the size
+    of its subtree, so changing a user's score, looking up a user's rank and
+    finding the user at a rank all take O(log n) expected time; `top(n)` walks
+    only the first n users.
+    """
+
+    def __init__(self, seed=0):
+        self._root = None
+        self._keys = {}  # User ID -> (-score, order of first appearance)
+        self._order = {}
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._keys
+
+    def update(self, user_id, score):
+        """Sets a user's score, adding the user if needed."""
+        order = self._order.setdefault(user_id, len(self._order))
+        key = (-score, order)
+        old = self._keys.get(user_id)
+        if old == key:
+            return
+        if old is not None:
+            self._root = _remove(self._root, old)
+        self._keys[user_id] = key
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, user_id, self._random.random())), right)
+
+    def remove(self, user_id):
+        """Drops a user; a user added again keeps the original tie order."""
+        self._root = _remove(self._root, self._keys.pop(user_id))
+
+    def score(self, user_id):
+        return -self._keys[user_id][0]
+
+    def rank(self, user_id):
+        """1-based rank of a user.
+
+        Raises:
+            KeyError: If the user is not on the leaderboard.
+        """
+        key = self._keys[user_id]
+        node, before = self._root, 0
+        while node is not None:
+            if key < node.key:
+                node = node.left
+            elif key > node.key:
+                before += _size(node.left) + 1
+                node = node.right
+            else:
+                return before + _size(node.left) + 1
+        raise KeyError(user_id)
+
+    def at(self, rank):
+        """(user_id, score) of the user at a 1-based rank."""
+        if not 1 <= rank <= len(self):
+            raise IndexError(f"Rank {rank} out of range 1..{len(self)}")
+        node = self._root
+        while True:
+            left = _size(node.left)
+            if rank <= left:
+                node = node.left
+            elif rank == left + 1:
+                return node.user_id, -node.key[0]
+            else:
+                rank -= left + 1
+                node = node.right
+
+    def top(self, n=None):
+        """(user_id, score) pairs of the first `n` users (all by default), best first."""
+        n = len(self) if n is None else n
+        items, stack, node = [], [], self._root
+        while len(items) < n and (stack or node is not None):
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            items.append((node.user_id, -node.key[0]))
+            node = node.right
+        return items
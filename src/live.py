@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import csv
+import heapq
+import json
+import time
+from collections import deque
+
+from .analytics import IN_EVENTS, LongestSessionAggregator, TimeAndDaysAggregator, to_hours
+from .data_process import normalize_row
+from .leaderboard import Leaderboard
+from .timestamps import MICROS_PER_DAY, MICROS_PER_SECOND
+
+DEFAULT_LATENESS = 60 * MICROS_PER_SECOND
+DEFAULT_MAX_BUFFER = 100_000
+FIELDNAMES = ("user_id", "event_type", "event_time")
+LATENCY_SAMPLES = 100_000
+
+
+class LiveAnalytics:
+    """
+    Live per-user state for a stream of gate events.
+
+    Events go through a watermark buffer: they are held until the newest
+    event time seen is `allowed_lateness` past them, then applied in event
+    time order to the same state machines as the batch analytics
+    (`TimeAndDaysAggregator` and `LongestSessionAggregator`). Events older
+    than what has already been applied are counted as late and dropped; when
+    more than `max_buffer` events are held the oldest are applied early.
+
+    "Today" is the day of the newest applied event, so replayed logs behave
+    like live ones.
+
+    Args:
+        allowed_lateness (int): How far behind the newest event an event may arrive, in microseconds.
+        max_buffer (int): Maximum number of events held back.
+    """
+
+    def __init__(self, allowed_lateness=DEFAULT_LATENESS, max_buffer=DEFAULT_MAX_BUFFER):
+        self.allowed_lateness = allowed_lateness
+        self.max_buffer = max_buffer
+        self.time_and_days = TimeAndDaysAggregator()
+        self.sessions = LongestSessionAggregator()
+        self.leaderboard = Leaderboard()
+        self.present = {}  # User ID -> time of the GATE_IN that is still open
+        self.today = None
+        self.today_micros = {}
+        self.applied_time = None
+        self.newest_time = None
+        self.counters = {"received": 0, "applied": 0, "late": 0, "invalid": 0}
+        self._buffer = []
+        self._sequence = 0
+
+    def ingest(self, user_id, event_type, event_time):
+        """
+        Buffers one cleaned event (time in epoch microseconds) and applies what the watermark allows.
+
+        Returns:
+            int: Number of events applied.
+        """
+        self.counters["received"] += 1
+        if self.applied_time is not None and event_time < self.applied_time:
+            self.counters["late"] += 1
+            return 0
+        heapq.heappush(self._buffer, (event_time, self._sequence, user_id, event_type))
+        self._sequence += 1
+        if self.newest_time is None or event_time > self.newest_time:
+            self.newest_time = event_time
+        return self._release(self.newest_time - self.allowed_lateness)
+
+    def flush(self):
+        """Applies every buffered event, e.g. at the end of a replay."""
+        return self._release(None)
+
+    def _release(self, watermark):
+        buffer, released = self._buffer, 0
+        while buffer and (watermark is None or buffer[0][0] <= watermark or len(buffer) > self.max_buffer):
+            event_time, _, user_id, event_type = heapq.heappop(buffer)
+            self._apply(user_id, event_type, event_time)
+            released += 1
+        return released
+
+    def _apply(self, user_id, event_type, event_time):
+        day = event_time // MICROS_PER_DAY
+        if self.today is None or day > self.today:
+            self.today, self.today_micros = day, {}
+        open_in = self.present.pop(user_id, None)
+
+        self.time_and_days.add(user_id, event_type, event_time)
+        self.sessions.add(user_id, event_type, event_time)
+
+        if event_type in IN_EVENTS:
+            self.present[user_id] = event_time
+        elif open_in is not None and open_in // MICROS_PER_DAY == self.today:
+            self.today_micros[user_id] = self.today_micros.get(user_id, 0) + event_time - open_in
+        if user_id not in self.leaderboard or (open_in is not None and event_type not in IN_EVENTS):
+            # Only a new user or a closed session changes the average
+            self.leaderboard.update(user_id, self.time_and_days.row(user_id)['average_per_day'])
+        self.applied_time = event_time
+        self.counters["applied"] += 1
+
+    def headcount(self):
+        """Number of users whose last applied event is a GATE_IN."""
+        return len(self.present)
+
+    def today_hours(self, user_id):
+        """Hours of a user's sessions that started today, counting an open one up to the latest event."""
+        micros = self.today_micros.get(user_id, 0)
+        open_in = self.present.get(user_id)
+        if open_in is not None and open_in // MICROS_PER_DAY == self.today:
+            micros += self.applied_time - open_in
+        return to_hours(micros)
+
+    def rankings(self, limit=None):
+        """Current user analytics, ranked as `calculate_time_and_days` ranks them, read from the leaderboard."""
+        return [dict(self.time_and_days.row(user_id), rank=rank)
+                for rank, (user_id, _) in enumerate(self.leaderboard.top(limit), start=1)]
+
+    def rank(self, user_id):
+        """A user's current rank, or None for an unknown user."""
+        return self.leaderboard.rank(user_id) if user_id in self.leaderboard else None
+
+    def longest_sessions(self, limit=None):
+        """Current longest sessions, as `calculate_longest_session` orders them."""
+        return self.sessions.results(limit)
+
+
+def parse_line(line):
+    """
+    Parses one newline-delimited event, as CSV (`user_id,event_type,event_time`) or a JSON object.
+
+    Returns:
+        tuple or None: (user_id, event_type, event_time in epoch microseconds), or None for a CSV header.
+
+    Raises:
+        ValueError: If the line is not a valid event.
+    """
+    text = line.decode("utf-8") if isinstance(line, bytes) else line
+    text = text.strip()
+    if text.startswith("{"):
+        row = json.loads(text)
+        if not isinstance(row, dict):
+            raise ValueError("Invalid row data")
+    else:
+        fields = next(csv.reader([text]))
+        if tuple(fields) == FIELDNAMES:
+            return None
+        row = dict(zip(FIELDNAMES, fields))
+    return normalize_row(row, as_micros=True)
+
+
+class LiveService:
+    """
+    asyncio service that ingests gate events and answers live queries.
+
+    Events are sent to the ingest socket (TCP, or a Unix socket with
+    `unix_path`) one per line, as CSV or JSON. The query socket (TCP) takes one
+    command per line and answers with one JSON line:
+
+        HEADCOUNT            {"headcount": 12}
+        PRESENT              {"present": ["user-1", ...]}
+        TODAY <user_id>      {"user_id": "...", "hours": 3.5}
+        RANK <user_id>       {"user_id": "...", "rank": 4}
+        RANKING [n]          {"ranking": [...user analytics...]}
+        LONGEST [n]          {"longest": [...longest sessions...]}
+        STATS                counters, buffer size and update latency percentiles
+        FLUSH                applies the buffered events, then STATS
+
+    Update latency is measured per event, from receiving the line to having
+    applied whatever it released.
+
+    Args:
+        analytics (LiveAnalytics, optional): State to serve.
+        host (str): Interface for the TCP sockets.
+        port (int): Ingest port (0 picks a free one).
+        query_port (int): Query port (0 picks a free one).
+        unix_path (str, optional): Ingest over this Unix socket instead of TCP.
+    """
+
+    def __init__(self, analytics=None, host="127.0.0.1", port=0, query_port=0, unix_path=None):
+        self.analytics = analytics or LiveAnalytics()
+        self.host = host
+        self.port = port
+        self.query_port = query_port
+        self.unix_path = unix_path
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # Nanoseconds
+        self._servers = []
+
+    async def start(self):
+        """Opens the sockets; the chosen ports are then in `port` and `query_port`."""
+        if self.unix_path:
+            ingest = await asyncio.start_unix_server(self._handle_ingest, path=self.unix_path)
+        else:
+            ingest = await asyncio.start_server(self._handle_ingest, self.host, self.port)
+            self.port = ingest.sockets[0].getsockname()[1]
+        query = await asyncio.start_server(self._handle_query, self.host, self.query_port)
+        self.query_port = query.sockets[0].getsockname()[1]
+        self._servers = [ingest, query]
+        return self
+
+    async def serve_forever(self):
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    def handle_line(self, line):
+        """Parses and ingests one event line, recording its update latency."""
+        started = time.perf_counter_ns()
+        try:
+            event = parse_line(line)
+        except Exception:
+            self.analytics.counters["invalid"] += 1
+            return
+        if event is not None:
+            self.analytics.ingest(*event)
+            self.latencies.append(time.perf_counter_ns() - started)
+
+    async def _handle_ingest(self, reader, writer):
+        try:
+            async for line in reader:
+                if line.strip():
+                    self.handle_line(line)
+        finally:
+            writer.close()
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] / 1e6 if latencies else None
+
+        return dict(self.analytics.counters, buffered=len(self.analytics._buffer), headcount=self.analytics.headcount(),
+                    latency_ms={"p50": percentile(0.5), "p99": percentile(0.99), "max": percentile(1.0)})
+
+    def query(self, command):
+        """Answers one query command (see the class docstring) as a JSON-serializable dict."""
+        name, _, argument = command.strip().partition(" ")
+        name, argument = name.upper(), argument.strip()
+        limit = int(argument) if argument.isdigit() else None
+        if name == "HEADCOUNT":
+            return {"headcount": self.analytics.headcount()}
+        if name == "PRESENT":
+            return {"present": list(self.analytics.present)}
+        if name == "TODAY":
+            return {"user_id": argument, "hours": self.analytics.today_hours(argument)}
+        if name == "RANK":
+            return {"user_id": argument, "rank": self.analytics.rank(argument)}
+        if name == "RANKING":
+            return {"ranking": self.analytics.rankings(limit)}
+        if name == "LONGEST":
+            return {"longest": self.analytics.longest_sessions(limit)}
+        if name == "FLUSH":
+            self.analytics.flush()
+            return self.stats()
+        if name == "STATS":
+            return self.stats()
+        return {"error": f"Unknown query: {command.strip()!r}"}
+
+    async def _handle_query(self, reader, writer):
+        try:
+            async for line in reader:
+                if line.strip():
+                    writer.write(json.dumps(self.query(line.decode("utf-8"))).encode("utf-8") + b"\n")
+                    await writer.drain()
+        finally:
+            writer.close()
+
+
+async def _serve(args):
+    service = await LiveService(
+        LiveAnalytics(allowed_lateness=int(args.lateness * MICROS_PER_SECOND), max_buffer=args.max_buffer),
+        host=args.host, port=args.port, query_port=args.query_port, unix_path=args.unix_path,
+    ).start()
+    where = args.unix_path or f"{args.host}:{service.port}"
+    print(f"Ingesting events on {where}, queries on {args.host}:{service.query_port}")
+    await service.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live occupancy and analytics service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000, help="Ingest port.")
+    parser.add_argument("--query-port", type=int, default=9001)
+    parser.add_argument("--unix-path", help="Ingest over a Unix socket instead of TCP.")
+    parser.add_argument("--lateness", type=float, default=60, help="Allowed lateness of events, in seconds.")
+    parser.add_argument("--max-buffer", type=int, default=DEFAULT_MAX_BUFFER)
+    asyncio.run(_serve(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
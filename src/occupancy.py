@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+import numpy as np
+
+from .timestamps import EPOCH, MICROS_PER_DAY, from_epoch_micros, to_epoch_micros
+from .vectorized import merged_sessions, paired_sessions
+
+LONG_SESSION = MICROS_PER_DAY  # Sessions longer than this are kept aside for lookups
+DEFAULT_STEP = timedelta(minutes=5)
+
+
+def _micros(value):
+    return value if isinstance(value, (int, np.integer)) else to_epoch_micros(value)
+
+
+class OccupancyIndex:
+    """
+    Interval index over the reconstructed sessions, for occupancy questions.
+
+    Sessions are half-open intervals [start, end): a user is in at `start`
+    and out at `end`. They are kept as sorted endpoint arrays, so the
+    headcount at any moment is two binary searches, occupancy curves are one
+    vectorized search per grid point and daily peaks come from a single
+    sweep over the endpoints. Looking up who is in at a moment only scans
+    the sessions that started within `LONG_SESSION` before it, plus the few
+    longer ones, which are kept in a separate list.
+
+    Sessions are those of `calculate_longest_session`: by default merged
+    under the two-hour rule (a short break does not count as leaving), or
+    the raw IN/OUT pairs with `merged=False`. Empty and negative sessions from
+    out-of-order logs are left out.
+    """
+
+    def __init__(self, user_ids, users, starts, ends):
+        keep = ends > starts
+        users, starts, ends = users[keep], starts[keep], ends[keep]
+        order = np.argsort(starts, kind="stable")
+        self.user_ids = list(user_ids)
+        self.users, self.starts, self.ends = users[order], starts[order], ends[order]
+        self.sorted_ends = np.sort(self.ends)
+        self._long = np.flatnonzero(self.ends - self.starts > LONG_SESSION)
+
+    @classmethod
+    def from_store(cls, store, merged=True):
+        """
+        Builds the index from an EventStore.
+
+        Args:
+            store (EventStore): Cleaned events.
+            merged (bool): Index the sessions merged under the two-hour rule, or the raw pairs.
+
+        Returns:
+            OccupancyIndex: The index.
+        """
+        _, pair_users, starts, ends = paired_sessions(store)
+        if merged:
+            pair_users, starts, ends = merged_sessions(pair_users, starts, ends)
+        return cls(store.user_ids, pair_users, starts, ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def headcount_at(self, when):
+        """Number of sessions open at a moment (datetime or epoch microseconds)."""
+        moment = _micros(when)
+        started = np.searchsorted(self.starts, moment, side="right")
+        return int(started - np.searchsorted(self.sorted_ends, moment, side="right"))
+
+    def present_at(self, when):
+        """
+        Users in the building at a moment.
+
+        Args:
+            when (datetime or int): The moment, as a datetime or epoch microseconds.
+
+        Returns:
+            list: User IDs, in order of the start of their session.
+        """
+        moment = _micros(when)
+        high = np.searchsorted(self.starts, moment, side="right")
+        low = np.searchsorted(self.starts, moment - LONG_SESSION, side="left")
+        candidates = np.arange(low, high)
+        long_sessions = self._long[(self._long < low) & (self.starts[self._long] <= moment)]
+        candidates = np.concatenate([long_sessions, candidates])
+        present = candidates[self.ends[candidates] > moment]
+
+        user_ids, seen = [], set()
+        for code in self.users[present].tolist():
+            if code not in seen:
+                seen.add(code)
+                user_ids.append(self.user_ids[code])
+        return user_ids
+
+    def curve(self, start, end, step=DEFAULT_STEP):
+        """
+        Occupancy sampled on a regular grid.
+
+        Args:
+            start (datetime or int): First sample.
+            end (datetime or int): End of the grid (exclusive).
+            step (timedelta or int): Grid spacing; five minutes by default.
+
+        Returns:
+            list: (datetime, headcount) pairs.
+        """
+        step = step if isinstance(step, (int, np.integer)) else step // timedelta(microseconds=1)
+        grid = np.arange(_micros(start), _micros(end), step, dtype=np.int64)
+        counts = np.searchsorted(self.starts, grid, side="right") - np.searchsorted(self.sorted_ends, grid, side="right")
+        return [(from_epoch_micros(moment), count) for moment, count in zip(grid.tolist(), counts.tolist())]
+
+    def daily_peaks(self):
+        """
+        Peak concurrent occupancy of every day with at least one session open, by sweep line.
+
+        Returns:
+            list: Dictionaries with 'date', 'peak' and 'at' (the first moment the peak was reached).
+        """
+        if not len(self.starts):
+            return []
+        # Ends sort before starts at the same moment: a user leaving at T is no longer in at T
+        times = np.concatenate([self.sorted_ends, self.starts])
+        deltas = np.concatenate([np.full(len(self.ends), -1), np.ones(len(self.starts), dtype=np.int64)])
+        order = np.lexsort((deltas, times))
+        times, occupancy = times[order], np.cumsum(deltas[order])
+
+        # The level carried over midnight counts for every day it spans
+        first_day, last_day = times[0] // MICROS_PER_DAY, (times[-1] - 1) // MICROS_PER_DAY
+        days = np.arange(first_day, last_day + 1)
+        carried = np.searchsorted(self.starts, days * MICROS_PER_DAY, side="right") - \
+            np.searchsorted(self.sorted_ends, days * MICROS_PER_DAY, side="right")
+
+        peaks = []
+        bounds = np.searchsorted(times, days * MICROS_PER_DAY, side="left").tolist() + [len(times)]
+        for index, day in enumerate(days.tolist()):
+            peak, at = int(carried[index]), day * MICROS_PER_DAY
+            low, high = bounds[index], bounds[index + 1]
+            if high > low:
+                best = low + int(np.argmax(occupancy[low:high]))
+                if occupancy[best] > peak:
+                    peak, at = int(occupancy[best]), int(times[best])
+            if peak:
+                peaks.append({'date': (EPOCH + timedelta(days=day)).date(), 'peak': peak, 'at': from_epoch_micros(at)})
+        return peaks
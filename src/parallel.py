@@ -0,0 +1,124 @@
+import os
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+import numpy as np
+
+from .analytics import calculate_analytics
+from .event_store import EventStore
+from .leaderboard import rank_rows, top_n
+
+
+def shard_of(user_id, n_shards):
+    """Stable hash partition of a user ID (independent of PYTHONHASHSEED)."""
+    return zlib.crc32(user_id.encode("utf-8")) % n_shards
+
+
+def first_appearance(store):
+    """
+    Position of each user's first event in the store.
+
+    Returns:
+        dict: Mapping of user ID to the index of its first event.
+    """
+    users = np.frombuffer(store.users, dtype=np.int32)
+    codes, first = np.unique(users, return_index=True)
+    return {store.user_ids[code]: position for code, position in zip(codes.tolist(), first.tolist())}
+
+
+def write_shards(store, n_shards, directory):
+    """
+    Hash-partitions a store by user ID into file-backed shards.
+
+    Each shard is an EventStore holding only its own users, with events in
+    their original order, saved so worker processes can memory-map it rather
+    than receive pickled events.
+
+    Args:
+        store (EventStore): Events to partition.
+        n_shards (int): Number of shards.
+        directory (str): Directory the shard files are written to.
+
+    Returns:
+        list: Paths of the non-empty shard files.
+    """
+    users = np.frombuffer(store.users, dtype=np.int32)
+    event_types = np.frombuffer(store.event_types, dtype=np.uint8)
+    times = np.frombuffer(store.times, dtype=np.int64)
+    user_shards = np.array([shard_of(user_id, n_shards) for user_id in store.user_ids], dtype=np.int32)
+    event_shards = user_shards[users]
+
+    paths = []
+    for shard in range(n_shards):
+        shard_users = np.flatnonzero(user_shards == shard)
+        mask = event_shards == shard
+        if not mask.any():
+            continue
+        # Re-code the shard's users densely, 0..len(shard_users)-1
+        local_codes = np.zeros(len(store.user_ids), dtype=np.int32)
+        local_codes[shard_users] = np.arange(len(shard_users), dtype=np.int32)
+        shard_store = EventStore(
+            [store.user_ids[code] for code in shard_users.tolist()],
+            local_codes[users[mask]], event_types[mask], times[mask],
+        )
+        path = os.path.join(directory, f"shard-{shard:04d}.store")
+        shard_store.save(path)
+        paths.append(path)
+    return paths
+
+
+def _analyze_shard(path, engine):
+    """Worker: memory-map one shard and run both analytics on it."""
+    return calculate_analytics(EventStore.load(path), engine=engine)
+
+
+def merge_results(partials, first_seen):
+    """
+    Merges per-shard analytics into global results.
+
+    Every user lives in exactly one shard, so merging is a concatenation,
+    put back in order of first appearance in the full log, followed by the
+    global ranking of `leaderboard.rank_rows`. Its ties keep that order,
+    which reproduces the single-process order and ranks exactly.
+
+    Args:
+        partials (list): (user_analytics, longest_sessions) per shard.
+        first_seen (dict): User ID to position of its first event, see `first_appearance`.
+
+    Returns:
+        tuple: (user_analytics, longest_sessions) with global ranks.
+    """
+    def appearance(row):
+        return first_seen[row['user_id']]
+
+    user_analytics = sorted((row for analytics, _ in partials for row in analytics), key=appearance)
+    longest_sessions = sorted((row for _, sessions in partials for row in sessions), key=appearance)
+    return rank_rows(user_analytics, 'average_per_day'), top_n(longest_sessions, None, itemgetter('session_length'))
+
+
+def calculate_analytics_parallel(store, workers=None, engine="numpy", n_shards=None):
+    """
+    Runs `calculate_analytics` on user-partitioned shards across processes.
+
+    Args:
+        store (EventStore): Events to analyse.
+        workers (int, optional): Number of worker processes (defaults to the CPU count).
+        engine (str): Analytics engine used inside each worker.
+        n_shards (int, optional): Number of shards (defaults to `workers`).
+
+    Returns:
+        tuple: (user_analytics, longest_sessions), identical to `calculate_analytics(store)`.
+    """
+    workers = workers or os.cpu_count() or 1
+    n_shards = n_shards or workers
+    if workers == 1 and n_shards == 1:
+        return calculate_analytics(store, engine=engine)
+
+    with tempfile.TemporaryDirectory(prefix="office-analytics-") as directory:
+        paths = write_shards(store, n_shards, directory)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(_analyze_shard, paths, [engine] * len(paths)))
+
+    return merge_results(partials, first_appearance(store))
@@ -0,0 +1,259 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .analytics import IN_EVENTS, SESSION_BREAK, iter_event_tuples, to_hours
+from .event_store import EventStore
+from .leaderboard import rank_rows, top_n
+from .quarantine import Quarantine, discard_rejections
+from .timestamps import MICROS_PER_DAY, to_epoch_micros
+
+EXECUTORS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+
+# Merged sessions of one user are summarized as (count, first, last, inner_max):
+# the first and last merged groups as (start, end) and the longest group in between.
+_NO_GROUPS = (0, None, None, None)
+
+
+def _duration(group):
+    return group[1] - group[0]
+
+
+def _longer(current, candidate):
+    return candidate if current is None or candidate > current else current
+
+
+def _concat_groups(left, right):
+    """
+    Concatenates two summarized sequences of merged sessions.
+
+    The last group of `left` absorbs the first group of `right` when the gap
+    between them is at most two hours, exactly as `LongestSessionAggregator`
+    would extend its current session.
+    """
+    if not left[0]:
+        return right
+    if not right[0]:
+        return left
+    left_count, left_first, left_last, left_inner = left
+    right_count, right_first, right_last, right_inner = right
+    inner = left_inner
+    if right_inner is not None:
+        inner = _longer(inner, right_inner)
+
+    if right_first[0] - left_last[1] <= SESSION_BREAK:
+        joined = (left_last[0], right_first[1])
+        first = joined if left_count == 1 else left_first
+        last = joined if right_count == 1 else right_last
+        if left_count > 1 and right_count > 1:
+            inner = _longer(inner, _duration(joined))
+        return left_count + right_count - 1, first, last, inner
+
+    if left_count > 1:
+        inner = _longer(inner, _duration(left_last))
+    if right_count > 1:
+        inner = _longer(inner, _duration(right_first))
+    return left_count + right_count, left_first, right_last, inner
+
+
+def _new_user():
+    return {'head_out': None, 'tail_in': None, 'durations': array('q'), 'days': set(), 'groups': _NO_GROUPS}
+
+
+def _merge_user(left, right):
+    """Combines one user's partials from consecutive logs, pairing across the seam."""
+    merged = {
+        'head_out': left['head_out'],
+        'tail_in': right['tail_in'],
+        'durations': array('q', left['durations']),
+        'days': left['days'] | right['days'],
+        'groups': left['groups'],
+    }
+    if left['tail_in'] is not None and right['head_out'] is not None:
+        # A session left open by the left log is closed by the right one
+        seam = (left['tail_in'], right['head_out'])
+        merged['durations'].append(_duration(seam))
+        merged['days'].add(seam[0] // MICROS_PER_DAY)
+        merged['groups'] = _concat_groups(merged['groups'], (1, seam, seam, None))
+    merged['durations'].extend(right['durations'])
+    merged['groups'] = _concat_groups(merged['groups'], right['groups'])
+    return merged
+
+
+class PartialAnalytics:
+    """
+    Associative partial aggregate of the user analytics and longest sessions of one log.
+
+    For every user it keeps what a later or earlier log can still change: the
+    leading GATE_OUT (`head_out`, which closes a session left open by the
+    previous log), the trailing GATE_IN (`tail_in`), the session durations in
+    microseconds (8 bytes per session), the days present, and the merged
+    sessions reduced to their first and last groups plus the longest group in
+    between.
+    Merging partials of consecutive logs reconciles the sessions crossing
+    the seam, so `merge` is associative and the partials of any split of a
+    log can be combined in any grouping. Ranks and orderings are only
+    computed by `results`.
+
+    Users keep their order of first appearance and hours are summed session by
+    session in log order, so the results, ties and rounding included, are
+    identical to `calculate_analytics` over the concatenated logs.
+    """
+
+    def __init__(self, users=None):
+        self.users = users if users is not None else {}
+
+    @classmethod
+    def from_events(cls, events):
+        """
+        Builds the partial of one log.
+
+        Args:
+            events (iterable): EventStore, cleaned event dicts or (user_id, event_type, event_time)
+                               tuples, in log order.
+
+        Returns:
+            PartialAnalytics: The partial aggregate.
+        """
+        users = {}
+        open_ins = {}
+        for user_id, event_type, event_time in iter_event_tuples(events):
+            if not isinstance(event_time, int):
+                event_time = to_epoch_micros(event_time)
+            state = users.get(user_id)
+            if state is None:
+                state = users[user_id] = _new_user()
+                if event_type not in IN_EVENTS:
+                    state['head_out'] = event_time
+                    continue
+            if event_type in IN_EVENTS:
+                open_ins[user_id] = event_time
+            else:
+                start = open_ins.pop(user_id, None)
+                if start is not None:
+                    session = (start, event_time)
+                    state['durations'].append(_duration(session))
+                    state['days'].add(start // MICROS_PER_DAY)
+                    state['groups'] = _concat_groups(state['groups'], (1, session, session, None))
+        for user_id, start in open_ins.items():
+            users[user_id]['tail_in'] = start
+        return cls(users)
+
+    @classmethod
+    def from_csv(cls, file_path, quarantine=None):
+        """Reads, cleans and summarizes one gate log (.csv or .csv.gz)."""
+        return cls.from_events(EventStore.from_csv(file_path, quarantine=quarantine))
+
+    def merge(self, other):
+        """
+        Combines this partial with the partial of the log that follows it.
+
+        Args:
+            other (PartialAnalytics): Partial of the next log.
+
+        Returns:
+            PartialAnalytics: A new partial covering both logs.
+        """
+        users = dict(self.users)
+        for user_id, state in other.users.items():
+            users[user_id] = _merge_user(users[user_id], state) if user_id in users else state
+        return PartialAnalytics(users)
+
+    def results(self, limit=None):
+        """
+        Finalizes the ranks and orderings.
+
+        Args:
+            limit (int, optional): Only return the top `limit` users of each list, selected with a bounded heap.
+
+        Returns:
+            tuple: (user_analytics, longest_sessions), as returned by `calculate_analytics`.
+        """
+        user_analytics, longest_sessions = [], []
+        for user_id, state in self.users.items():
+            days_present = len(state['days'])
+            total_time = 0
+            for duration in state['durations']:
+                total_time += to_hours(duration)
+            average_per_day = total_time / days_present if days_present > 0 else 0
+            user_analytics.append({
+                'user_id': user_id,
+                'time': round(total_time, 2),
+                'days': days_present,
+                'average_per_day': round(average_per_day, 2)
+            })
+
+            count, first, last, inner = state['groups']
+            longest = 0
+            if count:
+                longest = max(_duration(first), _duration(last), inner if inner is not None else _duration(first))
+                longest = to_hours(longest)
+            longest_sessions.append({"user_id": user_id, "session_length": longest})
+
+        return (rank_rows(user_analytics, 'average_per_day', limit),
+                top_n(longest_sessions, limit, key=lambda x: x["session_length"]))
+
+
+def merge_partials(partials):
+    """
+    Merges the partials of consecutive logs, in order.
+
+    Adjacent pairs are merged level by level, so each user's state is copied
+    O(log n) times rather than once per log.
+    """
+    partials = list(partials)
+    if not partials:
+        return PartialAnalytics()
+    while len(partials) > 1:
+        merged = [left.merge(right) for left, right in zip(partials[::2], partials[1::2])]
+        if len(partials) % 2:
+            merged.append(partials[-1])
+        partials = merged
+    return partials[0]
+
+
+def _summarize_file(file_path):
+    """Worker: the partial of one log and its rejected rows (`Quarantine.tracked`)."""
+    quarantine = Quarantine(sample_limit=0)
+    quarantine.track()
+    return PartialAnalytics.from_csv(file_path, quarantine=quarantine), quarantine.tracked()
+
+
+def calculate_analytics_files(file_paths, workers=None, executor="process", quarantine=None):
+    """
+    Computes company-wide analytics over many gate logs concurrently.
+
+    Each log is summarized into a `PartialAnalytics` in its own worker, the
+    partials are merged in the given order and ranks are finalized once, so
+    the result is that of `calculate_analytics` over the logs concatenated
+    in that order (e.g. one log per building per month).
+
+    Args:
+        file_paths (list): Paths of the logs (.csv or .csv.gz), in log order.
+        workers (int, optional): Pool size (defaults to the CPU count).
+        executor (str): "process" or "thread".
+        quarantine (Quarantine, optional): Sink the rejected rows of every log are merged
+            into, in log order; closed by the caller. By default a sink that prints a
+            sample and a summary line is used.
+
+    Returns:
+        tuple: (user_analytics, longest_sessions).
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {executor!r}. Expected one of {tuple(EXECUTORS)}.")
+    workers = workers or os.cpu_count() or 1
+    sink = quarantine if quarantine is not None else Quarantine()
+    partials = []
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        pending = [pool.submit(_summarize_file, file_path) for file_path in file_paths]
+        try:
+            while pending:
+                partial, rejections = pending.pop(0).result()
+                sink.merge(rejections, remove=True)
+                partials.append(partial)
+        except BaseException:
+            discard_rejections(pending)
+            raise
+    if quarantine is None:
+        sink.close()
+    return merge_partials(partials).results()
@@ -0,0 +1,457 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+from .analytics import calculate_analytics, calculate_longest_session, calculate_time_and_days
+from .data_process import iter_csv, iter_normalized, stream_events
+from .event_store import EventStore
+from .instrumentation import NULL_PROFILER
+from .quarantine import Quarantine
+
+# The NumPy-backed stages (clustering, sorting, parallel analytics, rollup, occupancy)
+# import their modules when they run, so a pipeline that does not need them never loads NumPy.
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_K_RANGE = range(2, 16)  # Same as clustering.DEFAULT_K_RANGE
+DEFAULT_SORT_MEMORY = 256 * 1024 * 1024  # Same as external_sort.DEFAULT_MEMORY_BUDGET
+
+
+def file_digest(file_path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version():
+    """Hash of the package sources, so cached artifacts are invalidated by code changes."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(SOURCE_DIR)):
+        if name.endswith(".py"):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(SOURCE_DIR, name), "rb") as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    On-disk cache of stage outputs, keyed by content.
+
+    A key combines the stage name, its parameters, the keys of its upstream
+    stages and the code version, so it changes whenever anything that could
+    change the output changes.
+
+    Args:
+        directory (str): Directory the artifacts are stored in.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.version = code_version()
+
+    def key(self, stage, params, upstream=()):
+        payload = json.dumps({"stage": stage, "params": params, "upstream": list(upstream), "code": self.version},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, stage, key, suffix=".pkl"):
+        return os.path.join(self.directory, f"{stage}-{key[:16]}{suffix}")
+
+    def load(self, path, loader):
+        return loader(path) if os.path.exists(path) else None
+
+    def save(self, path, value, saver):
+        """Writes through a temporary file, so an interrupted run never leaves a partial artifact."""
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        saver(value, temporary)
+        os.replace(temporary, path)
+
+
+def _load_pickle(path):
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def _save_pickle(value, path):
+    with open(path, "wb") as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _save_store(store, path):
+    store.save(path)
+
+
+def _save_npz(value, path):
+    value.save(path)  # DailyRollup and FeatureMatrix write .npz files
+
+
+def _load_rollup(path):
+    from .rollup import DailyRollup
+    return DailyRollup.load(path)
+
+
+def _load_features(path):
+    from .features import FeatureMatrix
+    return FeatureMatrix.load(path)
+
+
+def _rows(value):
+    """Row count of a stage result; tuple results count their last part (users, or k values for k_selection)."""
+    if value is None:
+        return None
+    return len(value[-1]) if isinstance(value, tuple) else len(value)
+
+
+class Pipeline:
+    """
+    The analytics pipeline as explicit stages passing typed results in memory.
+
+    Stages are `events` (ingest the CSV into an EventStore), `analytics` (user
+    analytics and longest sessions, computed together), `user_analytics` and
+    `longest_sessions` (either half alone, for runs that need only one of
+    them), `features` (the per-user `FeatureMatrix`), `clusters`, `rollup` (the per-user,
+    per-day table behind date-range queries) and `occupancy` (the interval
+    index of the merged sessions). Each is computed lazily
+    and at most once; with a cache, a stage whose key is already on disk is
+    loaded instead, and its upstream stages are not even touched. Re-running
+    with a new `k` therefore only re-clusters.
+
+    Args:
+        input_path (str or list): Raw gate log (.csv or .csv.gz), or a list of consecutive
+            logs (e.g. one per building per month). Several logs are summarized
+            concurrently into partial aggregates (see `partials.calculate_analytics_files`),
+            which replaces the `events` stage.
+        cache (ArtifactCache, optional): Where to reuse and store stage outputs.
+        engine (str): Analytics engine ("python" or "numpy").
+        workers (int): Processes for ingest and analytics.
+        k (int or str): Number of clusters, or "auto" to pick it with `choose_k` over `k_range`
+            (the `k_selection` stage, which also keeps the score table).
+        k_range (iterable): Candidate k values for k="auto".
+        features (tuple or str, optional): Cluster on these columns of the `FeatureMatrix`
+            (or "all" of them, see `features.FEATURE_NAMES`) instead of the user analytics'
+            average_per_day and days.
+        seed (int, optional): Clustering seed.
+        clustering_method (str): "full" or "minibatch", see `employee_clustering`.
+        profiler (Profiler, optional): Records every stage, cache loads and saves included.
+        state_path (str, optional): Incremental state file. When given, the input is treated
+            as a new batch: it is applied on top of the saved per-user state (once per input
+            digest) and `analytics` and `clusters` reflect all batches so far. These two
+            stages are then not cached.
+        sort_events (bool): Order the events by (user, event_time) with `external_sort`
+            before the analytics, for logs merged from several gates or written out of order.
+            With the python engine (and no state) the sorted runs are streamed straight into
+            `analytics`, so no EventStore of the whole log is built; other engines and the
+            stages that need the events collect the sorted runs into one.
+        sort_memory (int): Memory budget of the sort, in bytes.
+        model_path (str, optional): Saved `KMeansModel`. When the file exists, `clusters`
+            scores the users with it instead of retraining (k is then the model's); when it
+            does not, or with `retrain`, a model is trained and saved there. The clusters
+            stage is then not cached.
+        retrain (bool): Retrain the saved model, warm-started from its centroids so
+            cluster ids stay the same.
+        stream (bool): Compute `analytics` in one pass over the CSV rows (`data_process.stream_events`,
+            or the sorted runs with `sort_events`) instead of from the `events` stage, so memory
+            grows with the number of users rather than events. Needs a single log, the python
+            engine and one worker, without state; stages that need the events (features, rollup,
+            occupancy) still build them.
+        quarantine (Quarantine, optional): Sink for the rows rejected while reading the log,
+            by this process or its workers. The rejected rows are cached with the events, so
+            a run served from the cache reports (and strictly checks) the same rows.
+    """
+
+    def __init__(self, input_path, cache=None, engine="numpy", workers=1, k=3, seed=0, clustering_method="full",
+                 profiler=None, state_path=None, sort_events=False, sort_memory=DEFAULT_SORT_MEMORY,
+                 model_path=None, retrain=False, quarantine=None, k_range=DEFAULT_K_RANGE, features=None,
+                 stream=False):
+        self.input_path = input_path
+        self.input_paths = list(input_path) if isinstance(input_path, (list, tuple)) else None
+        if self.input_paths and (state_path or sort_events):
+            raise ValueError("Incremental state and event sorting need a single input log.")
+        if stream and (self.input_paths or state_path or workers > 1 or engine != "python"):
+            raise ValueError("Streaming analytics need a single input log, the python engine and one worker, "
+                             "without incremental state.")
+        self.cache = cache
+        self.engine = engine
+        self.workers = workers
+        self.k = k
+        self.k_range = list(k_range)
+        self.features = features if features is None or features == "all" else list(features)
+        self.seed = seed
+        self.clustering_method = clustering_method
+        self.profiler = profiler or NULL_PROFILER
+        self.state_path = state_path
+        self.sort_events = sort_events
+        self.sort_memory = sort_memory
+        self.model_path = model_path
+        self.retrain = retrain
+        self.quarantine = quarantine
+        # Sorted events are streamed into the analytics whenever the engine does not need a store
+        self.stream = stream or (sort_events and engine == "python" and not state_path)
+        self.computed = []  # Stages that were actually run, in order
+        self._results = {}
+        self._keys = {}
+        self._replayed = False  # Whether the quarantine has seen the rejected rows of the log
+
+    def key(self, stage):
+        """Cache key of a stage, derived without running anything upstream."""
+        if stage not in self._keys:
+            if stage == "events":
+                key = self.cache.key("events", {"input": file_digest(self.input_path), "sorted": self.sort_events})
+            elif stage == "analytics" and self.input_paths:
+                key = self.cache.key("analytics", {"inputs": [file_digest(path) for path in self.input_paths]})
+            elif stage in ("analytics", "user_analytics", "longest_sessions", "features", "rollup", "occupancy"):
+                key = self.cache.key(stage, {}, [self.key("events")])
+            elif stage == "k_selection":
+                key = self.cache.key(stage, {"k_range": self.k_range, "seed": self.seed, "features": self.features},
+                                     [self.key("analytics")])
+            else:
+                params = {"k": self.k, "seed": self.seed, "method": self.clustering_method, "features": self.features}
+                if self.k == "auto":
+                    params["k_range"] = self.k_range
+                key = self.cache.key("clusters", params, [self.key("analytics")])
+            self._keys[stage] = key
+        return self._keys[stage]
+
+    def _cached(self, stage):
+        return bool(self.cache) and os.path.exists(self.cache.path(stage, self.key(stage)))
+
+    def _rejections_paths(self):
+        """
+        Cache paths of what the stage reading the raw log(s) rejected: its count of
+        accepted rows (a pickle) and its rejected rows (a quarantine CSV).
+        """
+        stage = "analytics" if self.input_paths or self.stream else "events"
+        key = self.key(stage)
+        return self.cache.path(stage, key, ".rejections.pkl"), self.cache.path(stage, key, ".rejections.csv")
+
+    def _load_rejections(self):
+        """The cached `Quarantine.tracked` output of the stage reading the raw log(s), if any."""
+        accepted_path, rows_path = self._rejections_paths()
+        accepted = self.cache.load(accepted_path, _load_pickle)
+        return (accepted, rows_path) if accepted is not None and os.path.exists(rows_path) else None
+
+    def _run(self, stage, compute, inputs=tuple, suffix=".pkl", loader=_load_pickle, saver=_save_pickle,
+             reads_input=False):
+        """
+        Loads a stage from the cache or computes it; upstream `inputs` are resolved outside its timing.
+
+        A stage that `reads_input` (parses the raw log) gets the quarantine as its first argument, and
+        the rows it rejected are cached with its result. The first cache hit of a run merges them into
+        the quarantine, so the quarantine file, the counts and the strict check are the same as if the
+        log had been read again.
+        """
+        if stage in self._results:
+            return self._results[stage]
+        cacheable = self.cache and not (self.state_path and stage in ("analytics", "clusters", "k_selection")) and \
+            not (self.model_path and stage == "clusters")
+        path = self.cache.path(stage, self.key(stage), suffix) if cacheable else None
+        value = seen = None
+        if path:
+            with self.profiler.stage(f"{stage}:cache_load") as record:
+                value = self.cache.load(path, loader)
+                if value is not None and self.quarantine is not None and not self._replayed:
+                    seen = self._load_rejections()
+                    value = value if seen is not None else None  # Recompute rather than lose the rejections
+                record.update(hit=value is not None, rows_out=_rows(value))
+            if seen is not None:
+                self._replayed = True
+                self.quarantine.merge(seen)
+        if value is None:
+            upstream = inputs()
+            with self.profiler.stage(stage, rows_in=_rows(upstream[0]) if upstream else None) as record:
+                if reads_input:
+                    # Rows already reported in this run (a downstream stage came from the cache) go unreported
+                    reported = self._replayed
+                    if reported:
+                        sink = Quarantine(sample_limit=0)
+                    else:
+                        sink = self.quarantine if self.quarantine is not None else Quarantine()
+                    sink.track()
+                    try:
+                        value = compute(sink, *upstream)
+                    except BaseException:
+                        os.remove(sink.tracked()[1])
+                        raise
+                    seen = sink.tracked()
+                    if sink is not self.quarantine and not reported:
+                        sink.close()
+                    self._replayed = True
+                else:
+                    value = compute(*upstream)
+                record["rows_out"] = _rows(value)
+            self.computed.append(stage)
+            if path:
+                with self.profiler.stage(f"{stage}:cache_save"):
+                    if reads_input:
+                        accepted_path, rows_path = self._rejections_paths()
+                        self.cache.save(rows_path, seen[1], shutil.copyfile)
+                        self.cache.save(accepted_path, seen[0], _save_pickle)
+                    self.cache.save(path, value, saver)
+            if reads_input:
+                os.remove(seen[1])
+        self._results[stage] = value
+        return value
+
+    def _read_csv_parallel(self, quarantine):
+        """The input parsed by `self.workers` processes; the read report (MB/s, chunks) goes to the profiler."""
+        from .csv_reader import read_csv_parallel
+
+        store, report = read_csv_parallel(self.input_path, workers=self.workers, quarantine=quarantine)
+        self.profiler.record("read_csv_parallel", workers=self.workers, **report)
+        return store
+
+    def _sorted_events(self, quarantine):
+        """
+        The log's events ordered by `external_sort`, as `SortedEvents` (close it when done).
+
+        Rows are streamed from the CSV into the sort; with several workers they are
+        parsed in parallel first, and that store is released once it is in the runs.
+        """
+        from .external_sort import external_sort
+
+        if self.workers > 1:
+            events = self._read_csv_parallel(quarantine)
+        else:
+            events = iter_normalized(iter_csv(self.input_path), as_micros=True, quarantine=quarantine)
+        return external_sort(events, self.sort_memory)
+
+    def events(self):
+        """Stage 1: the cleaned events as an EventStore."""
+        if self.input_paths:
+            raise ValueError("The events stage needs a single input log.")
+
+        def compute(quarantine):
+            if self.sort_events:
+                with self._sorted_events(quarantine) as events:
+                    return events.to_store()
+            if self.workers > 1:
+                return self._read_csv_parallel(quarantine)
+            return EventStore.from_csv(self.input_path, quarantine=quarantine)
+        return self._run("events", compute, suffix=".store", loader=EventStore.load, saver=_save_store,
+                         reads_input=True)
+
+    def analytics(self):
+        """Stage 2: (user_analytics, longest_sessions)."""
+        if self.input_paths:
+            from .partials import calculate_analytics_files
+            return self._run("analytics", lambda quarantine: calculate_analytics_files(
+                self.input_paths, workers=self.workers, quarantine=quarantine), reads_input=True)
+        if self.stream:
+            def stream(quarantine):
+                if not self.sort_events:
+                    return calculate_analytics(stream_events(self.input_path, quarantine=quarantine),
+                                               engine=self.engine)
+                with self._sorted_events(quarantine) as events:
+                    return calculate_analytics(events, engine=self.engine)
+            return self._run("analytics", stream, reads_input=True)
+
+        def compute(store):
+            if self.state_path:
+                from .incremental import IncrementalAnalytics
+                incremental = IncrementalAnalytics.load(self.state_path)
+                incremental.update(store, batch_id=file_digest(self.input_path))
+                incremental.save(self.state_path)
+                return incremental.results()
+            if self.workers > 1:
+                from .parallel import calculate_analytics_parallel
+                return calculate_analytics_parallel(store, workers=self.workers, engine=self.engine)
+            return calculate_analytics(store, engine=self.engine)
+        return self._run("analytics", compute, lambda: (self.events(),))
+
+    def user_analytics(self):
+        """Stage 2, first half: the user analytics, without computing the longest sessions."""
+        return self._analytics_part("user_analytics", 0, calculate_time_and_days)
+
+    def longest_sessions(self):
+        """Stage 2, second half: the longest sessions, without computing the user analytics."""
+        return self._analytics_part("longest_sessions", 1, calculate_longest_session)
+
+    def _analytics_part(self, stage, index, calculate):
+        # Take it from the combined stage when that is already at hand, or when the
+        # combined stage is the only way to compute it (several logs, incremental state,
+        # parallel workers, streaming); otherwise compute just this half.
+        if "analytics" in self._results or self.input_paths or self.state_path or self.workers > 1 or \
+                self.stream or self._cached("analytics"):
+            return self.analytics()[index]
+        return self._run(stage, lambda store: calculate(store, engine=self.engine), lambda: (self.events(),))
+
+    def feature_matrix(self):
+        """Stage 2b: the `FeatureMatrix` of every user, built in one pass over the events."""
+        if self.input_paths:
+            raise ValueError("The features stage needs a single input log.")
+
+        def compute(store):
+            from .features import FeatureMatrix
+            return FeatureMatrix.from_store(store)
+        return self._run("features", compute, lambda: (self.events(),), suffix=".npz", loader=_load_features,
+                         saver=_save_npz)
+
+    def _cluster_input(self):
+        """What `clusters` runs on: the user analytics, or the selected `features` columns."""
+        if self.features is None:
+            return self.user_analytics()
+        matrix = self.feature_matrix()
+        return matrix if self.features == "all" else matrix.select(self.features)
+
+    def k_selection(self):
+        """Stage 3a: (best_k, score table) of `choose_k` over `k_range`, scored in `workers` processes."""
+        def compute(users):
+            from .clustering import choose_k, user_features
+            data = user_features(users) if self.features is None else users.standardized().values
+            return choose_k(data, self.k_range, seed=self.seed, workers=self.workers)
+        return self._run("k_selection", compute, lambda: (self._cluster_input(),))
+
+    def cluster_count(self):
+        """The k used by `clusters`: the given one, or the one picked by `k_selection`."""
+        return self.k_selection()[0] if self.k == "auto" else self.k
+
+    def clusters(self):
+        """Stage 3: cluster assignments computed from the in-memory user analytics."""
+        def compute(user_analytics, k):
+            if self.model_path:
+                return self._model_clusters(user_analytics, k)
+            from .clustering import employee_clustering
+            return employee_clustering(user_analytics, k=k, seed=self.seed, method=self.clustering_method,
+                                       profiler=self.profiler)
+        return self._run("clusters", compute, lambda: (self._cluster_input(), self.cluster_count()))
+
+    def _model_clusters(self, user_analytics, k):
+        from .clustering import FEATURES, KMeansModel, user_features
+        model = KMeansModel.load(self.model_path) if os.path.exists(self.model_path) else None
+        if model is None or self.retrain:
+            if self.features is None:
+                data, features = user_features(user_analytics), FEATURES
+            else:
+                data, features = user_analytics.values, user_analytics.features
+            same = model is not None and model.k == k and model.features == tuple(features)
+            warm_start = model if same else None
+            model = KMeansModel.fit(data, k, seed=self.seed, warm_start=warm_start, features=features)
+            model.save(self.model_path)
+            self.profiler.record("kmeans", method="model", users=len(user_analytics), warm_start=warm_start is not None,
+                                 inertia=model.inertia)
+        return model.assign(user_analytics)
+
+    def rollup(self):
+        """Stage 4: the `DailyRollup` of the events, for date-range queries."""
+        if self.input_paths:
+            raise ValueError("The rollup stage needs a single input log.")
+        def compute(store):
+            from .rollup import DailyRollup
+            return DailyRollup.from_store(store)
+        return self._run("rollup", compute, lambda: (self.events(),), suffix=".npz", loader=_load_rollup,
+                         saver=_save_npz)
+
+    def occupancy(self):
+        """Stage 5: the `OccupancyIndex` of the merged sessions."""
+        if self.input_paths:
+            raise ValueError("The occupancy stage needs a single input log.")
+        def compute(store):
+            from .occupancy import OccupancyIndex
+            return OccupancyIndex.from_store(store)
+        return self._run("occupancy", compute, lambda: (self.events(),))
@@ -0,0 +1,269 @@
+import csv
+import io
+import os
+import tempfile
+import time
+
+from .sinks import AtomicFile
+
+REASONS = ("empty_user", "unknown_event_type", "bad_timestamp", "malformed_row")
+QUARANTINE_FIELDS = ["reason", "user_id", "event_type", "event_time", "raw", "error"]
+
+
+class InvalidRowError(ValueError):
+    """A raw row that cannot be cleaned, with the reason it was rejected (one of `REASONS`)."""
+
+    def __init__(self, reason, message="Invalid row data"):
+        super().__init__(message)
+        self.reason = reason
+
+
+class QuarantineError(ValueError):
+    """Raised in strict mode once too large a fraction of the rows has been rejected."""
+
+
+def raw_line(row):
+    """
+    A raw row as a CSV line, every column in file order (extra columns of a long line included).
+
+    Parsing the line with the log's header gives the row back, so quarantined rows can be replayed.
+    """
+    if isinstance(row, dict):
+        values = [value for key, value in row.items() if key is not None]
+        while values and values[-1] is None:  # Columns missing from a short line
+            values.pop()
+        values += row.get(None) or []  # csv.DictReader's restkey
+    else:
+        values = list(row) if isinstance(row, (list, tuple)) else [row]
+    line = io.StringIO()
+    csv.writer(line, lineterminator="").writerow(values)
+    return line.getvalue()
+
+
+def rejection_reason(error):
+    """The `REASONS` entry for an exception raised while cleaning a row."""
+    return error.reason if isinstance(error, InvalidRowError) else "malformed_row"
+
+
+def discard_rejections(futures):
+    """Cancels worker futures that return (result, `Quarantine.tracked`) and removes the files of finished ones."""
+    for future in futures:
+        future.cancel()
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            os.remove(future.result()[1][1])
+
+
+class Quarantine:
+    """
+    Rejection sink shared by every cleaner.
+
+    Rejected rows are counted per reason and, with a `path`, written to a
+    quarantine CSV (reason, parsed fields, the raw line and the error) in
+    buffered batches instead of being printed one by one. The file is
+    written atomically on `close`, header included even when nothing was
+    rejected, so it always describes the current run. Only a sample is
+    printed: at most `sample_limit` rows per `sample_interval` seconds.
+    `summary` reports the counts, and `close` prints a one-line summary.
+
+    In strict mode, cleaning fails fast with `QuarantineError` once at least
+    `min_rows` rows were seen and the rejected fraction exceeds
+    `max_error_ratio` (checked again on `close`, for shorter inputs); the
+    rows rejected so far are committed to the file first.
+
+    Worker processes `track` their rows into a temporary file and return it;
+    the caller's sink `merge`s it.
+
+    Args:
+        path (str, optional): Quarantine CSV to write the rejected rows to.
+        strict (bool): Fail once the error ratio passes `max_error_ratio`.
+        max_error_ratio (float): Largest tolerated fraction of rejected rows in strict mode.
+        min_rows (int): Rows to see before the ratio is checked in strict mode.
+        sample_limit (int): Rejected rows printed per `sample_interval`.
+        sample_interval (float): Length of the sampling window, in seconds.
+        buffer_rows (int): Rejected rows buffered between writes to the file.
+    """
+
+    def __init__(self, path=None, strict=False, max_error_ratio=0.01, min_rows=1000, sample_limit=5,
+                 sample_interval=10.0, buffer_rows=10_000):
+        self.path = path
+        self.strict = strict
+        self.max_error_ratio = max_error_ratio
+        self.min_rows = min_rows
+        self.sample_limit = sample_limit
+        self.sample_interval = sample_interval
+        self.buffer_rows = buffer_rows
+        self.accepted = 0
+        self.counts = dict.fromkeys(REASONS, 0)
+        self._buffer = []
+        self._file = None  # AtomicFile of `path`, opened on the first flush
+        self._writer = None
+        self._committed = False
+        self._window_start = None
+        self._window_printed = 0
+        self._suppressed = 0
+        self._tracked = None  # (file, writer, path) of `track`
+        self._tracked_from = 0
+
+    @property
+    def rejected(self):
+        return sum(self.counts.values())
+
+    def accept(self):
+        self.accepted += 1
+
+    def reject(self, row, error):
+        """Records a rejected raw row and the exception that rejected it."""
+        reason = rejection_reason(error)
+        fields = row if isinstance(row, dict) else {}
+        self._record([reason, fields.get("user_id"), fields.get("event_type"), fields.get("event_time"),
+                      raw_line(row), str(error)])
+        self._sample(row, error)
+        if self.strict and self.accepted + self.rejected >= self.min_rows:
+            self._check_ratio()
+
+    def _record(self, record):
+        """Counts a rejected row (a `QUARANTINE_FIELDS` list), tracks it and buffers it for the file."""
+        self.counts[record[0]] += 1
+        if self._tracked is not None:
+            self._tracked[1].writerow(record)
+        if self.path:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.buffer_rows:
+                self.flush()
+
+    def track(self):
+        """
+        Starts copying the rows seen from now on to a temporary quarantine CSV, until `tracked`.
+
+        The file is written through a buffer, so a worker's memory does not
+        grow with its rejected rows.
+        """
+        handle, path = tempfile.mkstemp(prefix="quarantine-", suffix=".csv")
+        file = open(handle, "w", newline="", encoding="utf-8")
+        writer = csv.writer(file)
+        writer.writerow(QUARANTINE_FIELDS)
+        self._tracked, self._tracked_from = (file, writer, path), self.accepted
+
+    def tracked(self):
+        """
+        Stops `track` and returns what was seen since, for `merge` (in another process, or a later run).
+
+        Returns:
+            tuple: (accepted, path), the number of accepted rows and the temporary
+                   quarantine CSV of the rejected ones, which the caller removes.
+        """
+        file, _, path = self._tracked
+        file.close()
+        self._tracked = None
+        return self.accepted - self._tracked_from, path
+
+    def merge(self, tracked, remove=False):
+        """
+        Adds the rows of another sink's `tracked` output (e.g. from a worker process) as if seen here.
+
+        Rejected rows are read back one at a time, counted, written to the
+        quarantine file and sampled like local ones, and the strict check runs
+        once for the whole batch.
+
+        Args:
+            tracked (tuple): (accepted, path), as returned by `tracked`.
+            remove (bool): Delete the file once read (a worker's temporary file).
+        """
+        accepted, path = tracked
+        self.accepted += accepted
+        try:
+            with open(path, newline="", encoding="utf-8") as file:
+                reader = csv.reader(file)
+                next(reader)  # Header
+                for record in reader:
+                    self._record(record)
+                    self._sample(dict(zip(QUARANTINE_FIELDS[1:4], record[1:4])), record[-1])
+        finally:
+            if remove:
+                os.remove(path)
+        if self.strict and self.accepted + self.rejected >= self.min_rows:
+            self._check_ratio()
+
+    def _sample(self, row, error):
+        now = time.monotonic()
+        if self._window_start is None or now - self._window_start >= self.sample_interval:
+            self._window_start, self._window_printed = now, 0
+        if self._window_printed < self.sample_limit:
+            self._window_printed += 1
+            print(f"Skipping invalid row: {row} | Error: {error}")
+        else:
+            self._suppressed += 1
+
+    def _check_ratio(self):
+        ratio = self.error_ratio()
+        if ratio > self.max_error_ratio:
+            self._commit()  # Keep the rows that tripped the check
+            raise QuarantineError(f"{self.rejected} of {self.accepted + self.rejected} rows rejected "
+                                  f"({ratio:.1%} > {self.max_error_ratio:.1%}): {self._reasons_text()}")
+
+    def error_ratio(self):
+        total = self.accepted + self.rejected
+        return self.rejected / total if total else 0.0
+
+    def flush(self):
+        """Writes the buffered rejected rows to the (still temporary) quarantine file."""
+        if not self.path or self._committed:
+            return
+        if self._writer is None:
+            self._file = AtomicFile(self.path)
+            self._writer = csv.writer(self._file.file)
+            self._writer.writerow(QUARANTINE_FIELDS)
+        self._writer.writerows(self._buffer)
+        self._buffer = []
+
+    def _commit(self):
+        """Flushes and moves the quarantine file into place; later rows are only counted."""
+        if self.path and not self._committed:
+            self.flush()
+            self._file.commit()
+            self._committed = True
+            self._file = self._writer = None
+
+    def _reasons_text(self):
+        return ", ".join(f"{reason}: {count}" for reason, count in self.counts.items() if count)
+
+    def close(self):
+        """
+        Commits the quarantine file, prints a summary line if rows were rejected and applies the strict check.
+
+        Returns:
+            dict: The `summary`.
+        """
+        self._commit()
+        if self.rejected:
+            hidden = f", {self._suppressed} not printed" if self._suppressed else ""
+            where = f", quarantined to {self.path}" if self.path else ""
+            print(f"Skipped {self.rejected} invalid rows ({self._reasons_text()}{hidden}{where})")
+        if self.strict:
+            self._check_ratio()
+        return self.summary()
+
+    def summary(self):
+        """
+        Returns:
+            dict: 'rows', 'accepted', 'rejected', 'error_ratio', 'reasons' (count per reason)
+                  and 'quarantine_path'.
+        """
+        return {
+            "rows": self.accepted + self.rejected,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "error_ratio": self.error_ratio(),
+            "reasons": dict(self.counts),
+            "quarantine_path": self.path,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self._commit()
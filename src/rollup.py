@@ -0,0 +1,156 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from .analytics import to_hours
+from .leaderboard import rank_rows
+from .timestamps import EPOCH, MICROS_PER_DAY, from_epoch_micros
+from .vectorized import paired_sessions
+
+_COLUMNS = ("user", "day", "micros", "sessions", "first_in", "last_out")
+
+
+def epoch_day(value):
+    """Days since the Unix epoch of a date, datetime or 'YYYY-MM-DD' string."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    if not isinstance(value, date):
+        raise ValueError(f"Expected a date, got {value!r}")
+    return (date(value.year, value.month, value.day) - EPOCH.date()).days
+
+
+class DailyRollup:
+    """
+    Per-user, per-day rollup of the paired sessions, for date-range queries.
+
+    Every row holds a user, a day, the time present that day (integer
+    microseconds), the number of sessions, the first GATE_IN and the last
+    GATE_OUT. A session counts towards the day of its GATE_IN, as in
+    `calculate_time_and_days`. Rows are sorted by user (in order of first
+    appearance) then day, and `by_day` is a date index: the row numbers
+    sorted by day, so a range query touches only the rows of the days in it.
+
+    Build it once with `from_store` and keep it with `save`/`load`.
+    """
+
+    def __init__(self, user_ids, user, day, micros, sessions, first_in, last_out):
+        self.user_ids = list(user_ids)
+        self.user = user
+        self.day = day
+        self.micros = micros
+        self.sessions = sessions
+        self.first_in = first_in
+        self.last_out = last_out
+        self.by_day = np.lexsort((user, day))
+        self._day_keys = day[self.by_day]
+        self._user_offsets = np.searchsorted(user, np.arange(len(self.user_ids) + 1))
+        self._codes = {user_id: code for code, user_id in enumerate(self.user_ids)}
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Builds the rollup from an EventStore, pairing sessions like the analytics.
+
+        Args:
+            store (EventStore): Cleaned events.
+
+        Returns:
+            DailyRollup: The rollup table.
+        """
+        user_order, pair_users, starts, ends = paired_sessions(store)
+        # Re-code users by first appearance, so code order is the ranking tie order
+        position = np.zeros(len(store.user_ids), dtype=np.int32)
+        position[user_order] = np.arange(len(user_order), dtype=np.int32)
+        users, days = position[pair_users], (starts // MICROS_PER_DAY).astype(np.int32)
+
+        order = np.lexsort((days, users))
+        users, days, starts, ends = users[order], days[order], starts[order], ends[order]
+        if len(users):
+            first = np.flatnonzero(np.append(True, (users[1:] != users[:-1]) | (days[1:] != days[:-1])))
+            rows = (users[first], days[first], np.add.reduceat(ends - starts, first),
+                    np.diff(np.append(first, len(users))).astype(np.int32),
+                    np.minimum.reduceat(starts, first), np.maximum.reduceat(ends, first))
+        else:
+            rows = (users, days, np.zeros(0, np.int64), np.zeros(0, np.int32), starts, ends)
+        return cls([store.user_ids[code] for code in user_order.tolist()], *rows)
+
+    def __len__(self):
+        return len(self.user)
+
+    def _day_rows(self, start, end):
+        """Row numbers of the days in [start, end], read through the date index."""
+        low = 0 if start is None else np.searchsorted(self._day_keys, epoch_day(start), side="left")
+        high = len(self._day_keys) if end is None else np.searchsorted(self._day_keys, epoch_day(end), side="right")
+        return self.by_day[low:high]
+
+    def query(self, start=None, end=None, limit=None):
+        """
+        User analytics restricted to the sessions whose GATE_IN falls in a date range.
+
+        Args:
+            start (date or str, optional): First day of the range (inclusive); open if None.
+            end (date or str, optional): Last day of the range (inclusive); open if None.
+            limit (int, optional): Only return the top `limit` users, selected with a bounded heap.
+
+        Returns:
+            list: Dictionaries with 'user_id', 'time', 'days', 'average_per_day' and 'rank',
+                  ranked as `calculate_time_and_days` ranks them, for the users with a
+                  session in the range. Times are summed exactly in microseconds.
+        """
+        rows = self._day_rows(start, end)
+        n_users = len(self.user_ids)
+        users = self.user[rows]
+        totals = np.bincount(users, weights=self.micros[rows], minlength=n_users)
+        days_present = np.bincount(users, minlength=n_users)
+
+        results = []
+        for code in np.flatnonzero(days_present).tolist():
+            total_time = to_hours(int(totals[code]))
+            days_count = int(days_present[code])
+            results.append({
+                'user_id': self.user_ids[code],
+                'time': round(total_time, 2),
+                'days': days_count,
+                'average_per_day': round(total_time / days_count, 2)
+            })
+
+        return rank_rows(results, 'average_per_day', limit)
+
+    def user_days(self, user_id, start=None, end=None):
+        """
+        The rollup rows of one user, read from the user-sorted layout.
+
+        Returns:
+            list: Dictionaries with 'date', 'hours', 'sessions', 'first_in' and 'last_out' (datetimes).
+        """
+        code = self._codes.get(user_id)
+        if code is None:
+            return []
+        low, high = self._user_offsets[code], self._user_offsets[code + 1]
+        days = self.day[low:high]
+        if start is not None:
+            low += np.searchsorted(days, epoch_day(start), side="left")
+        if end is not None:
+            high = self._user_offsets[code] + np.searchsorted(days, epoch_day(end), side="right")
+        return [
+            {
+                'date': EPOCH.date() + timedelta(days=int(self.day[row])),
+                'hours': to_hours(int(self.micros[row])),
+                'sessions': int(self.sessions[row]),
+                'first_in': from_epoch_micros(int(self.first_in[row])),
+                'last_out': from_epoch_micros(int(self.last_out[row])),
+            }
+            for row in range(low, high)
+        ]
+
+    def save(self, file_path):
+        """Writes the rollup columns and user table to an uncompressed .npz file."""
+        with open(file_path, "wb") as file:
+            np.savez(file, user_ids=np.array(self.user_ids, dtype=str),
+                     **{name: getattr(self, name) for name in _COLUMNS})
+
+    @classmethod
+    def load(cls, file_path):
+        """Reads a rollup written by `save`."""
+        with np.load(file_path) as columns:
+            return cls(columns["user_ids"].tolist(), *(columns[name] for name in _COLUMNS))
@@ -0,0 +1,370 @@
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import zlib
+from collections import OrderedDict
+
+FORMATS = ("csv", "jsonl", "columnar")
+EXTENSIONS = {"csv": ".csv", "jsonl": ".jsonl", "columnar": ".npz"}
+BUFFER_SIZE = 1 << 20
+PARTITION_BUFFER_SIZE = 64 << 10  # Per partition file, which can be open by the dozen
+MAX_OPEN_PARTITIONS = 64
+MANIFEST = "_manifest.json"
+
+
+def infer_format(file_path):
+    """
+    Output format and compression from a file name.
+
+    Columnar files are deflated inside the .npz instead, so ".npz.gz" is
+    refused and their compression has to be asked for explicitly.
+
+    Returns:
+        tuple: (format, gzip), e.g. ("csv", True) for "report.csv.gz". Unknown extensions are CSV.
+    """
+    name = str(file_path)
+    compress = name.endswith(".gz")
+    if compress:
+        name = name[:-3]
+        if name.endswith(EXTENSIONS["columnar"]):
+            raise ValueError(f"{file_path}: columnar files are not gzipped; write .npz with compress=True instead.")
+    for format, extension in EXTENSIONS.items():
+        if name.endswith(extension):
+            return format, compress
+    return "csv", compress
+
+
+class AtomicFile:
+    """
+    A file that only appears under its name once it is complete.
+
+    Data goes through a `buffer_size` buffer (and gzip, optionally) to a
+    temporary file next to the target; `commit` renames it over the target
+    in one step, `abort` deletes it. Used as a context manager, it commits on
+    success and aborts on an exception, so a crash never leaves a partial
+    file for downstream jobs to pick up.
+
+    With `append`, the data is added to the end of the file in place
+    instead (a gzipped file gets one more gzip member). That is only atomic
+    when the whole directory is, as for the partitions of `write_rows`.
+
+    Args:
+        file_path (str): Final path.
+        text (bool): Open in text mode (UTF-8, no newline translation) instead of binary.
+        compress (bool): Gzip the contents.
+        buffer_size (int): Write buffer, in bytes.
+        append (bool): Append to the file in place.
+    """
+
+    def __init__(self, file_path, text=True, compress=False, buffer_size=BUFFER_SIZE, append=False):
+        self.path = str(file_path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.append = append
+        self.temporary = self.path if append else f"{self.path}.tmp-{os.getpid()}"
+        self._raw = open(self.temporary, "ab" if append else "wb", buffering=buffer_size)
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6, mtime=0) if compress else None
+        binary = self._gzip or self._raw
+        self.file = io.TextIOWrapper(binary, encoding="utf-8", newline="", write_through=True) if text else binary
+
+    def _close(self):
+        for handle in (self.file, self._gzip, self._raw):
+            if handle is not None and not handle.closed:
+                handle.close()
+
+    def commit(self):
+        self._close()
+        if not self.append:
+            os.replace(self.temporary, self.path)
+
+    def abort(self):
+        self._close()
+        if not self.append and os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class CsvSink:
+    """
+    Writes rows (dicts) as CSV under one header line.
+
+    Fields missing from a row are left empty; a row with a field that is not
+    in `fieldnames` raises ValueError, as `csv.DictWriter` (and so
+    `write_to_csv`) always did, rather than silently dropping the value.
+    """
+
+    def __init__(self, file_path, fieldnames, compress=False, buffer_size=BUFFER_SIZE, append=False):
+        if fieldnames is None:
+            raise ValueError("CSV output needs the field names.")
+        self._file = AtomicFile(file_path, compress=compress, buffer_size=buffer_size, append=append)
+        self._writer = csv.DictWriter(self._file.file, fieldnames=fieldnames)
+        if not append:
+            self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def write_many(self, rows):
+        self._writer.writerows(rows)
+
+    def commit(self):
+        self._file.commit()
+
+    def abort(self):
+        self._file.abort()
+
+
+def _check_fields(row, fields):
+    """Raises ValueError for fields of a row that are not in `fields` (a set), as `csv.DictWriter` does."""
+    extra = row.keys() - fields
+    if extra:
+        raise ValueError(f"dict contains fields not in fieldnames: {', '.join(map(repr, sorted(extra, key=str)))}")
+
+
+class JsonLinesSink:
+    """
+    Writes one JSON object per row; values JSON has no type for are written as strings.
+
+    With `fieldnames`, each object has those keys in that order (missing
+    ones null) and a row with any other field raises ValueError, as in
+    `CsvSink`.
+    """
+
+    def __init__(self, file_path, fieldnames=None, compress=False, buffer_size=BUFFER_SIZE, append=False):
+        self.fieldnames = fieldnames
+        self._fields = frozenset(fieldnames) if fieldnames is not None else None
+        self._file = AtomicFile(file_path, compress=compress, buffer_size=buffer_size, append=append)
+
+    def write(self, row):
+        if self.fieldnames is not None:
+            _check_fields(row, self._fields)
+            row = {field: row.get(field) for field in self.fieldnames}
+        self._file.file.write(json.dumps(row, default=str) + "\n")
+
+    def commit(self):
+        self._file.commit()
+
+    def abort(self):
+        self._file.abort()
+
+
+class ColumnarSink:
+    """
+    Writes the rows as one NumPy array per field in an .npz file (zip-deflated with compression).
+
+    Numbers and booleans keep their dtype; any other column is stored as
+    fixed-width Unicode. The columns are gathered in lists and converted on
+    `commit`, so the rows may still come from an iterator, but a file cannot
+    be appended to. The fields are `fieldnames`, or else the first row's;
+    a row with any other field raises ValueError, as in `CsvSink`. Read back
+    with `read_columnar`.
+    """
+
+    def __init__(self, file_path, fieldnames=None, compress=False, buffer_size=BUFFER_SIZE, append=False):
+        if append:
+            raise ValueError("Columnar files cannot be appended to.")
+        self.fieldnames = list(fieldnames) if fieldnames is not None else None
+        self.columns = None
+        self._path = file_path
+        self._compress = compress
+        self._buffer_size = buffer_size
+
+    def write(self, row):
+        if self.columns is None:
+            self.fieldnames = self.fieldnames or list(row)
+            self.columns = {field: [] for field in self.fieldnames}
+            self._fields = frozenset(self.fieldnames)
+        _check_fields(row, self._fields)
+        for field, column in self.columns.items():
+            column.append(row.get(field))
+
+    def commit(self):
+        import numpy as np
+
+        columns = self.columns or {field: [] for field in self.fieldnames or ()}
+        arrays = {}
+        for field, values in columns.items():
+            array = np.asarray(values)
+            arrays[field] = array.astype(str) if array.dtype == object else array
+        save = np.savez_compressed if self._compress else np.savez
+        with AtomicFile(self._path, text=False, buffer_size=self._buffer_size) as file:
+            save(file, **arrays)
+
+    def abort(self):
+        self.columns = None
+
+
+SINKS = {"csv": CsvSink, "jsonl": JsonLinesSink, "columnar": ColumnarSink}
+
+
+def open_sink(file_path, fieldnames=None, format=None, compress=None, buffer_size=BUFFER_SIZE, append=False):
+    """
+    A sink for one output file, with `write(row)`, `commit()` and `abort()`.
+
+    Args:
+        file_path (str): Output path.
+        fieldnames (list, optional): Fields to write, in order (required for CSV).
+        format (str, optional): One of `FORMATS`; inferred from the extension by default.
+        compress (bool, optional): Gzip (CSV and JSON Lines) or deflate (columnar);
+            inferred from a ".gz" extension by default, which columnar files never have.
+        buffer_size (int): Write buffer, in bytes.
+        append (bool): Add to an existing file in place, without atomicity (CSV and JSON Lines only).
+    """
+    inferred_format, inferred_compress = infer_format(file_path)
+    format = format or inferred_format
+    if format not in SINKS:
+        raise ValueError(f"Unknown output format: {format!r}. Expected one of {FORMATS}.")
+    compress = inferred_compress if compress is None else compress
+    return SINKS[format](file_path, fieldnames, compress=compress, buffer_size=buffer_size, append=append)
+
+
+def by_shard(field, n_shards):
+    """Partition function: the CRC32 shard of a row's `field`, as in `parallel.shard_of`."""
+    width = len(str(n_shards - 1))
+
+    def partition(row):
+        return f"shard={zlib.crc32(str(row[field]).encode('utf-8')) % n_shards:0{width}d}"
+    return partition
+
+
+def by_field(field, transform=str):
+    """Partition function: "field=value" of a row, e.g. by_field("date", lambda day: str(day)[:7]) for months."""
+    def partition(row):
+        return f"{field}={transform(row[field])}"
+    return partition
+
+
+def partition_path(file_path, partition):
+    """Path of one partition: "out/report.csv.gz" and "shard=3" give "out/report/shard=3.csv.gz"."""
+    file_path = str(file_path)
+    name = os.path.basename(file_path)
+    format, compress = infer_format(name)
+    suffix = EXTENSIONS[format] + (".gz" if compress else "")
+    if name.endswith(suffix):
+        stem = name[:-len(suffix)]
+    else:
+        stem, suffix = os.path.splitext(name)
+    safe = str(partition).replace(os.sep, "_")
+    return os.path.join(os.path.dirname(file_path), stem, safe + suffix)
+
+
+def write_rows(file_path, rows, fieldnames=None, format=None, compress=None, partition_by=None,
+               buffer_size=None, max_open=MAX_OPEN_PARTITIONS):
+    """
+    Streams rows into an output file, or into one file per partition, atomically.
+
+    `rows` can be any iterable; CSV and JSON Lines never hold more than the
+    write buffer in memory. Nothing appears under the final name until all
+    rows are written, and an exception removes the temporary files.
+
+    With `partition_by` (a function of the row, such as `by_shard` or
+    `by_field`), the rows are split into "<stem>/<partition><extension>" files
+    next to `file_path`, with a `_manifest.json` listing every partition and
+    its row count. The directory is written under a temporary name and then
+    swapped in whole, so it never mixes partitions of two runs. At most
+    `max_open` partition files are open at a time: when more are needed, the
+    least recently written one is closed and later reopened for appending.
+
+    Args:
+        file_path (str): Output path; its extension selects the format unless `format` is given.
+        rows (iterable): Dictionaries to write.
+        fieldnames (list, optional): Fields to write, in order (required for CSV).
+        format (str, optional): "csv", "jsonl" or "columnar".
+        compress (bool, optional): Compress the output; defaults to a ".gz" extension.
+        partition_by (callable, optional): Partition name of a row.
+        buffer_size (int, optional): Write buffer per file, in bytes (`BUFFER_SIZE`, or
+            `PARTITION_BUFFER_SIZE` per partition file).
+        max_open (int): Partition files kept open at once (columnar partitions are
+            gathered in memory and do not count).
+
+    Returns:
+        int: Number of rows written.
+    """
+    if partition_by is None:
+        sink = open_sink(file_path, fieldnames, format, compress, buffer_size or BUFFER_SIZE)
+        try:
+            if hasattr(sink, "write_many") and hasattr(rows, "__len__"):
+                sink.write_many(rows)  # One C-level loop for in-memory results
+                count = len(rows)
+            else:
+                count = 0
+                for row in rows:
+                    sink.write(row)
+                    count += 1
+        except BaseException:
+            sink.abort()
+            raise
+        sink.commit()
+        return count
+
+    buffer_size = buffer_size or PARTITION_BUFFER_SIZE
+    reopenable = (format or infer_format(file_path)[0]) != "columnar"
+    directory = os.path.dirname(partition_path(file_path, "_"))
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    def staged_path(partition):
+        return os.path.join(staging, os.path.basename(partition_path(file_path, partition)))
+
+    sinks, counts = OrderedDict(), {}  # Open sinks, least recently written first
+    try:
+        for row in rows:
+            partition = partition_by(row)
+            sink = sinks.get(partition)
+            if sink is None:
+                if reopenable and len(sinks) >= max_open:
+                    sinks.popitem(last=False)[1].commit()
+                sink = sinks[partition] = open_sink(staged_path(partition), fieldnames, format, compress,
+                                                    buffer_size, append=partition in counts)
+                counts.setdefault(partition, 0)
+            else:
+                sinks.move_to_end(partition)
+            sink.write(row)
+            counts[partition] += 1
+        while sinks:
+            sinks.popitem(last=False)[1].commit()
+        partitions = [{"partition": partition, "path": os.path.basename(staged_path(partition)),
+                       "rows": counts[partition]} for partition in sorted(counts)]
+        with AtomicFile(os.path.join(staging, MANIFEST)) as file:
+            json.dump({"rows": sum(counts.values()), "partitions": partitions}, file, indent=2)
+    except BaseException:
+        for sink in sinks.values():
+            sink.abort()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _swap_directory(staging, directory)
+    return sum(counts.values())
+
+
+def _swap_directory(staging, directory):
+    """Replaces `directory` (if any) with `staging`; readers briefly see no directory, never a mix."""
+    previous = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, previous)
+    os.replace(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def read_columnar(file_path):
+    """
+    Reads a columnar file written by `write_rows`.
+
+    Returns:
+        dict: Field name -> NumPy array, in the written order.
+    """
+    import numpy as np
+
+    with np.load(file_path) as columns:
+        return {field: columns[field] for field in columns.files}
@@ -0,0 +1,416 @@
+import hashlib
+import heapq
+import math
+import random
+from array import array
+from collections import OrderedDict
+
+from .analytics import IN_EVENTS, OUT_EVENTS, SESSION_BREAK, iter_event_tuples, to_hours
+from .timestamps import MICROS_PER_DAY, to_epoch_micros
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _hash64(key):
+    """Stable 64-bit hash of a string (Python's own `hash` changes between runs)."""
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch in 2**precision one-byte registers.
+
+    The relative standard error is 1.04 / sqrt(2**precision): 1.6% with the
+    default precision of 12 (4 KB), whatever the number of distinct keys.
+    Small counts use linear counting and are nearly exact.
+    """
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key):
+        hashed = _hash64(key)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """Estimated number of distinct keys added."""
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def merge(self, other):
+        """Adds the keys of another sketch of the same precision (a union)."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch: a stack of compactors whose capacities shrink
+    geometrically with depth. A full compactor sorts its items and promotes
+    every other one (a random half) to the next level, where each item
+    weighs twice as much.
+
+    Memory is O(k) items. The normalized rank error is about 1.65% for
+    k=200 at 99% confidence and scales as 1/k, independent of the stream
+    length. The smallest and largest values are kept exactly.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.compactors = [[]]
+        self._random = random.Random(seed)
+        self._set_capacities()
+
+    def _set_capacities(self):
+        levels = len(self.compactors)
+        self._capacities = [max(2, int(math.ceil(self.k * (2 / 3) ** (levels - level - 1)))) for level in range(levels)]
+        self._max_size = sum(self._capacities)
+
+    def _size(self):
+        return sum(len(compactor) for compactor in self.compactors)
+
+    def add(self, value):
+        level0 = self.compactors[0]
+        level0.append(value)
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(level0) >= self._capacities[0]:
+            self._compress()
+
+    def _compress(self):
+        while self._size() >= self._max_size:
+            for level, compactor in enumerate(self.compactors):
+                if len(compactor) >= self._capacities[level]:
+                    break
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+                self._set_capacities()
+            compactor.sort()
+            # An odd item out stays at this level, so the total weight is preserved exactly
+            kept = [compactor.pop()] if len(compactor) % 2 else []
+            self.compactors[level + 1].extend(compactor[self._random.random() < 0.5::2])
+            self.compactors[level] = kept
+
+    def merge(self, other):
+        """Adds the values summarized by another sketch."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        self._set_capacities()
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level].extend(compactor)
+        self.count += other.count
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        self._compress()
+        return self
+
+    def quantile(self, fraction):
+        """Estimated value at a quantile (0..1), or None if the sketch is empty."""
+        if not self.count:
+            return None
+        if fraction <= 0:
+            return self.min
+        if fraction >= 1:
+            return self.max
+        weighted = sorted((value, 1 << level) for level, compactor in enumerate(self.compactors) for value in compactor)
+        target, seen = fraction * self.count, 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return self.max
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of `depth` rows of `width` counters.
+
+    With `add` the counters sum, and an estimate exceeds the true total by at
+    most e/width of the grand total with probability 1 - exp(-depth). With
+    `add_max` they keep the maximum instead (a "count-max" sketch): an
+    estimate never undershoots, and only overshoots when the key collides in
+    every row with a key of a larger value, which for n keys happens with
+    probability below (n / width) ** depth.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def _columns(self, key):
+        hashed = _hash64(key)
+        low, high = hashed & 0xFFFFFFFF, (hashed >> 32) | 1
+        return [(low + row * high) % self.width for row in range(self.depth)]
+
+    def add(self, key, value=1):
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += value
+
+    def add_max(self, key, value):
+        """Raises the key's counters to at least `value`; returns the new estimate."""
+        estimate = None
+        for row, column in zip(self.rows, self._columns(key)):
+            if value > row[column]:
+                row[column] = value
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+    def merge(self, other, maximum=False):
+        """Adds another sketch of the same shape: counters sum, or keep the maximum for `add_max`."""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge count-min sketches of different width or depth")
+        combine = max if maximum else (lambda mine, theirs: mine + theirs)
+        self.rows = [array("q", map(combine, row, other_row)) for row, other_row in zip(self.rows, other.rows)]
+        return self
+
+
+class TopN:
+    """Keeps the `n` keys with the largest scores seen; a key's score only goes up."""
+
+    def __init__(self, n):
+        if n < 1:
+            raise ValueError(f"TopN needs n of at least 1, got {n}")
+        self.n = n
+        self.scores = {}
+        self._heap = []  # (score, key) min-heap; entries for raised scores are stale
+
+    def offer(self, key, score):
+        current = self.scores.get(key)
+        if current is not None:
+            if score <= current:
+                return
+        elif len(self.scores) >= self.n:
+            while self._heap[0][0] != self.scores.get(self._heap[0][1]):
+                heapq.heappop(self._heap)
+            if score <= self._heap[0][0]:
+                return
+            del self.scores[heapq.heappop(self._heap)[1]]
+        self.scores[key] = score
+        heapq.heappush(self._heap, (score, key))
+        if len(self._heap) > 4 * self.n:
+            self._heap = [(score, key) for key, score in self.scores.items()]
+            heapq.heapify(self._heap)
+
+    def items(self):
+        """(key, score) pairs, largest score first."""
+        return sorted(self.scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class SketchAnalytics:
+    """
+    Approximate, bounded-memory counterpart of the analytics for fleet-wide dashboards.
+
+    Pairing and the two-hour merge are the same state machines as
+    `calculate_time_and_days` and `calculate_longest_session`, but per user
+    only a fixed-size record is kept: the open GATE_IN, the session being
+    extended and the hours of the current day. Everything that grows with
+    the history goes into sketches instead:
+
+    - distinct users, days and user-days: `HyperLogLog` (relative error
+      1.04 / sqrt(2**precision), 1.6% by default);
+    - session-length and daily-hours percentiles: `KLLSketch` (rank error
+      about 1.65% for k=200);
+    - the top-N longest merged sessions: a count-max `CountMinSketch` holding
+      each user's longest session, with a `TopN` heap of candidates. A user
+      whose longest session is in the true top N is always reported; a
+      reported length can only be too long after collisions in every row.
+
+    Total hours are summed exactly. A user's hours per day are closed when
+    the user's next session starts on a later day, so each user's events are
+    expected in time order, as for the exact analytics.
+
+    The per-user records are themselves capped at `max_users`, least recently
+    active first out. An evicted user's day is closed and an open GATE_IN
+    dropped, so with more than `max_users` users active at once a session can
+    be lost, or a day or merged session split in two; below the cap the
+    figures above are unaffected. Sketches of disjoint streams (one per site,
+    say) combine into a fleet total with `merge`.
+
+    Args:
+        precision (int): HyperLogLog precision.
+        k (int): KLL accuracy parameter.
+        top_n (int): Number of longest sessions to report.
+        width (int): Count-min width.
+        depth (int): Count-min depth.
+        seed (int): Seed of the KLL compactions.
+        max_users (int): Most per-user records kept at once.
+    """
+
+    def __init__(self, precision=12, k=200, top_n=10, width=2048, depth=4, seed=0, max_users=100_000):
+        if max_users < 1:
+            raise ValueError(f"max_users must be at least 1, got {max_users}")
+        self.events = 0
+        self.total_micros = 0
+        self.users = HyperLogLog(precision)
+        self.days = HyperLogLog(precision)
+        self.user_days = HyperLogLog(precision)
+        self.session_hours = KLLSketch(k, seed)
+        self.daily_hours = KLLSketch(k, seed + 1)
+        self.longest = CountMinSketch(width, depth)
+        self.top = TopN(top_n)
+        self.max_users = max_users
+        # User ID -> [open_in, session start, session end, day, micros that day], least recently active first
+        self.user_state = OrderedDict()
+
+    def add(self, user_id, event_type, event_time):
+        """Apply a single event (time as a datetime or epoch microseconds)."""
+        if not isinstance(event_time, int):
+            event_time = to_epoch_micros(event_time)
+        self.events += 1
+        state = self.user_state.get(user_id)
+        if state is None:
+            if len(self.user_state) >= self.max_users:
+                self._close_day(self.user_state.popitem(last=False)[1])
+            state = self.user_state[user_id] = [None, None, None, None, 0]
+            self.users.add(user_id)
+        else:
+            self.user_state.move_to_end(user_id)
+
+        if event_type in IN_EVENTS:
+            state[0] = event_time
+        elif event_type in OUT_EVENTS and state[0] is not None:
+            start, state[0] = state[0], None
+            duration = event_time - start
+            self.total_micros += duration
+            self.session_hours.add(to_hours(duration))
+
+            day = start // MICROS_PER_DAY
+            if day != state[3]:
+                self._close_day(state)
+                state[3] = day
+                self.days.add(day)
+                self.user_days.add(f"{user_id}/{day}")
+            state[4] += duration
+
+            # Two-hour merge, as in LongestSessionAggregator
+            if state[1] is None or start - state[2] > SESSION_BREAK:
+                state[1] = start
+            state[2] = event_time
+            self.top.offer(user_id, self.longest.add_max(user_id, state[2] - state[1]))
+
+    def update(self, events):
+        """Applies a stream of events (dicts, tuples or an EventStore)."""
+        for user_id, event_type, event_time in iter_event_tuples(events):
+            self.add(user_id, event_type, event_time)
+        return self
+
+    def _close_day(self, state):
+        if state[3] is not None:
+            self.daily_hours.add(to_hours(state[4]))
+        state[4] = 0
+
+    def _daily_hours(self):
+        """Daily-hours sketch including the days still open."""
+        daily_hours = KLLSketch(self.daily_hours.k).merge(self.daily_hours)
+        for state in self.user_state.values():
+            if state[3] is not None:
+                daily_hours.add(to_hours(state[4]))
+        return daily_hours
+
+    def merge(self, other):
+        """
+        Adds the sketches of another stream, e.g. another site's, for a fleet total.
+
+        Users and days seen by both count once. The other stream's open days
+        are closed and its per-user records are not carried over, so the two
+        streams should not share a session.
+        """
+        self.events += other.events
+        self.total_micros += other.total_micros
+        self.users.merge(other.users)
+        self.days.merge(other.days)
+        self.user_days.merge(other.user_days)
+        self.session_hours.merge(other.session_hours)
+        self.daily_hours.merge(other._daily_hours())
+        self.longest.merge(other.longest, maximum=True)
+        for user_id, _ in self.top.items() + other.top.items():
+            self.top.offer(user_id, self.longest.estimate(user_id))
+        return self
+
+    def _quantiles(self, sketch):
+        return {f"p{round(fraction * 100)}": sketch.quantile(fraction) for fraction in QUANTILES}
+
+    def summary(self):
+        """
+        Returns:
+            dict: 'events', 'distinct_users', 'distinct_days', 'user_days', 'total_hours',
+                  'average_per_user_day', 'session_hours' and 'daily_hours' percentiles
+                  ('p50', 'p90', 'p99') and 'longest_sessions' (user_id, session_length).
+        """
+        user_days = self.user_days.count()
+        total_hours = to_hours(self.total_micros)
+        return {
+            'events': self.events,
+            'distinct_users': self.users.count(),
+            'distinct_days': self.days.count(),
+            'user_days': user_days,
+            'total_hours': round(total_hours, 2),
+            'average_per_user_day': round(total_hours / user_days, 2) if user_days else 0,
+            'session_hours': self._quantiles(self.session_hours),
+            'daily_hours': self._quantiles(self._daily_hours()),
+            'longest_sessions': [{"user_id": user_id, "session_length": to_hours(micros)}
+                                 for user_id, micros in self.top.items()],
+        }
+
+
+def approximate_analytics(events, **options):
+    """
+    Sketch-based fleet summary of a stream of events, in bounded memory.
+
+    Args:
+        events (iterable): Event dicts, (user_id, event_type, event_time) tuples or an EventStore.
+        **options: Passed to `SketchAnalytics`.
+
+    Returns:
+        dict: See `SketchAnalytics.summary`.
+    """
+    return SketchAnalytics(**options).update(events).summary()
+
+
+def site_summaries(sites):
+    """
+    Summaries of one `SketchAnalytics` per site and of their merge.
+
+    Args:
+        sites (dict): Site name -> SketchAnalytics, each fed that site's events only.
+
+    Returns:
+        dict: 'fleet' (the merged summary) and 'sites' (site name -> summary).
+    """
+    if not sites:
+        raise ValueError("site_summaries needs at least one site")
+    sketches = list(sites.values())
+    fleet = SketchAnalytics(precision=sketches[0].users.precision, k=sketches[0].session_hours.k,
+                            top_n=sketches[0].top.n, width=sketches[0].longest.width,
+                            depth=sketches[0].longest.depth)
+    for sketch in sketches:
+        fleet.merge(sketch)
+    return {
+        'fleet': fleet.summary(),
+        'sites': {name: sketch.summary() for name, sketch in sites.items()},
+    }
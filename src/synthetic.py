@@ -0,0 +1,111 @@
+import gzip
+import heapq
+import random
+import uuid
+from datetime import datetime, timedelta
+
+HEADER = "user_id,event_type,event_time\n"
+
+
+def _timestamp(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def _malformed(rng, user_id, event_type, event_time):
+    """One of the kinds of broken rows the cleaners must skip."""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"{user_id},{event_type},INVALID_TIMESTAMP\n"
+    if kind == 1:
+        return f",{event_type},{event_time}\n"
+    return f"{user_id},GATE_SIDEWAYS,{event_time}\n"
+
+
+def iter_gate_log(users=100, days=20, sessions_per_day=2, break_minutes=(10, 90), malformed_rate=0.0,
+                  lowercase_rate=0.05, out_of_order_rate=0.0, start=datetime(2023, 1, 2), seed=0):
+    """
+    Generates a realistic, deterministic gate log line by line.
+
+    Every user comes in on most weekdays around 8:30, works `sessions_per_day`
+    sessions separated by breaks, and leaves in the late afternoon. Events are
+    emitted day by day in chronological order, so memory depends on the
+    number of users, not the length of the log.
+
+    Args:
+        users (int): Number of badge holders.
+        days (int): Number of calendar days (weekends are mostly empty).
+        sessions_per_day (int): IN/OUT pairs per user per day.
+        break_minutes (tuple): (min, max) length of the breaks between sessions.
+        malformed_rate (float): Fraction of rows replaced by an invalid row.
+        lowercase_rate (float): Fraction of event types written as "gate_in"/"gate_out".
+        out_of_order_rate (float): Fraction of events delayed by up to 15 minutes in the file.
+        start (datetime): First day of the log.
+        seed (int): Random seed; the same arguments always give the same log.
+
+    Yields:
+        str: CSV lines, starting with the header.
+    """
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(users)]
+    yield HEADER
+
+    for day in range(days):
+        midnight = start + timedelta(days=day)
+        attendance = 0.05 if midnight.weekday() >= 5 else 0.9
+        events = []
+        for user_id in user_ids:
+            if rng.random() > attendance:
+                continue
+            now = midnight + timedelta(hours=rng.gauss(8.5, 0.75))
+            work_minutes = max(rng.gauss(480, 60), 60) / sessions_per_day
+            for session in range(sessions_per_day):
+                if session:
+                    now += timedelta(minutes=rng.uniform(*break_minutes))
+                events.append((now, user_id, "GATE_IN"))
+                now += timedelta(minutes=max(rng.gauss(work_minutes, work_minutes / 5), 5))
+                events.append((now, user_id, "GATE_OUT"))
+
+        # Late events: the log position is taken from a delayed time, the recorded timestamp is kept
+        ordered = []
+        for event_time, user_id, event_type in events:
+            position = event_time
+            if out_of_order_rate and rng.random() < out_of_order_rate:
+                position += timedelta(minutes=rng.uniform(1, 15))
+            ordered.append((position, event_time, user_id, event_type))
+        heapq.heapify(ordered)
+
+        while ordered:
+            _, event_time, user_id, event_type = heapq.heappop(ordered)
+            if lowercase_rate and rng.random() < lowercase_rate:
+                event_type = event_type.lower()
+            timestamp = _timestamp(event_time)
+            if malformed_rate and rng.random() < malformed_rate:
+                yield _malformed(rng, user_id, event_type, timestamp)
+            else:
+                yield f"{user_id},{event_type},{timestamp}\n"
+
+
+def write_gate_log(file_path, **options):
+    """
+    Writes a synthetic gate log (gzip-compressed if the path ends with .gz).
+
+    Args:
+        file_path (str): Destination path.
+        **options: Passed to `iter_gate_log`.
+
+    Returns:
+        int: Number of data rows written.
+    """
+    opener = gzip.open if str(file_path).endswith(".gz") else open
+    rows = -1  # Header
+    with opener(file_path, "wt", encoding="utf-8", newline="") as file:
+        for line in iter_gate_log(**options):
+            file.write(line)
+            rows += 1
+    return rows
+
+
+def options_for_events(events, days=20, sessions_per_day=2, **options):
+    """Generator options producing roughly `events` rows, by scaling the number of users."""
+    per_user = days * (5 / 7 * 0.9 + 2 / 7 * 0.05) * 2 * sessions_per_day
+    return dict(options, users=max(1, round(events / per_user)), days=days, sessions_per_day=sessions_per_day)
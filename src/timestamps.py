@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+EPOCH = datetime(1970, 1, 1)
+MICROS_PER_SECOND = 1_000_000
+MICROS_PER_DAY = 86_400 * MICROS_PER_SECOND
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(date_part):
+    """
+    Parses and caches the "YYYY-MM-DD" prefix shared by all events of a day.
+
+    Returns:
+        tuple: (year, month, day, epoch microseconds at midnight).
+
+    Raises:
+        ValueError: If the date is not a valid calendar date.
+    """
+    if not (date_part.isascii() and date_part[:4].isdigit() and date_part[5:7].isdigit() and date_part[8:].isdigit()):
+        raise ValueError(f"Invalid date: {date_part!r}")
+    year, month, day = int(date_part[:4]), int(date_part[5:7]), int(date_part[8:])
+    midnight = datetime(year, month, day)
+    return year, month, day, (midnight - EPOCH) // timedelta(microseconds=1)
+
+
+def parse_timestamp(value, as_micros=False):
+    """
+    Parses an ISO-8601 "Z" timestamp such as "2023-01-31T08:18:36.000Z".
+
+    Values with the fixed-width layout emitted by the gate system are sliced
+    directly, with the date part memoized; anything else goes through
+    `datetime.strptime`, so odd rows are accepted or rejected exactly as before.
+
+    Args:
+        value (str): Timestamp string.
+        as_micros (bool): Return integer microseconds since the Unix epoch instead of a datetime.
+
+    Returns:
+        datetime or int: The parsed (naive, UTC) timestamp.
+
+    Raises:
+        ValueError: If the value is not a valid timestamp.
+        TypeError: If the value is not a string.
+    """
+    fields = _parse_fixed_width(value) if isinstance(value, str) else None
+    if fields is None:
+        parsed = datetime.strptime(value, TIMESTAMP_FORMAT)
+        return to_epoch_micros(parsed) if as_micros else parsed
+
+    date_part, hour, minute, second, microsecond = fields
+    year, month, day, midnight = date_part
+    if as_micros:
+        return midnight + (hour * 3600 + minute * 60 + second) * MICROS_PER_SECOND + microsecond
+    return datetime(year, month, day, hour, minute, second, microsecond)
+
+
+def _parse_fixed_width(value):
+    """
+    Fast path for "YYYY-MM-DDTHH:MM:SS.fffZ" (1 to 6 fractional digits).
+
+    Returns:
+        tuple or None: (date fields, hour, minute, second, microsecond), or None
+                       when the value does not have exactly this layout.
+    """
+    if not 21 <= len(value) <= 26 or value[-1] != "Z" or value[10] != "T" or value[19] != "." \
+            or value[4] != "-" or value[7] != "-" or value[13] != ":" or value[16] != ":":
+        return None
+    clock = value[11:13] + value[14:16] + value[17:19]
+    fraction = value[20:-1]
+    if not (clock.isdigit() and fraction.isdigit() and value.isascii()):
+        return None
+    hour, rest = divmod(int(clock), 10_000)
+    minute, second = divmod(rest, 100)
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    try:
+        date_part = _parse_date(value[:10])
+    except ValueError:
+        return None
+    return date_part, hour, minute, second, int(fraction) * 10 ** (6 - len(fraction))
+
+
+def to_epoch_micros(value):
+    """Converts a naive UTC datetime to integer microseconds since the Unix epoch."""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_micros(micros):
+    """Converts integer microseconds since the Unix epoch back to a naive UTC datetime."""
+    return EPOCH + timedelta(microseconds=micros)
@@ -0,0 +1,180 @@
+import numpy as np
+
+from .event_store import EVENT_IN, EVENT_OUT
+from .leaderboard import rank_rows, top_n
+from .timestamps import MICROS_PER_DAY, MICROS_PER_SECOND
+
+SESSION_BREAK = 2 * 3600 * MICROS_PER_SECOND  # Two hours, in microseconds
+
+
+def _hours(micros):
+    """Vectorized `analytics.to_hours`: same operations, so identical floats."""
+    return micros / MICROS_PER_SECOND / 3600
+
+
+def _group_order(users):
+    """
+    Stable permutation that groups events by user code.
+
+    Uses NumPy's O(n) radix sort on 16-bit keys (two passes for larger codes)
+    and skips sorting entirely when the events are already grouped.
+    """
+    if len(users) < 2 or np.all(users[1:] >= users[:-1]):
+        return None
+    if users.max() < 1 << 16:
+        return np.argsort(users.astype(np.uint16), kind="stable")
+    low = np.argsort((users & 0xFFFF).astype(np.uint16), kind="stable")
+    high = np.argsort((users[low] >> 16).astype(np.uint16), kind="stable")
+    return low[high]
+
+
+def paired_sessions(store):
+    """
+    Pairs IN/OUT events of an EventStore with whole-array operations.
+
+    Events are grouped by user with a stable sort, so each user's events keep
+    their original order, exactly as the reference engine sees them. A GATE_OUT
+    closes a session iff the user's previous event is a GATE_IN; every other
+    OUT (unmatched, or after another OUT) is ignored and a repeated IN simply
+    replaces the open one.
+
+    Args:
+        store (EventStore): Events to pair.
+
+    Returns:
+        tuple: (user_order, pair_users, starts, ends). `user_order` holds the
+               codes of the users present, in order of first appearance (the
+               order the reference engine reports users in); the other arrays
+               are grouped by user code and in event order within each user.
+    """
+    users = np.frombuffer(store.users, dtype=np.int32)
+    event_types = np.frombuffer(store.event_types, dtype=np.uint8)
+    times = np.frombuffer(store.times, dtype=np.int64)
+
+    order = _group_order(users)
+    if order is None:
+        order = np.arange(len(users))
+    else:
+        users, event_types = users[order], event_types[order]
+
+    # First event of every user group, mapped back to its position in the input
+    group_first = np.flatnonzero(np.append(True, users[1:] != users[:-1])) if len(users) else order
+    user_order = users[group_first][np.argsort(order[group_first], kind="stable")]
+
+    closes = np.flatnonzero(
+        (event_types[1:] == EVENT_OUT) & (event_types[:-1] == EVENT_IN) & (users[1:] == users[:-1])
+    ) + 1
+    # Only the paired timestamps are gathered
+    return user_order, users[closes], times[order[closes - 1]], times[order[closes]]
+
+
+def _distinct_days(pair_users, starts, n_users):
+    """Number of distinct days (of the IN) per user."""
+    if not len(starts):
+        return np.zeros(n_users, dtype=np.int64)
+    days = starts // MICROS_PER_DAY
+    same_user = pair_users[1:] == pair_users[:-1]
+    step = days[1:] - days[:-1]
+    if np.all(step[same_user] >= 0):
+        # Chronological per user: a new day starts wherever the day changes
+        new_day = np.append(True, ~same_user | (step != 0))
+        return np.bincount(pair_users[new_day], minlength=n_users)
+    keys = np.unique((pair_users.astype(np.int64) << 32) | (days - days.min()))
+    return np.bincount(keys >> 32, minlength=n_users)
+
+
+def merged_sessions(pair_users, starts, ends):
+    """
+    Merges each user's consecutive sessions separated by at most two hours.
+
+    Args:
+        pair_users, starts, ends: Paired sessions as returned by `paired_sessions`.
+
+    Returns:
+        tuple: (users, starts, ends) of the merged sessions, grouped by user
+               and in event order within each user.
+    """
+    if not len(starts):
+        return pair_users, starts, ends
+    # A merged session starts at a user's first session or after a break of more than two hours
+    breaks = np.ones(len(starts), dtype=bool)
+    breaks[1:] = (pair_users[1:] != pair_users[:-1]) | (starts[1:] - ends[:-1] > SESSION_BREAK)
+    first = np.flatnonzero(breaks)
+    last = np.append(first[1:], len(starts)) - 1
+    return pair_users[first], starts[first], ends[last]
+
+
+def time_and_days_numpy(store, pairs=None, limit=None):
+    """
+    Vectorized `calculate_time_and_days` over an EventStore.
+
+    Args:
+        store (EventStore): Events to analyse.
+        pairs (tuple, optional): Result of `paired_sessions`, if already computed.
+        limit (int, optional): Only return the first `limit` rows.
+
+    Returns:
+        list: Same dictionaries, values and order as the reference engine.
+    """
+    n_users = len(store.user_ids)
+    user_order, pair_users, starts, ends = pairs if pairs is not None else paired_sessions(store)
+
+    # bincount adds the weights in array order, i.e. the same summation order as the reference loop
+    totals = np.bincount(pair_users, weights=_hours(ends - starts), minlength=n_users)
+    session_counts = np.bincount(pair_users, minlength=n_users)
+    days_present = _distinct_days(pair_users, starts, n_users)
+
+    user_ids = store.user_ids
+    results = []
+    for code, total_time, days_count, sessions in zip(user_order.tolist(), totals[user_order].tolist(),
+                                                      days_present[user_order].tolist(),
+                                                      session_counts[user_order].tolist()):
+        if not sessions:
+            total_time = 0
+        average_per_day = total_time / days_count if days_count > 0 else 0
+        results.append({
+            'user_id': user_ids[code],
+            'time': round(total_time, 2),
+            'days': days_count,
+            'average_per_day': round(average_per_day, 2)
+        })
+
+    # Rank users by average_per_day
+    return rank_rows(results, 'average_per_day', limit)
+
+
+def longest_session_numpy(store, pairs=None, limit=None):
+    """
+    Vectorized `calculate_longest_session` over an EventStore.
+
+    Consecutive sessions of a user are merged when the gap between one OUT and
+    the next IN is at most two hours; the longest merged session per user is
+    then taken with a segmented maximum.
+
+    Args:
+        store (EventStore): Events to analyse.
+        pairs (tuple, optional): Result of `paired_sessions`, if already computed.
+        limit (int, optional): Only return the first `limit` rows.
+
+    Returns:
+        list: Same dictionaries, values and order as the reference engine.
+    """
+    n_users = len(store.user_ids)
+    user_order, pair_users, starts, ends = pairs if pairs is not None else paired_sessions(store)
+
+    longest = [None] * n_users
+    if len(starts):
+        group_users, group_starts, group_ends = merged_sessions(pair_users, starts, ends)
+        durations = group_ends - group_starts
+
+        # Segmented maximum over the merged sessions of each user
+        user_first = np.flatnonzero(np.append(True, group_users[1:] != group_users[:-1]))
+        maxima = _hours(np.maximum.reduceat(durations, user_first))
+        for code, value in zip(group_users[user_first].tolist(), maxima.tolist()):
+            longest[code] = value
+
+    longest_sessions = []
+    for code in user_order.tolist():
+        value = longest[code]
+        longest_sessions.append({"user_id": store.user_ids[code], "session_length": value if value is not None else 0})
+    return top_n(longest_sessions, limit, key=lambda x: x["session_length"])
@@ -0,0 +1,23 @@
+import pytest
+
+CSV_HEADER = "user_id,event_type,event_time"
+
+
+def event(user_id, event_type, event_time):
+    """An event dict, as the cleaners produce them."""
+    return {"user_id": user_id, "event_type": event_type, "event_time": event_time}
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """
+    Factory writing a gate log under `tmp_path` and returning its path.
+
+    `rows` is either the data lines, written under the CSV header, or the
+    whole file as one string.
+    """
+    def write(rows, name="sample.csv"):
+        path = tmp_path / name
+        path.write_text(rows if isinstance(rows, str) else "\n".join([CSV_HEADER, *rows]) + "\n")
+        return path
+    return write
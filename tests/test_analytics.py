@@ -1,11 +1,8 @@
 import pytest
 from datetime import datetime
-import sys
-import os
 from collections import defaultdict
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
-from analytics import calculate_time_and_days, calculate_longest_session
+from src.analytics import calculate_time_and_days, calculate_longest_session, calculate_analytics
 
 
 def test_calculate_time_and_days():
@@ -81,3 +78,23 @@ def test_consecutive_in_out_events():
     result = calculate_time_and_days(data)
     print("Result:", result)
     assert result == expected_time_days
+
+
+def test_calculate_analytics_single_pass():
+    data = [
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 8, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 12, 0)},
+        {"user_id": "456", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 9, 0)},
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 13, 0)},
+        {"user_id": "456", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 17, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 18, 0)},
+    ]
+
+    # A generator can only be consumed once, so both results must come from one pass
+    user_analytics, longest_sessions = calculate_analytics(row for row in data)
+
+    assert user_analytics == calculate_time_and_days(data)
+    assert longest_sessions == [
+        {"user_id": "123", "session_length": 10.0},
+        {"user_id": "456", "session_length": 8.0},
+    ]
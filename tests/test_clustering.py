@@ -1,5 +1,8 @@
 import pytest
-from src.clustering import employee_clustering
+import numpy as np
+from src import clustering
+from src.clustering import (KMeansModel, MiniBatchKMeans, choose_k, employee_clustering, k_means_clustering,
+                            silhouette_score, user_features)
 
 def test_employee_clustering_valid_input():
     user_analytics = [
@@ -24,3 +27,99 @@ def test_employee_clustering_empty_input():
     user_analytics = []
     with pytest.raises(ValueError, match="Input data is empty"):
         employee_clustering(user_analytics, k=3)
+
+def test_employee_clustering_duplicate_features():
+    # Users sharing the same [average_per_day, days] must each be assigned once
+    user_analytics = [
+        {"user_id": "123", "average_per_day": 6.5, "days": 15},
+        {"user_id": "456", "average_per_day": 6.5, "days": 15},
+        {"user_id": "789", "average_per_day": 2.0, "days": 3},
+        {"user_id": "101", "average_per_day": 2.0, "days": 3},
+    ]
+    result = employee_clustering(user_analytics, k=2, seed=0)
+    clusters = {item["user_id"]: item["cluster"] for item in result}
+    assert sorted(clusters) == ["101", "123", "456", "789"]
+    assert clusters["123"] == clusters["456"] != clusters["789"] == clusters["101"]
+
+def test_k_means_clustering_labels_and_seed():
+    data = [[1.0, 1.0], [1.2, 0.8], [8.0, 8.0], [8.2, 7.9], [0.9, 1.1]]
+    result = k_means_clustering(data, k=2, seed=42)
+    assert list(result["labels"]) == list(k_means_clustering(data, k=2, seed=42)["labels"])
+    assert result["labels"][0] == result["labels"][1] == result["labels"][4] != result["labels"][2]
+    assert sorted(len(cluster) for cluster in result["clusters"]) == [2, 3]
+    assert result["inertia"] == pytest.approx(0.1183, abs=1e-3)
+
+def test_employee_clustering_minibatch():
+    user_analytics = [
+        {"user_id": str(i), "average_per_day": 2.0 + (i % 2) * 6 + i * 0.01, "days": 5 + (i % 2) * 15}
+        for i in range(40)
+    ]
+    result = employee_clustering(user_analytics, k=2, seed=0, method="minibatch", batch_size=8, passes=3)
+    clusters = {item["user_id"]: item["cluster"] for item in result}
+    assert len(clusters) == 40
+    assert len({clusters[str(i)] for i in range(0, 40, 2)}) == 1
+    assert clusters["0"] != clusters["1"]
+
+def test_minibatch_partial_fit():
+    model = MiniBatchKMeans(k=2, seed=0)
+    model.partial_fit([[0.0, 0.0], [10.0, 10.0], [0.2, 0.0]])
+    model.partial_fit([[9.8, 10.0], [0.0, 0.2]])
+    labels = model.predict([[0.1, 0.1], [10.0, 9.9]])
+    assert labels[0] != labels[1]
+    assert model.counts.sum() == 5
+
+def _two_groups(n=40, shift=0.0):
+    return [
+        {"user_id": str(i), "average_per_day": 2.0 + (i % 2) * 6 + shift, "days": 5 + (i % 2) * 15 + i * 0.01}
+        for i in range(n)
+    ]
+
+def test_kmeans_model_save_load_and_predict(tmp_path):
+    users = _two_groups()
+    model = KMeansModel.fit(user_features(users), k=2, seed=0)
+    path = tmp_path / "model.json"
+    model.save(path)
+    loaded = KMeansModel.load(path)
+    assert np.array_equal(loaded.centroids, model.centroids) and loaded.seed == 0
+    # Clusters are numbered by centroid, so the low-hours group is always cluster 1
+    assert loaded.predict([[2.0, 5.0], [8.0, 20.0]]).tolist() == [0, 1]
+    assert {item["user_id"] for item in loaded.assign(users) if item["cluster"] == 1} == {str(i) for i in range(0, 40, 2)}
+
+def test_kmeans_model_warm_start_keeps_ids():
+    model = KMeansModel.fit(user_features(_two_groups()), k=2, seed=1)
+    shifted = _two_groups(shift=0.5)
+    retrained = KMeansModel.fit(user_features(shifted), k=2, seed=7, warm_start=model)
+    assert retrained.predict(user_features(shifted)).tolist() == model.predict(user_features(shifted)).tolist()
+    with pytest.raises(ValueError, match="warm-start"):
+        KMeansModel.fit(user_features(shifted), k=3, warm_start=model)
+
+def test_silhouette_score_matches_definition(monkeypatch):
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(60, 2))
+    labels = rng.integers(0, 3, 60)
+    labels[0] = 3  # A singleton cluster scores 0
+    expected = []
+    for i, point in enumerate(data):
+        distances = np.linalg.norm(data - point, axis=1)
+        own = (labels == labels[i]) & (np.arange(60) != i)
+        if not own.any():
+            expected.append(0.0)
+            continue
+        a = distances[own].mean()
+        b = min(distances[labels == other].mean() for other in set(labels.tolist()) - {labels[i]})
+        expected.append((b - a) / max(a, b))
+    assert silhouette_score(data, labels, sample_size=None) == pytest.approx(np.mean(expected))
+    assert silhouette_score(data, np.zeros(60)) == 0.0
+    monkeypatch.setattr(clustering, "SILHOUETTE_BLOCK", 7 * 60)  # Blocks of 7 rows, the last one partial
+    assert silhouette_score(data, labels, sample_size=None) == pytest.approx(np.mean(expected))
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_choose_k_finds_separated_blobs(workers):
+    rng = np.random.default_rng(1)
+    centers = np.array([[0, 0], [10, 0], [0, 10], [10, 10]])
+    data = np.concatenate([center + rng.normal(scale=0.5, size=(50, 2)) for center in centers])
+    best_k, table = choose_k(data, range(2, 8), seed=0, workers=workers, sample_size=100)
+    assert best_k == 4
+    assert [row["k"] for row in table] == list(range(2, 8))
+    assert [row["k"] for row in table if row["best"]] == [4]
+    assert [row["k"] for row in table if row["elbow"]] == [4]
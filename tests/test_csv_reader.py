@@ -0,0 +1,65 @@
+import gzip
+import pytest
+from src.csv_reader import chunk_ranges, read_csv_parallel
+from src.event_store import EventStore
+
+CSV_CONTENT = """user_id,event_type,event_time
+123,GATE_IN,2023-01-31T08:00:00.000Z
+456,gate_in,2023-01-31T08:30:00.000Z
+,INVALID_EVENT,2023-01-31T12:00:00.000Z
+123,GATE_OUT,2023-01-31T12:00:00.000Z
+789,GATE_IN,INVALID_TIMESTAMP
+456,GATE_OUT,2023-01-31T17:00:00.000Z
+"""
+
+
+@pytest.fixture
+def sample_csv(write_csv):
+    return write_csv(CSV_CONTENT)
+
+
+def test_chunk_ranges_are_line_aligned(sample_csv):
+    fieldnames, ranges = chunk_ranges(sample_csv, chunk_bytes=10)
+    content = sample_csv.read_bytes()
+
+    assert fieldnames == ["user_id", "event_type", "event_time"]
+    assert ranges[0][0] == content.index(b"\n") + 1
+    assert ranges[-1][1] == len(content)
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert content[end - 1:end] == b"\n"
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 40, 1 << 20])
+def test_read_csv_parallel_matches_sequential(sample_csv, chunk_bytes):
+    store, report = read_csv_parallel(sample_csv, workers=2, chunk_bytes=chunk_bytes)
+    expected = EventStore.from_csv(sample_csv)
+
+    assert list(store) == list(expected)
+    assert store.user_ids == ["123", "456"]
+    assert report["rows"] == 4
+    assert report["mb_per_s"] > 0
+
+
+def test_read_csv_parallel_gzip(tmp_path):
+    file_path = tmp_path / "sample.csv.gz"
+    with gzip.open(file_path, "wt") as file:
+        file.write(CSV_CONTENT)
+
+    store, _ = read_csv_parallel(file_path, workers=2, chunk_bytes=40)
+    assert list(store) == list(EventStore.from_csv(file_path))
+    assert len(store) == 4
+
+
+@pytest.mark.parametrize("name", ["empty.csv", "empty.csv.gz"])
+def test_read_csv_parallel_empty_file(tmp_path, name):
+    file_path = tmp_path / name
+    if name.endswith(".gz"):
+        with gzip.open(file_path, "wt"):
+            pass
+    else:
+        file_path.write_text("")
+
+    store, report = read_csv_parallel(file_path, workers=2)
+    assert len(store) == len(EventStore.from_csv(file_path)) == 0
+    assert report["rows"] == report["chunks"] == 0
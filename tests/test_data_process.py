@@ -5,22 +5,20 @@ from datetime import datetime
 from io import StringIO
 from src.data_process import (
     load_csv,
+    stream_events,
     clean_data_for_user_analytics,
     clean_data_for_longest_session,
     write_to_csv,
 )
 
 @pytest.fixture
-def sample_csv(tmp_path):
-    csv_content = """user_id,event_type,event_time
-123,GATE_IN,2023-01-31T08:00:00.000Z
-123,GATE_OUT,2023-01-31T12:00:00.000Z
-,INVALID_EVENT,2023-01-31T12:00:00.000Z
-456,GATE_IN,INVALID_TIMESTAMP
-"""
-    file_path = tmp_path / "sample.csv"
-    file_path.write_text(csv_content)
-    return file_path
+def sample_csv(write_csv):
+    return write_csv([
+        "123,GATE_IN,2023-01-31T08:00:00.000Z",
+        "123,GATE_OUT,2023-01-31T12:00:00.000Z",
+        ",INVALID_EVENT,2023-01-31T12:00:00.000Z",
+        "456,GATE_IN,INVALID_TIMESTAMP",
+    ])
 
 
 @pytest.fixture
@@ -60,6 +58,14 @@ def test_clean_data_for_user_analytics(sample_csv, expected_cleaned_data_user_an
         assert row["event_time"] == expected_cleaned_data_user_analytics[i]["event_time"]
 
 
+def test_stream_events(sample_csv, expected_cleaned_data_user_analytics):
+    events = stream_events(sample_csv)
+
+    # Rows are produced lazily, not loaded up front
+    assert iter(events) is events
+    assert list(events) == expected_cleaned_data_user_analytics
+
+
 def test_clean_data_for_longest_session(sample_csv, expected_cleaned_data_longest_session):
     raw_data = load_csv(sample_csv)
     cleaned_data = clean_data_for_longest_session(raw_data)
@@ -0,0 +1,70 @@
+import os
+import pytest
+from datetime import datetime
+from src.analytics import calculate_time_and_days, calculate_longest_session
+from src.clustering import employee_clustering
+from src.event_store import EventStore, EVENT_IN, EVENT_OUT, load_event_store
+from src.timestamps import to_epoch_micros
+
+
+@pytest.fixture
+def events():
+    return [
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 8, 0)},
+        {"user_id": "456", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 9, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 12, 0)},
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 2, 8, 0)},
+        {"user_id": "456", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 17, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 2, 12, 0)},
+    ]
+
+
+def test_from_events_interns_columns(events):
+    store = EventStore.from_events(events)
+
+    assert len(store) == 6
+    assert store.user_ids == ["123", "456"]
+    assert list(store.users) == [0, 1, 0, 0, 1, 0]
+    assert list(store.event_types) == [EVENT_IN, EVENT_IN, EVENT_OUT, EVENT_IN, EVENT_OUT, EVENT_OUT]
+    assert store.times[0] == to_epoch_micros(datetime(2023, 1, 1, 8, 0))
+
+
+def test_analytics_consume_store(events):
+    store = EventStore.from_events(events)
+
+    assert calculate_time_and_days(store) == calculate_time_and_days(events)
+    assert calculate_longest_session(store) == calculate_longest_session(events)
+    assert len(employee_clustering(store, k=2)) == 2
+
+
+def test_save_and_load_memory_mapped(tmp_path, events):
+    store = EventStore.from_events(events)
+    path = tmp_path / "events.store"
+    store.save(path)
+
+    loaded = EventStore.load(path)
+    assert loaded.user_ids == store.user_ids
+    assert list(loaded) == list(store)
+    with pytest.raises(ValueError, match="memory-mapped"):
+        loaded.append("789", "GATE_IN", 0)
+
+
+def test_load_event_store_reuses_cache(tmp_path, write_csv):
+    csv_path = write_csv([
+        "123,GATE_IN,2023-01-31T08:00:00.000Z",
+        "123,gate_out,2023-01-31T12:00:00.000Z",
+        "456,GATE_IN,INVALID_TIMESTAMP",
+    ], "log.csv")
+    cache_path = tmp_path / "cache" / "events.store"
+
+    built = load_event_store(csv_path, cache_path)
+    assert cache_path.exists()
+    assert list(built) == [
+        ("123", "GATE_IN", to_epoch_micros(datetime(2023, 1, 31, 8, 0))),
+        ("123", "GATE_OUT", to_epoch_micros(datetime(2023, 1, 31, 12, 0))),
+    ]
+
+    # A second call maps the saved store instead of parsing the CSV
+    csv_path.write_text("user_id,event_type,event_time\n")
+    os.utime(csv_path, (0, 0))
+    assert list(load_event_store(csv_path, cache_path)) == list(built)
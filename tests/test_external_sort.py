@@ -0,0 +1,84 @@
+import random
+
+import pytest
+from src.analytics import calculate_analytics
+from src.event_store import EventStore
+from src.external_sort import BYTES_PER_EVENT, external_sort, is_sorted
+from src.pipeline import Pipeline
+
+HOUR = 3600 * 10 ** 6
+
+
+def make_events(seed=0, users=20, sessions=10):
+    rng = random.Random(seed)
+    events = []
+    for user in range(users):
+        start = rng.randrange(24) * HOUR
+        for _ in range(sessions):
+            events.append((f"user-{user}", "GATE_IN", start))
+            start += rng.randrange(1, 5) * HOUR
+            events.append((f"user-{user}", "GATE_OUT", start))
+            start += rng.randrange(0, 4) * HOUR
+    rng.shuffle(events)
+    return events
+
+
+def expected_order(events):
+    first_seen = {}
+    for user_id, _, _ in events:
+        first_seen.setdefault(user_id, len(first_seen))
+    return sorted(events, key=lambda event: (first_seen[event[0]], event[2]))
+
+
+@pytest.mark.parametrize("run_events", [7, 64, 10 ** 6])
+def test_external_sort_orders_events(tmp_path, run_events):
+    events = make_events()
+    events.append(("user-0", "GATE_OUT", events[0][2]))  # A tie that must keep its input order
+
+    with external_sort(events, memory_budget=run_events * BYTES_PER_EVENT, temp_dir=tmp_path) as result:
+        assert list(result) == expected_order(events)
+        assert len(result.runs) == (0 if run_events >= len(events) else -(-len(events) // run_events))
+        assert is_sorted(result.to_store())
+    assert list(tmp_path.iterdir()) == []  # Runs are removed on close
+
+
+def test_sorted_input_skips_merge(tmp_path):
+    events = expected_order(make_events())
+    with external_sort(events, memory_budget=16 * BYTES_PER_EVENT, temp_dir=tmp_path) as result:
+        assert result.presorted
+        assert list(result) == events
+
+    store = EventStore()
+    for event in make_events():
+        store.append(*event)
+    assert not is_sorted(store)
+
+
+def test_sorted_stream_feeds_analytics():
+    events = make_events(seed=1)
+    expected = calculate_analytics(expected_order(events))
+
+    with external_sort(events, memory_budget=50 * BYTES_PER_EVENT) as result:
+        assert calculate_analytics(result) == expected
+        assert calculate_analytics(result, engine="numpy") == expected
+
+
+def test_pipeline_sorts_events(write_csv):
+    file_path = write_csv([
+        "123,GATE_OUT,2023-01-30T12:00:00.000Z",
+        "456,GATE_IN,2023-01-30T09:00:00.000Z",
+        "123,GATE_IN,2023-01-30T08:00:00.000Z",
+        "456,GATE_OUT,2023-01-30T17:00:00.000Z",
+    ], "gates.csv")
+
+    unsorted, _ = Pipeline(file_path).analytics()
+    assert [row["time"] for row in unsorted] == [8.0, 0]
+
+    user_analytics, _ = Pipeline(file_path, sort_events=True).analytics()
+    assert [(row["user_id"], row["time"]) for row in user_analytics] == [("456", 8.0), ("123", 4.0)]
+
+    # The python engine streams the sorted runs into the analytics, without an events stage
+    for workers in (1, 2):
+        streamed = Pipeline(file_path, sort_events=True, engine="python", workers=workers)
+        assert streamed.analytics() == Pipeline(file_path, sort_events=True).analytics()
+        assert streamed.computed == ["analytics"]
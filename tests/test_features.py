@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from src.analytics import calculate_analytics
+from src.clustering import employee_clustering
+from src.event_store import EventStore
+from src.features import FEATURE_NAMES, FeatureMatrix
+from src.pipeline import ArtifactCache, Pipeline
+
+CSV_CONTENT = """user_id,event_type,event_time
+123,GATE_IN,2023-01-30T08:00:00.000Z
+456,GATE_IN,2023-01-30T09:00:00.000Z
+123,GATE_OUT,2023-01-30T12:00:00.000Z
+123,GATE_IN,2023-01-30T13:00:00.000Z
+123,GATE_OUT,2023-01-30T17:00:00.000Z
+456,GATE_OUT,2023-01-30T17:00:00.000Z
+123,GATE_IN,2023-02-04T10:00:00.000Z
+123,GATE_OUT,2023-02-04T11:30:00.000Z
+789,GATE_OUT,2023-01-31T09:00:00.000Z
+"""
+
+
+@pytest.fixture
+def sample_csv(write_csv):
+    return write_csv(CSV_CONTENT)
+
+
+def test_features_of_one_pass(sample_csv):
+    store = EventStore.from_csv(sample_csv)
+    matrix = FeatureMatrix.from_store(store)
+    assert matrix.user_ids == ["123", "456", "789"] and matrix.features == FEATURE_NAMES
+    assert matrix.values.dtype == np.float32 and matrix.values.shape == (3, len(FEATURE_NAMES))
+
+    user = matrix.row("123")
+    assert user["days"] == 2 and user["average_per_day"] == pytest.approx(9.5 / 2)
+    assert user["arrival_mean"] == pytest.approx(9.0) and user["arrival_std"] == pytest.approx(1.0)
+    assert user["weekday_mon"] == user["weekday_sat"] == 0.5  # 2023-01-30 was a Monday
+    assert user["sessions"] == 2 and user["longest_session"] == 9.0  # The one-hour break merges the Monday
+    assert not matrix.values[matrix.index["789"]].any()  # An OUT without an IN: no sessions
+
+    user_analytics, longest_sessions = calculate_analytics(store)
+    for row in user_analytics:
+        assert matrix.row(row["user_id"])["days"] == row["days"]
+    for row in longest_sessions:
+        assert matrix.row(row["user_id"])["longest_session"] == pytest.approx(row["session_length"])
+
+
+def test_standardize_select_save_and_load(tmp_path, sample_csv):
+    matrix = FeatureMatrix.from_store(EventStore.from_csv(sample_csv))
+    scaled = matrix.select(["average_per_day", "arrival_mean", "weekday_sun"]).standardized()
+    assert scaled.values.mean(axis=0) == pytest.approx(0, abs=1e-6)
+    assert scaled.values.std(axis=0) == pytest.approx([1, 1, 0], abs=1e-6)  # A constant column is only centered
+    with pytest.raises(ValueError, match="Unknown features"):
+        matrix.select(["arrival_median"])
+
+    scaled.save(tmp_path / "features.npz")
+    loaded = FeatureMatrix.load(tmp_path / "features.npz")
+    assert loaded.user_ids == scaled.user_ids and loaded.features == scaled.features
+    assert np.array_equal(loaded.values, scaled.values) and np.array_equal(loaded.scale, scaled.scale)
+
+
+def test_clustering_consumes_the_matrix(tmp_path, sample_csv):
+    matrix = FeatureMatrix.from_store(EventStore.from_csv(sample_csv))
+    clusters = employee_clustering(matrix, k=2, seed=0)
+    assert sorted(item["user_id"] for item in clusters) == ["123", "456", "789"]
+
+    cache = ArtifactCache(tmp_path / "cache")
+    pipeline = Pipeline(sample_csv, cache=cache, k=2, features=("arrival_mean", "sessions"))
+    pipeline.clusters()
+    assert pipeline.computed == ["events", "features", "clusters"]
+
+    # Another feature selection reuses the cached matrix
+    other = Pipeline(sample_csv, cache=cache, k=2, features="all")
+    assert other.clusters() == clusters
+    assert other.computed == ["clusters"]
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+from src.analytics import calculate_analytics
+from src.incremental import IncrementalAnalytics
+from src.pipeline import Pipeline
+from tests.conftest import event
+
+
+EVENTS = [
+    event("123", "GATE_IN", datetime(2023, 1, 30, 8, 0)),
+    event("456", "GATE_IN", datetime(2023, 1, 30, 9, 0)),
+    event("123", "GATE_OUT", datetime(2023, 1, 30, 12, 0)),
+    event("123", "GATE_IN", datetime(2023, 1, 30, 13, 30)),  # Open at the end of the first batch
+    event("123", "GATE_OUT", datetime(2023, 1, 30, 17, 0)),
+    event("456", "GATE_OUT", datetime(2023, 1, 30, 17, 0)),
+    event("789", "GATE_IN", datetime(2023, 1, 31, 7, 0)),
+    event("789", "GATE_OUT", datetime(2023, 1, 31, 9, 0)),
+    event("456", "GATE_IN", datetime(2023, 1, 31, 22, 0)),
+    event("456", "GATE_OUT", datetime(2023, 2, 1, 1, 0)),
+]
+
+
+@pytest.mark.parametrize("cut", [0, 4, 7, len(EVENTS)])
+def test_batches_match_full_recompute(tmp_path, cut):
+    state_path = tmp_path / "state.pkl"
+    first = IncrementalAnalytics.load(state_path)
+    first.update(EVENTS[:cut])
+    first.save(state_path)
+
+    second = IncrementalAnalytics.load(state_path)
+    second.update(EVENTS[cut:])
+
+    assert second.results() == calculate_analytics(EVENTS)
+
+
+def test_open_session_closes_in_next_batch(tmp_path):
+    state_path = tmp_path / "state.pkl"
+    incremental = IncrementalAnalytics()
+    incremental.update(EVENTS[:4])
+    incremental.save(state_path)
+
+    restored = IncrementalAnalytics.load(state_path)
+    assert restored.time_and_days.user_stats["123"]["last_in"] is not None
+    assert restored.sessions.user_state["123"]["open_in"] is not None
+
+    restored.update(EVENTS[4:5])
+    _, longest_sessions = restored.results()
+    assert longest_sessions[0] == {"user_id": "123", "session_length": 9.0}
+
+
+def test_batch_is_applied_once():
+    incremental = IncrementalAnalytics()
+    assert incremental.update(EVENTS, batch_id="day-1") == len(EVENTS)
+    assert incremental.update(EVENTS, batch_id="day-1") == 0
+    assert incremental.results() == calculate_analytics(EVENTS)
+
+
+def test_pipeline_with_state(tmp_path, write_csv):
+    day_1 = write_csv(["123,GATE_IN,2023-01-30T08:00:00.000Z", "456,GATE_IN,2023-01-30T09:00:00.000Z"], "day_1.csv")
+    day_2 = write_csv(["123,GATE_OUT,2023-01-30T12:00:00.000Z", "456,GATE_OUT,2023-01-30T17:00:00.000Z"], "day_2.csv")
+    state_path = tmp_path / "state.pkl"
+
+    Pipeline(day_1, state_path=state_path).analytics()
+    user_analytics, _ = Pipeline(day_2, state_path=state_path).analytics()
+
+    assert [(row["user_id"], row["time"], row["rank"]) for row in user_analytics] == [("456", 8.0, 1), ("123", 4.0, 2)]
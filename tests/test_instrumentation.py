@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from src.clustering import employee_clustering
+from src.instrumentation import Profiler
+from src.pipeline import Pipeline
+
+CSV_CONTENT = """user_id,event_type,event_time
+123,GATE_IN,2023-01-30T08:00:00.000Z
+456,GATE_IN,2023-01-30T09:00:00.000Z
+123,GATE_OUT,2023-01-30T12:00:00.000Z
+456,GATE_OUT,2023-01-30T17:00:00.000Z
+789,GATE_IN,2023-01-31T07:00:00.000Z
+789,GATE_OUT,2023-01-31T09:00:00.000Z
+"""
+
+
+def test_stage_records_metrics():
+    profiler = Profiler(trace_memory=True)
+    with profiler.stage("square", rows_in=1000) as record:
+        record["rows_out"] = len([value * value for value in range(1000)])
+
+    stage = profiler.report()["stages"][0]
+    assert stage["stage"] == "square"
+    assert stage["rows_in"] == 1000 and stage["rows_out"] == 1000
+    assert stage["wall_seconds"] > 0 and stage["rows_per_sec"] > 0
+    assert stage["peak_traced_mb"] > 0
+    assert "square" in profiler.summary_table()
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler.stage("work", rows_in=10) as record:
+        record["rows_out"] = 10
+    profiler.record("kmeans", iterations=3)
+
+    assert profiler.report() == {"stages": [], "metrics": {}}
+
+
+@pytest.mark.parametrize("kind", ["cprofile", "sampling"])
+def test_profiled_stage(tmp_path, kind):
+    profiler = Profiler(profile_stages=["busy"], profiler=kind, profile_dir=tmp_path)
+    with profiler.stage("busy"):
+        sum(i * i for i in range(200000))
+    with profiler.stage("quiet"):
+        pass
+
+    busy, quiet = profiler.stages
+    assert busy["profile"]["profiler"] == kind
+    assert "profile" not in quiet
+    if kind == "cprofile":
+        assert (tmp_path / "busy.prof").exists()
+
+
+def test_pipeline_and_clustering_report(tmp_path, write_csv):
+    file_path = write_csv(CSV_CONTENT)
+    profiler = Profiler()
+    pipeline = Pipeline(file_path, k=2, profiler=profiler)
+    pipeline.clusters()
+
+    report_path = tmp_path / "report.json"
+    profiler.write_json(report_path)
+    report = json.loads(report_path.read_text())
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert list(stages) == ["events", "user_analytics", "clusters"]  # Clustering skips the longest sessions
+    assert stages["events"]["rows_out"] == 6
+    assert stages["user_analytics"]["rows_in"] == 6 and stages["user_analytics"]["rows_out"] == 3
+    assert report["metrics"]["kmeans"]["iterations"] >= 1
+    assert report["metrics"]["kmeans"]["convergence_seconds"] >= 0
+
+
+def test_minibatch_clustering_reports_passes():
+    profiler = Profiler()
+    user_analytics = [{"user_id": str(i), "average_per_day": i % 7, "days": i % 5} for i in range(50)]
+    employee_clustering(user_analytics, k=2, seed=0, method="minibatch", batch_size=16, profiler=profiler)
+
+    assert profiler.metrics["kmeans"]["passes"] >= 1
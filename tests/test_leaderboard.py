@@ -0,0 +1,68 @@
+import random
+from datetime import datetime
+
+import pytest
+from src.analytics import calculate_analytics, calculate_longest_session, calculate_time_and_days
+from src.event_store import EventStore
+from src.incremental import IncrementalAnalytics
+from src.leaderboard import Leaderboard, top_n
+from tests.conftest import event
+
+
+def random_events(seed, users=30, count=400):
+    rng = random.Random(seed)
+    events, now = [], datetime(2023, 1, 2).timestamp()
+    for _ in range(count):
+        now += rng.randrange(60, 6 * 3600)
+        events.append(event(f"user-{rng.randrange(users)}", rng.choice(["GATE_IN", "GATE_OUT"]),
+                            datetime.fromtimestamp(now)))
+    return events
+
+
+def test_top_n_keeps_ties_in_input_order():
+    rows = [{"id": index, "score": score} for index, score in enumerate([3, 5, 3, 5, 1, 3])]
+    for n in range(len(rows) + 1):
+        assert top_n(rows, n, key=lambda row: row["score"]) == \
+            sorted(rows, key=lambda row: row["score"], reverse=True)[:n]
+
+
+def test_leaderboard_matches_full_sort():
+    rng = random.Random(1)
+    board, scores = Leaderboard(), {}
+    for _ in range(2000):
+        user_id = f"user-{rng.randrange(200)}"
+        scores[user_id] = rng.choice([0, 1.5, 2.25, rng.randrange(100) / 4])
+        board.update(user_id, scores[user_id])
+        if rng.random() < 0.02:
+            del scores[user_id]
+            board.remove(user_id)
+
+    first_seen = list(board._order)  # Ties go by first appearance, also for removed and re-added users
+    expected = sorted(scores.items(), key=lambda item: (-item[1], first_seen.index(item[0])))
+    assert board.top() == expected
+    assert board.top(10) == expected[:10]
+    for rank, (user_id, score) in enumerate(expected, start=1):
+        assert board.rank(user_id) == rank
+        assert board.at(rank) == (user_id, score)
+    with pytest.raises(IndexError):
+        board.at(len(board) + 1)
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_limit_is_a_prefix_of_the_full_ranking(engine):
+    events = random_events(2)
+    store = EventStore.from_events(events)
+    assert calculate_time_and_days(store, engine=engine, limit=5) == calculate_time_and_days(events)[:5]
+    assert calculate_longest_session(store, engine=engine, limit=5) == calculate_longest_session(events)[:5]
+    user_analytics, longest = calculate_analytics(store, engine=engine, limit=3)
+    assert (len(user_analytics), len(longest)) == (3, 3)
+
+
+def test_incremental_leaderboard_follows_batches():
+    events = random_events(3)
+    incremental = IncrementalAnalytics()
+    for start in range(0, len(events), 100):
+        incremental.update(events[start:start + 100])
+        expected = calculate_time_and_days(events[:start + 100])
+        assert incremental.top(10) == expected[:10]
+        assert [incremental.rank(row["user_id"]) for row in expected] == [row["rank"] for row in expected]
@@ -0,0 +1,103 @@
+import asyncio
+import csv
+import json
+from datetime import datetime
+
+from src.analytics import calculate_longest_session, calculate_time_and_days
+from src.data_process import iter_events
+from src.live import LiveAnalytics, LiveService, parse_line
+from src.synthetic import iter_gate_log
+from src.timestamps import MICROS_PER_SECOND, to_epoch_micros
+
+HOUR = 3600 * MICROS_PER_SECOND
+
+
+def micros(*args):
+    return to_epoch_micros(datetime(*args))
+
+
+def test_parse_line():
+    expected = ("123", "GATE_IN", micros(2023, 1, 30, 8, 0))
+    assert parse_line(b"123,gate_in,2023-01-30T08:00:00.000Z\n") == expected
+    assert parse_line('{"user_id": "123", "event_type": "GATE_IN", "event_time": "2023-01-30T08:00:00.000Z"}') == expected
+    assert parse_line("user_id,event_type,event_time") is None
+
+
+def test_headcount_and_today_hours():
+    live = LiveAnalytics(allowed_lateness=0)
+    live.ingest("123", "GATE_IN", micros(2023, 1, 30, 8, 0))
+    live.ingest("456", "GATE_IN", micros(2023, 1, 30, 9, 0))
+    live.ingest("123", "GATE_OUT", micros(2023, 1, 30, 12, 0))
+    live.ingest("123", "GATE_IN", micros(2023, 1, 30, 13, 0))
+    assert live.headcount() == 2
+    assert live.today_hours("123") == 4.0  # Open session started at 13:00, latest event
+    assert live.today_hours("456") == 4.0
+
+    live.ingest("789", "GATE_IN", micros(2023, 1, 31, 8, 0))  # A new day
+    assert live.today_hours("123") == 0
+    assert live.today_hours("789") == 0
+
+
+def test_watermark_reorders_late_events():
+    live = LiveAnalytics(allowed_lateness=HOUR)
+    live.ingest("123", "GATE_OUT", micros(2023, 1, 30, 12, 0))
+    live.ingest("123", "GATE_IN", micros(2023, 1, 30, 11, 30))  # Late: held until the watermark passes it
+    assert live.counters["applied"] == 0
+    live.ingest("456", "GATE_IN", micros(2023, 1, 30, 13, 30))
+    assert live.counters["applied"] == 2  # 456 is still buffered
+    assert live.rankings() == [
+        {"user_id": "123", "time": 0.5, "days": 1, "average_per_day": 0.5, "rank": 1},
+    ]
+    assert (live.rank("123"), live.rank("456")) == (1, None)
+    live.ingest("999", "GATE_IN", micros(2023, 1, 30, 9, 0))  # Too late: dropped
+    assert live.counters["late"] == 1
+
+
+def test_replay_matches_batch_analytics():
+    lines = list(iter_gate_log(users=20, days=5, out_of_order_rate=0.1, seed=3))
+    live = LiveAnalytics(allowed_lateness=15 * 60 * MICROS_PER_SECOND)
+    for line in lines[1:]:
+        live.ingest(*parse_line(line))
+    live.flush()
+
+    events = sorted(iter_events(csv.DictReader(lines)), key=lambda event: event["event_time"])
+    assert live.counters["late"] == 0
+    assert live.rankings() == calculate_time_and_days(events)
+    assert live.longest_sessions() == calculate_longest_session(events)
+
+
+def test_service_over_tcp():
+    async def scenario():
+        service = await LiveService(LiveAnalytics(allowed_lateness=0)).start()
+        _, ingest = await asyncio.open_connection(service.host, service.port)
+        ingest.write(b"user_id,event_type,event_time\n"
+                     b"123,GATE_IN,2023-01-30T08:00:00.000Z\n"
+                     b'{"user_id": "456", "event_type": "GATE_IN", "event_time": "2023-01-30T09:00:00.000Z"}\n'
+                     b"123,GATE_OUT,2023-01-30T10:00:00.000Z\n"
+                     b"not,a,row\n")
+        await ingest.drain()
+        ingest.close()
+        await ingest.wait_closed()
+
+        reader, writer = await asyncio.open_connection(service.host, service.query_port)
+
+        async def query(command):
+            writer.write(command + b"\n")
+            await writer.drain()
+            return json.loads(await reader.readline())
+
+        stats = await query(b"STATS")
+        while stats["received"] + stats["invalid"] < 4:  # The ingest connection may not have been read yet
+            await asyncio.sleep(0.01)
+            stats = await query(b"STATS")
+        answers = [stats] + [await query(command) for command in (b"HEADCOUNT", b"TODAY  123", b"RANKING 1")]
+        writer.close()
+        await service.close()
+        return answers
+
+    stats, headcount, today, ranking = asyncio.run(scenario())
+    assert (stats["applied"], stats["invalid"]) == (3, 1)
+    assert stats["latency_ms"]["p99"] is not None
+    assert headcount == {"headcount": 1}
+    assert today == {"user_id": "123", "hours": 2.0}
+    assert ranking["ranking"][0]["user_id"] == "123"
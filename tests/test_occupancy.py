@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from src.event_store import EventStore
+from src.occupancy import OccupancyIndex
+from tests.conftest import event
+
+
+EVENTS = [
+    event("123", "GATE_IN", datetime(2023, 1, 30, 8, 0)),
+    event("456", "GATE_IN", datetime(2023, 1, 30, 9, 0)),
+    event("123", "GATE_OUT", datetime(2023, 1, 30, 12, 0)),
+    event("123", "GATE_IN", datetime(2023, 1, 30, 13, 0)),  # One-hour break: merged by default
+    event("123", "GATE_OUT", datetime(2023, 1, 30, 17, 0)),
+    event("456", "GATE_OUT", datetime(2023, 1, 30, 15, 0)),
+    event("789", "GATE_IN", datetime(2023, 1, 30, 22, 0)),
+    event("789", "GATE_OUT", datetime(2023, 1, 31, 2, 0)),  # Crosses midnight
+]
+
+
+@pytest.fixture
+def index():
+    return OccupancyIndex.from_store(EventStore.from_events(EVENTS))
+
+
+def test_present_at(index):
+    assert index.present_at(datetime(2023, 1, 30, 12, 30)) == ["123", "456"]
+    assert index.present_at(datetime(2023, 1, 30, 15, 0)) == ["123"]  # Out at exactly 15:00
+    assert index.headcount_at(datetime(2023, 1, 31, 1, 0)) == 1
+
+    raw = OccupancyIndex.from_store(EventStore.from_events(EVENTS), merged=False)
+    assert raw.present_at(datetime(2023, 1, 30, 12, 30)) == ["456"]
+
+
+def test_curve(index):
+    curve = index.curve(datetime(2023, 1, 30, 8, 0), datetime(2023, 1, 30, 9, 10), step=timedelta(minutes=30))
+    assert curve == [
+        (datetime(2023, 1, 30, 8, 0), 1),
+        (datetime(2023, 1, 30, 8, 30), 1),
+        (datetime(2023, 1, 30, 9, 0), 2),
+    ]
+    assert len(index.curve(datetime(2023, 1, 30), datetime(2023, 1, 31))) == 288  # Five-minute default
+
+
+def test_daily_peaks(index):
+    assert index.daily_peaks() == [
+        {"date": date(2023, 1, 30), "peak": 2, "at": datetime(2023, 1, 30, 9, 0)},
+        {"date": date(2023, 1, 31), "peak": 1, "at": datetime(2023, 1, 31, 0, 0)},  # Carried over midnight
+    ]
+
+
+def test_long_sessions_are_found():
+    events = EVENTS + [event("999", "GATE_IN", datetime(2023, 1, 1)), event("999", "GATE_OUT", datetime(2023, 2, 1))]
+    index = OccupancyIndex.from_store(EventStore.from_events(events))
+    assert index.present_at(datetime(2023, 1, 30, 12, 30)) == ["999", "123", "456"]
@@ -0,0 +1,34 @@
+import pytest
+from datetime import datetime, timedelta
+from src.analytics import calculate_analytics
+from src.event_store import EventStore
+from src.parallel import calculate_analytics_parallel, shard_of, write_shards
+
+
+@pytest.fixture
+def store():
+    events = []
+    start = datetime(2023, 1, 2, 8, 0)
+    for day in range(3):
+        for user in range(8):
+            time_in = start + timedelta(days=day, minutes=7 * user)
+            # Equal session lengths for pairs of users, so ranks depend on tie-breaking
+            hours = 4 + user // 2
+            events.append({"user_id": f"user-{user}", "event_type": "GATE_IN", "event_time": time_in})
+            events.append({"user_id": f"user-{user}", "event_type": "GATE_OUT", "event_time": time_in + timedelta(hours=hours)})
+    return EventStore.from_events(events)
+
+
+def test_write_shards_partitions_users(tmp_path, store):
+    paths = write_shards(store, 3, tmp_path)
+    shards = [EventStore.load(path) for path in paths]
+
+    assert sum(len(shard) for shard in shards) == len(store)
+    for shard in shards:
+        assert len({shard_of(user_id, 3) for user_id in shard.user_ids}) == 1
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_parallel_matches_single_process(store, engine):
+    expected = calculate_analytics(store)
+    assert calculate_analytics_parallel(store, workers=2, n_shards=4, engine=engine) == expected
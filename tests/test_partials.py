@@ -0,0 +1,63 @@
+import random
+
+import pytest
+from src.analytics import calculate_analytics, calculate_longest_session, calculate_time_and_days
+from src.partials import PartialAnalytics, calculate_analytics_files, merge_partials
+from src.pipeline import Pipeline
+
+HOUR = 3600 * 10 ** 6
+
+
+def random_events(seed, n_events=200):
+    rng = random.Random(seed)
+    users = [f"user-{index}" for index in range(5)]
+    events, now = [], 0
+    for _ in range(n_events):
+        now += rng.choice([0, 1, 2, 3]) * HOUR // 2
+        events.append((rng.choice(users), rng.choice(["GATE_IN", "GATE_OUT"]), now))
+    return events
+
+
+def split(events, n_parts, rng):
+    cuts = sorted(rng.sample(range(1, len(events)), n_parts - 1))
+    return [events[start:end] for start, end in zip([0] + cuts, cuts + [len(events)])]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merged_partials_match_full_recompute(seed):
+    events = random_events(seed)
+    parts = split(events, 6, random.Random(seed))
+    partials = [PartialAnalytics.from_events(part) for part in parts]
+
+    assert merge_partials(partials).results() == calculate_analytics(events)
+    assert merge_partials(partials).results(limit=2) == \
+        (calculate_time_and_days(events, limit=2), calculate_longest_session(events, limit=2))
+
+
+def test_merge_is_associative():
+    events = random_events(42)
+    a, b, c = (PartialAnalytics.from_events(part) for part in split(events, 3, random.Random(0)))
+
+    assert a.merge(b).merge(c).results() == a.merge(b.merge(c)).results()
+
+
+def test_session_crossing_the_seam():
+    first = PartialAnalytics.from_events([("123", "GATE_IN", 8 * HOUR), ("123", "GATE_OUT", 10 * HOUR),
+                                          ("123", "GATE_IN", 11 * HOUR)])
+    second = PartialAnalytics.from_events([("123", "GATE_OUT", 13 * HOUR)])
+
+    user_analytics, longest_sessions = first.merge(second).results()
+    assert user_analytics[0]["time"] == 4.0
+    assert longest_sessions == [{"user_id": "123", "session_length": 5.0}]
+
+
+def test_files_processed_concurrently(write_csv):
+    rows = ["123,GATE_IN,2023-01-30T08:00:00.000Z", "456,GATE_IN,2023-01-30T09:00:00.000Z",
+            "123,GATE_OUT,2023-01-30T12:00:00.000Z", "456,GATE_OUT,2023-01-30T17:00:00.000Z"]
+    paths = [write_csv(rows[2 * index:2 * index + 2], f"building_{index}.csv") for index in range(2)]
+    combined = write_csv(rows, "combined.csv")
+
+    expected = Pipeline(combined).analytics()
+    assert calculate_analytics_files(paths, workers=2) == expected
+    assert calculate_analytics_files(paths, executor="thread") == expected
+    assert Pipeline(paths).analytics() == expected
@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from src.analytics import calculate_analytics
+from src.event_store import EventStore
+from src.instrumentation import Profiler
+from src.pipeline import ArtifactCache, Pipeline
+
+CSV_CONTENT = """user_id,event_type,event_time
+123,GATE_IN,2023-01-30T08:00:00.000Z
+456,GATE_IN,2023-01-30T09:00:00.000Z
+123,GATE_OUT,2023-01-30T12:00:00.000Z
+456,GATE_OUT,2023-01-30T17:00:00.000Z
+789,GATE_IN,2023-01-31T07:00:00.000Z
+789,GATE_OUT,2023-01-31T09:00:00.000Z
+"""
+
+
+@pytest.fixture
+def sample_csv(write_csv):
+    return write_csv(CSV_CONTENT)
+
+
+def test_pipeline_passes_results_in_memory(sample_csv):
+    pipeline = Pipeline(sample_csv, k=2)
+
+    assert pipeline.analytics() == calculate_analytics(EventStore.from_csv(sample_csv))
+    assert {item["user_id"] for item in pipeline.clusters()} == {"123", "456", "789"}
+    assert pipeline.computed == ["events", "analytics", "clusters"]
+
+
+def test_pipeline_reuses_cached_stages(tmp_path, sample_csv):
+    cache = ArtifactCache(tmp_path / "cache")
+    first = Pipeline(sample_csv, cache=cache, k=2)
+    expected = first.analytics(), first.clusters()
+
+    # Unchanged inputs: nothing is recomputed
+    rerun = Pipeline(sample_csv, cache=cache, k=2)
+    assert (rerun.analytics(), rerun.clusters()) == expected
+    assert rerun.computed == []
+
+    # A new k only re-clusters; the raw CSV is not ingested again
+    reclustered = Pipeline(sample_csv, cache=cache, k=3)
+    reclustered.analytics()
+    reclustered.clusters()
+    assert reclustered.computed == ["clusters"]
+
+
+def test_pipeline_invalidated_by_input_change(tmp_path, sample_csv):
+    cache = ArtifactCache(tmp_path / "cache")
+    Pipeline(sample_csv, cache=cache, k=2).clusters()
+
+    sample_csv.write_text(CSV_CONTENT + "789,GATE_IN,2023-01-31T10:00:00.000Z\n")
+    pipeline = Pipeline(sample_csv, cache=cache, k=2)
+    pipeline.clusters()
+    assert pipeline.computed == ["events", "user_analytics", "clusters"]
+
+
+def test_pipeline_auto_k_caches_the_selection(tmp_path, sample_csv):
+    cache = ArtifactCache(tmp_path / "cache")
+    pipeline = Pipeline(sample_csv, cache=cache, k="auto", k_range=range(2, 4))
+    best_k, table = pipeline.k_selection()
+    assert [row["k"] for row in table] == [2, 3] and pipeline.cluster_count() == best_k
+    assert len({item["cluster"] for item in pipeline.clusters()}) == best_k
+
+    rerun = Pipeline(sample_csv, cache=cache, k="auto", k_range=range(2, 4))
+    rerun.clusters()
+    assert rerun.computed == []
+
+
+def test_pipeline_runs_only_the_needed_half(tmp_path, sample_csv):
+    cache = ArtifactCache(tmp_path / "cache")
+    user_analytics, longest_sessions = calculate_analytics(EventStore.from_csv(sample_csv))
+
+    sessions = Pipeline(sample_csv, cache=cache, engine="python")
+    assert sessions.longest_sessions() == longest_sessions
+    assert sessions.computed == ["events", "longest_sessions"]
+
+    # Once the combined stage is cached, either half is read from it
+    Pipeline(sample_csv, cache=cache, engine="python").analytics()
+    rerun = Pipeline(sample_csv, cache=cache, engine="python")
+    assert rerun.user_analytics() == user_analytics
+    assert rerun.computed == []
+
+
+def test_package_imports_numpy_lazily():
+    code = ("import sys, src, src.pipeline; assert 'numpy' not in sys.modules; "
+            "src.employee_clustering; assert 'numpy' in sys.modules")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_python_engine_run_never_loads_numpy(tmp_path, sample_csv):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    argv = ["main.py", "sessions", "--engine", "python", "--no-cache", "--input", str(sample_csv),
+            "--output", str(tmp_path / "output")]
+    code = (f"import runpy, sys; sys.argv = {argv!r}; runpy.run_path('main.py', run_name='__main__'); "
+            "assert 'numpy' not in sys.modules, 'numpy was imported'")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=root)
+    assert (tmp_path / "output" / "longest_session.csv").exists()
+
+
+def test_streaming_pipeline_skips_the_event_store(tmp_path, sample_csv):
+    cache = ArtifactCache(tmp_path / "cache")
+    pipeline = Pipeline(sample_csv, cache=cache, engine="python", stream=True, k=2)
+    assert pipeline.longest_sessions() == calculate_analytics(EventStore.from_csv(sample_csv))[1]
+    pipeline.clusters()
+    assert pipeline.computed == ["analytics", "clusters"]
+
+    with pytest.raises(ValueError, match="Streaming"):
+        Pipeline(sample_csv, engine="numpy", stream=True)
+
+
+def test_parallel_read_report_goes_to_the_profiler(sample_csv):
+    profiler = Profiler()
+    Pipeline(sample_csv, workers=2, profiler=profiler).events()
+
+    report = profiler.metrics["read_csv_parallel"]
+    assert (report["workers"], report["rows"]) == (2, 6)
+    assert report["mb_per_s"] >= 0
@@ -0,0 +1,119 @@
+import csv
+
+import pytest
+from src.csv_reader import read_csv_parallel
+from src.data_process import clean_data_for_longest_session, clean_data_for_user_analytics, normalize_row
+from src.event_store import EventStore
+from src.pipeline import ArtifactCache, Pipeline
+from src.quarantine import QUARANTINE_FIELDS, InvalidRowError, Quarantine, QuarantineError
+
+ROWS = [
+    {"user_id": "123", "event_type": "GATE_IN", "event_time": "2023-01-31T08:00:00.000Z"},
+    {"user_id": "", "event_type": "GATE_IN", "event_time": "2023-01-31T08:00:00.000Z"},
+    {"user_id": "123", "event_type": "GATE_SIDEWAYS", "event_time": "2023-01-31T08:00:00.000Z"},
+    {"user_id": "123", "event_type": "GATE_OUT", "event_time": "INVALID_TIMESTAMP"},
+    {"user_id": "123", "event_type": None, "event_time": "2023-01-31T12:00:00.000Z"},  # Short CSV line
+    {"user_id": "123", "event_type": "gate_out", "event_time": "2023-01-31T12:00:00.000Z"},
+]
+
+
+def test_normalize_row_reasons():
+    reasons = []
+    for row in ROWS[1:4]:
+        with pytest.raises(InvalidRowError) as error:
+            normalize_row(row)
+        reasons.append(error.value.reason)
+    assert reasons == ["empty_user", "unknown_event_type", "bad_timestamp"]
+
+
+def test_cleaners_share_the_quarantine(tmp_path, capsys):
+    path = tmp_path / "rejected.csv"
+    with Quarantine(path, sample_limit=1) as quarantine:
+        user_analytics = clean_data_for_user_analytics(ROWS, quarantine=quarantine)
+        longest_session = clean_data_for_longest_session(ROWS, quarantine=quarantine)
+    assert len(user_analytics) == len(longest_session) == 2
+    assert quarantine.summary() == {
+        "rows": 12, "accepted": 4, "rejected": 8, "error_ratio": 8 / 12,
+        "reasons": {"empty_user": 2, "unknown_event_type": 2, "bad_timestamp": 2, "malformed_row": 2},
+        "quarantine_path": path,
+    }
+
+    with open(path, newline="") as file:
+        rejected = list(csv.DictReader(file))
+    assert [row["reason"] for row in rejected[:4]] == ["empty_user", "unknown_event_type", "bad_timestamp",
+                                                        "malformed_row"]
+    assert rejected[2]["event_time"] == "INVALID_TIMESTAMP"
+
+    out = capsys.readouterr().out
+    assert out.count("Skipping invalid row") == 1
+    assert "Skipped 8 invalid rows" in out and "7 not printed" in out
+
+
+def test_strict_mode_fails_fast(write_csv):
+    file_path = write_csv(["123,GATE_IN,2023-01-31T08:00:00.000Z"] * 90 + ["123,GATE_IN,bad"] * 1000, "dirty.csv")
+
+    quarantine = Quarantine(strict=True, max_error_ratio=0.05, min_rows=100, sample_limit=0)
+    with pytest.raises(QuarantineError, match="rejected"):
+        EventStore.from_csv(file_path, quarantine=quarantine)
+    assert quarantine.rejected == 10  # Stopped at the first check, after 100 rows, not at the end of the file
+
+    lenient = Quarantine(strict=True, max_error_ratio=0.95, sample_limit=0)
+    assert len(EventStore.from_csv(file_path, quarantine=lenient)) == 90
+    assert lenient.close()["rejected"] == 1000
+
+
+def dirty_rows(rows=200):
+    """Lines of a log in which every fifth row has a bad timestamp."""
+    return [f"{i % 7},GATE_IN,2023-01-31T08:00:00.000Z" if i % 5 else f"{i},GATE_IN,bad-{i}" for i in range(rows)]
+
+
+def test_parallel_workers_report_to_the_callers_quarantine(tmp_path, write_csv):
+    file_path = write_csv(dirty_rows(), "dirty.csv")
+
+    serial = Quarantine(tmp_path / "serial.csv", sample_limit=0)
+    EventStore.from_csv(file_path, quarantine=serial)
+    serial.close()
+    parallel = Quarantine(tmp_path / "parallel.csv", sample_limit=0)
+    store, report = read_csv_parallel(file_path, workers=2, chunk_bytes=500, quarantine=parallel)
+    parallel.close()
+    assert report["chunks"] > 1 and len(store) == 160
+    assert parallel.summary()["reasons"] == serial.summary()["reasons"] == {
+        "empty_user": 0, "unknown_event_type": 0, "bad_timestamp": 40, "malformed_row": 0}
+    assert (tmp_path / "parallel.csv").read_text() == (tmp_path / "serial.csv").read_text()
+
+    strict = Quarantine(strict=True, max_error_ratio=0.05, min_rows=50, sample_limit=0)
+    with pytest.raises(QuarantineError):
+        read_csv_parallel(file_path, workers=2, chunk_bytes=500, quarantine=strict)
+
+
+def test_cached_events_replay_their_rejections(tmp_path, write_csv):
+    file_path = write_csv(dirty_rows(), "dirty.csv")
+    cache = ArtifactCache(tmp_path / "cache")
+    Pipeline(file_path, cache=cache, engine="python").analytics()  # Lenient run fills the cache
+
+    quarantine = Quarantine(tmp_path / "rejected.csv", sample_limit=0)
+    rerun = Pipeline(file_path, cache=cache, engine="python", quarantine=quarantine)
+    rerun.analytics()
+    assert rerun.computed == [] and quarantine.close()["rejected"] == 40
+    assert len((tmp_path / "rejected.csv").read_text().splitlines()) == 41
+
+    strict = Quarantine(strict=True, min_rows=50, sample_limit=0)
+    with pytest.raises(QuarantineError):
+        Pipeline(file_path, cache=cache, engine="python", quarantine=strict).analytics()
+
+
+def test_quarantine_file_matches_the_current_run(tmp_path, write_csv):
+    dirty = write_csv(dirty_rows(10), "dirty.csv")
+    path = tmp_path / "rejected.csv"
+    with Quarantine(path, sample_limit=0) as quarantine:
+        EventStore.from_csv(dirty, quarantine=quarantine)
+    with open(path, newline="") as file:
+        rejected = list(csv.DictReader(file))
+    assert rejected[0]["raw"] == "0,GATE_IN,bad-0"  # The line as read, for replaying
+    assert list(csv.reader([rejected[1]["raw"]])) == [["5", "GATE_IN", "bad-5"]]
+
+    clean = write_csv(["123,GATE_IN,2023-01-31T08:00:00.000Z"], "clean.csv")
+    with Quarantine(path, sample_limit=0) as quarantine:
+        EventStore.from_csv(clean, quarantine=quarantine)
+    assert path.read_text().splitlines() == [",".join(QUARANTINE_FIELDS)]  # No stale rows from the dirty run
+    assert [item.name for item in tmp_path.iterdir() if ".tmp-" in item.name] == []
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+
+import pytest
+from src.analytics import calculate_time_and_days
+from src.event_store import EventStore
+from src.pipeline import ArtifactCache, Pipeline
+from src.rollup import DailyRollup
+from tests.conftest import event
+
+
+EVENTS = [
+    event("123", "GATE_IN", datetime(2023, 1, 30, 8, 0)),
+    event("123", "GATE_OUT", datetime(2023, 1, 30, 12, 0)),
+    event("123", "GATE_IN", datetime(2023, 1, 30, 13, 0)),
+    event("123", "GATE_OUT", datetime(2023, 1, 30, 17, 0)),
+    event("456", "GATE_IN", datetime(2023, 1, 31, 9, 0)),
+    event("456", "GATE_OUT", datetime(2023, 1, 31, 15, 0)),
+    event("123", "GATE_IN", datetime(2023, 2, 1, 9, 0)),
+    event("123", "GATE_OUT", datetime(2023, 2, 1, 11, 0)),
+    event("789", "GATE_OUT", datetime(2023, 2, 1, 11, 0)),  # Never paired
+]
+
+
+@pytest.fixture
+def rollup():
+    return DailyRollup.from_store(EventStore.from_events(EVENTS))
+
+
+def test_rollup_rows(rollup):
+    assert len(rollup) == 3
+    assert rollup.user_days("123") == [
+        {"date": date(2023, 1, 30), "hours": 8.0, "sessions": 2,
+         "first_in": datetime(2023, 1, 30, 8, 0), "last_out": datetime(2023, 1, 30, 17, 0)},
+        {"date": date(2023, 2, 1), "hours": 2.0, "sessions": 1,
+         "first_in": datetime(2023, 2, 1, 9, 0), "last_out": datetime(2023, 2, 1, 11, 0)},
+    ]
+    assert rollup.user_days("123", start="2023-02-01") == rollup.user_days("123")[1:]
+    assert rollup.user_days("unknown") == []
+
+
+def test_full_range_matches_analytics(rollup):
+    expected = [row for row in calculate_time_and_days(EVENTS) if row["days"]]
+    assert rollup.query() == expected
+
+
+def test_date_range_query(rollup):
+    assert rollup.query("2023-01-31", date(2023, 2, 1)) == [
+        {"user_id": "456", "time": 6.0, "days": 1, "average_per_day": 6.0, "rank": 1},
+        {"user_id": "123", "time": 2.0, "days": 1, "average_per_day": 2.0, "rank": 2},
+    ]
+    assert rollup.query("2023-03-01", "2023-03-31") == []
+    assert rollup.query("2023-01-31", "2023-02-01", limit=1) == rollup.query("2023-01-31", "2023-02-01")[:1]
+
+
+def test_rollup_stage_is_cached(tmp_path, write_csv):
+    file_path = write_csv(["123,GATE_IN,2023-01-30T08:00:00.000Z", "123,GATE_OUT,2023-01-30T12:00:00.000Z"])
+    cache = ArtifactCache(tmp_path / "cache")
+    expected = Pipeline(file_path, cache=cache).rollup().query()
+
+    rerun = Pipeline(file_path, cache=cache)
+    assert rerun.rollup().query() == expected
+    assert rerun.computed == []
@@ -0,0 +1,88 @@
+import csv
+import gzip
+import json
+
+import pytest
+from src.sinks import by_field, by_shard, read_columnar, write_rows
+
+ROWS = [
+    {"user_id": "123", "date": "2023-01-30", "hours": 4.5, "rank": 2},
+    {"user_id": "456", "date": "2023-01-31", "hours": 8.25, "rank": 1},
+    {"user_id": "789", "date": "2023-02-01", "hours": 2.0, "rank": 3},
+]
+FIELDS = ["user_id", "date", "hours", "rank"]
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    path = tmp_path / "report.csv"
+    write_rows(path, iter(ROWS), FIELDS)
+
+    def broken_rows():
+        yield ROWS[0]
+        raise RuntimeError("crashed mid-write")
+
+    with pytest.raises(RuntimeError):
+        write_rows(path, broken_rows(), FIELDS)
+    with open(path, newline="") as file:
+        assert [row["user_id"] for row in csv.DictReader(file)] == ["123", "456", "789"]
+    assert [item.name for item in tmp_path.iterdir()] == ["report.csv"]  # No temporary file left behind
+
+
+def test_gzip_csv_and_json_lines(tmp_path):
+    rows = ({"user_id": row["user_id"], "hours": row["hours"]} for row in ROWS)
+    assert write_rows(tmp_path / "report.csv.gz", rows, ["user_id", "hours"]) == 3
+    with gzip.open(tmp_path / "report.csv.gz", "rt", newline="") as file:
+        assert list(csv.DictReader(file))[1] == {"user_id": "456", "hours": "8.25"}
+    with pytest.raises(ValueError, match="fields not in fieldnames"):  # Like csv.DictWriter, not silently dropped
+        write_rows(tmp_path / "report.csv.gz", ROWS, ["user_id", "hours"])
+
+    write_rows(tmp_path / "report.jsonl", ROWS)
+    with open(tmp_path / "report.jsonl") as file:
+        assert [json.loads(line) for line in file] == ROWS
+    with pytest.raises(ValueError, match="fields not in fieldnames"):
+        write_rows(tmp_path / "report.jsonl", ROWS, ["user_id", "hours"])
+
+
+def test_columnar_keeps_dtypes(tmp_path):
+    write_rows(tmp_path / "report.npz", iter(ROWS), FIELDS, compress=True)
+    columns = read_columnar(tmp_path / "report.npz")
+    assert list(columns) == FIELDS
+    assert columns["user_id"].tolist() == ["123", "456", "789"]
+    assert columns["hours"].dtype.kind == "f" and columns["rank"].tolist() == [2, 1, 3]
+
+    # Columnar files are deflated inside the .npz and never get a .gz suffix
+    with pytest.raises(ValueError, match="not gzipped"):
+        write_rows(tmp_path / "report.npz.gz", ROWS, FIELDS)
+    with pytest.raises(ValueError, match="fields not in fieldnames"):
+        write_rows(tmp_path / "report.npz", ROWS, ["user_id", "hours"])
+    with pytest.raises(ValueError, match="fields not in fieldnames"):
+        write_rows(tmp_path / "report.npz", [ROWS[0], {**ROWS[1], "extra": 1}])
+
+
+def test_partitioned_output_with_manifest(tmp_path):
+    path = tmp_path / "report.csv"
+    assert write_rows(path, ROWS, FIELDS, partition_by=by_field("date", lambda day: day[:7])) == 3
+    manifest = json.loads((tmp_path / "report" / "_manifest.json").read_text())
+    assert manifest["rows"] == 3
+    assert [(part["path"], part["rows"]) for part in manifest["partitions"]] == \
+        [("date=2023-01.csv", 2), ("date=2023-02.csv", 1)]
+
+    write_rows(tmp_path / "sharded.jsonl.gz", ROWS, partition_by=by_shard("user_id", 2))
+    parts = sorted(item.name for item in (tmp_path / "sharded").iterdir())
+    assert parts[0] == "_manifest.json" and all(name.endswith(".jsonl.gz") for name in parts[1:])
+
+
+def test_partitions_reopen_past_the_open_file_cap_and_replace_stale_files(tmp_path):
+    path = tmp_path / "report.csv.gz"
+    rows = [{"user_id": str(i), "date": "2023-01-30", "hours": i, "rank": i} for i in range(60)]
+    # 20 partitions through 3 open files: every partition is closed and reopened twice
+    assert write_rows(path, rows, FIELDS, partition_by=lambda row: f"p{int(row['user_id']) % 20:02d}",
+                      max_open=3) == 60
+    with gzip.open(tmp_path / "report" / "p07.csv.gz", "rt", newline="") as file:  # Three gzip members
+        assert [row["user_id"] for row in csv.DictReader(file)] == ["7", "27", "47"]
+
+    write_rows(path, ROWS, FIELDS, partition_by=by_shard("user_id", 2))
+    parts = sorted(item.name for item in (tmp_path / "report").iterdir())
+    manifest = json.loads((tmp_path / "report" / "_manifest.json").read_text())
+    assert parts == sorted(["_manifest.json"] + [part["path"] for part in manifest["partitions"]])
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["report"]  # No staging directory left behind
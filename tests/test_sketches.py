@@ -0,0 +1,114 @@
+import csv
+import random
+from bisect import bisect_right
+
+import pytest
+from src.analytics import calculate_longest_session, calculate_time_and_days
+from src.data_process import iter_events
+from src.sketches import CountMinSketch, HyperLogLog, KLLSketch, SketchAnalytics, TopN, approximate_analytics, \
+    site_summaries
+from src.synthetic import iter_gate_log
+
+
+def rank_error(values, estimate, fraction):
+    """Distance between the rank of an estimated quantile and the requested one, as a fraction."""
+    values = sorted(values)
+    return abs(bisect_right(values, estimate) / len(values) - fraction)
+
+
+def test_hyperloglog_error_bound():
+    sketch, other = HyperLogLog(12), HyperLogLog(12)
+    for key in range(50_000):
+        (sketch if key % 2 else other).add(f"user-{key}")
+    assert abs(sketch.count() - 25_000) / 25_000 < 3 * 0.0163  # Three standard errors
+    assert abs(sketch.merge(other).count() - 50_000) / 50_000 < 3 * 0.0163
+
+    small = HyperLogLog()
+    for key in ["a", "b", "c", "a"]:
+        small.add(key)
+    assert small.count() == 3
+
+
+def test_kll_rank_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0, 1) for _ in range(100_000)]
+    first, second = KLLSketch(200), KLLSketch(200, seed=1)
+    for index, value in enumerate(values):
+        (first if index % 3 else second).add(value)
+    merged = first.merge(second)
+    assert merged.count == len(values)
+    assert sum(len(compactor) for compactor in merged.compactors) < 1000
+    for fraction in (0.01, 0.25, 0.5, 0.9, 0.99):
+        assert rank_error(values, merged.quantile(fraction), fraction) < 0.0165
+    assert (merged.quantile(0), merged.quantile(1)) == (min(values), max(values))
+
+
+def test_count_min_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    counts = {f"key-{key}": key % 7 + 1 for key in range(500)}
+    for key, count in counts.items():
+        sketch.add(key, count)
+    assert all(sketch.estimate(key) >= count for key, count in counts.items())
+    assert sketch.add_max("key-1", 1000) == 1000
+
+
+def test_top_n():
+    top = TopN(2)
+    for key, score in [("a", 1), ("b", 5), ("c", 3), ("a", 4), ("d", 2), ("a", 6)]:
+        top.offer(key, score)
+    assert top.items() == [("a", 6), ("b", 5)]
+    with pytest.raises(ValueError):
+        TopN(0)
+
+
+@pytest.fixture(scope="module")
+def events():
+    return list(iter_events(csv.DictReader(iter_gate_log(users=300, days=20, seed=5))))
+
+
+def test_approximate_matches_exact_within_bounds(events):
+    summary = approximate_analytics(events, top_n=5)
+    exact = calculate_time_and_days(events)
+    present = [row for row in exact if row["days"]]
+
+    assert summary["events"] == len(events)
+    assert abs(summary["distinct_users"] - len(exact)) / len(exact) < 0.05
+    user_days = sum(row["days"] for row in present)
+    assert abs(summary["user_days"] - user_days) / user_days < 0.05
+    assert summary["total_hours"] == pytest.approx(sum(row["time"] for row in present), abs=0.01 * len(present))
+    assert summary["longest_sessions"] == calculate_longest_session(events)[:5]
+
+
+def test_approximate_percentiles(events):
+    summary = approximate_analytics(events, k=100)
+    sessions, open_in = [], {}
+    for event in events:
+        if event["event_type"] == "GATE_IN":
+            open_in[event["user_id"]] = event["event_time"]
+        elif event["user_id"] in open_in:
+            start = open_in.pop(event["user_id"])
+            sessions.append((event["event_time"] - start).total_seconds() / 3600)
+    for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        assert rank_error(sessions, summary["session_hours"][name], fraction) < 0.033  # 1.65% x 200 / k
+
+
+def test_site_sketches_merge_into_fleet(events):
+    users = sorted({event["user_id"] for event in events})
+    site_of = {user_id: index % 3 for index, user_id in enumerate(users)}
+    sites = {f"site-{index}": SketchAnalytics(top_n=5) for index in range(3)}
+    for event in events:
+        sites[f"site-{site_of[event['user_id']]}"].add(event["user_id"], event["event_type"], event["event_time"])
+    summary = site_summaries(sites)
+
+    whole = approximate_analytics(events, top_n=5)
+    assert summary["fleet"]["events"] == whole["events"]
+    assert summary["fleet"]["total_hours"] == pytest.approx(whole["total_hours"], abs=0.05)
+    assert summary["fleet"]["longest_sessions"] == whole["longest_sessions"]
+    assert abs(summary["fleet"]["distinct_users"] - len(users)) / len(users) < 0.05
+    assert sum(site["distinct_users"] for site in summary["sites"].values()) == pytest.approx(len(users), rel=0.05)
+
+
+def test_user_state_is_bounded(events):
+    sketches = SketchAnalytics(max_users=50).update(events)
+    assert len(sketches.user_state) == 50
+    assert sketches.summary()["events"] == len(events)
@@ -0,0 +1,42 @@
+import pytest
+from src.data_process import load_csv, clean_data_for_user_analytics
+from src.synthetic import iter_gate_log, options_for_events, write_gate_log
+
+
+def test_gate_log_is_deterministic():
+    options = dict(users=5, days=3, malformed_rate=0.1, out_of_order_rate=0.2, seed=7)
+    assert list(iter_gate_log(**options)) == list(iter_gate_log(**options))
+    assert list(iter_gate_log(**options)) != list(iter_gate_log(**dict(options, seed=8)))
+
+
+def test_gate_log_shape(tmp_path):
+    file_path = tmp_path / "log.csv"
+    rows = write_gate_log(file_path, users=20, days=7, sessions_per_day=3, lowercase_rate=0.5, seed=1)
+    data = load_csv(file_path)
+
+    assert len(data) == rows
+    assert {row["event_type"] for row in data} == {"GATE_IN", "GATE_OUT", "gate_in", "gate_out"}
+    # Clean logs only hold complete IN/OUT pairs, in chronological order
+    cleaned = clean_data_for_user_analytics(data)
+    assert len(cleaned) == rows
+    assert sum(row["event_type"] == "GATE_IN" for row in cleaned) == rows // 2
+    times = [row["event_time"] for row in cleaned]
+    assert times == sorted(times)
+
+
+def test_gate_log_malformed_rows(tmp_path, capsys):
+    file_path = tmp_path / "log.csv.gz"
+    rows = write_gate_log(file_path, users=50, days=5, malformed_rate=0.2, seed=3)
+    cleaned = clean_data_for_user_analytics(load_csv(file_path))
+
+    skipped = rows - len(cleaned)
+    assert 0.1 * rows < skipped < 0.3 * rows
+    out = capsys.readouterr().out
+    assert out.count("Skipping invalid row") == 5  # A rate-limited sample
+    assert f"Skipped {skipped} invalid rows" in out
+
+
+def test_options_for_events():
+    options = options_for_events(10_000, days=10, seed=2)
+    rows = sum(1 for _ in iter_gate_log(**options)) - 1
+    assert rows == pytest.approx(10_000, rel=0.15)
@@ -0,0 +1,36 @@
+import pytest
+from datetime import datetime
+from src.timestamps import TIMESTAMP_FORMAT, parse_timestamp, to_epoch_micros, from_epoch_micros
+
+
+def test_parse_timestamp_fixed_width():
+    assert parse_timestamp("2023-01-31T08:18:36.000Z") == datetime(2023, 1, 31, 8, 18, 36)
+    assert parse_timestamp("2023-01-31T08:18:36.123456Z") == datetime(2023, 1, 31, 8, 18, 36, 123456)
+    assert parse_timestamp("2023-01-31T08:18:36.5Z") == datetime(2023, 1, 31, 8, 18, 36, 500000)
+
+
+def test_parse_timestamp_as_micros():
+    micros = parse_timestamp("2023-01-31T08:18:36.250Z", as_micros=True)
+    assert micros == to_epoch_micros(datetime(2023, 1, 31, 8, 18, 36, 250000))
+    assert from_epoch_micros(micros) == datetime(2023, 1, 31, 8, 18, 36, 250000)
+    assert parse_timestamp("1970-01-01T00:00:00.000Z", as_micros=True) == 0
+
+
+@pytest.mark.parametrize("value", [
+    "2023-1-31T08:18:36.000Z",   # Non-padded month, accepted by strptime
+    "2023-01-31t08:18:36.000z",  # Lower-case separators, accepted by strptime
+    "2023-02-30T08:18:36.000Z",  # Invalid calendar date
+    "2023-01-31T24:00:00.000Z",
+    "2023-01-31T08:+1:36.000Z",
+    "2023-01-31T08:18:36Z",
+    "INVALID_TIMESTAMP",
+    "",
+])
+def test_parse_timestamp_matches_strptime(value):
+    try:
+        expected = datetime.strptime(value, TIMESTAMP_FORMAT)
+    except ValueError:
+        with pytest.raises(ValueError):
+            parse_timestamp(value)
+    else:
+        assert parse_timestamp(value) == expected
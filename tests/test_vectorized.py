@@ -0,0 +1,49 @@
+import pytest
+from datetime import datetime
+from src.analytics import calculate_time_and_days, calculate_longest_session, calculate_analytics
+from src.event_store import EventStore
+
+
+@pytest.fixture
+def events():
+    # Interleaved users, a double IN, an unmatched OUT and a break just over two hours
+    return [
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 7, 0)},
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 8, 0)},
+        {"user_id": "456", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 8, 30)},
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 9, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 12, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 12, 5)},
+        {"user_id": "456", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 11, 0)},
+        {"user_id": "123", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 14, 0)},
+        {"user_id": "123", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 18, 0)},
+        {"user_id": "456", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 1, 13, 0, 1)},
+        {"user_id": "456", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 1, 16, 0)},
+        {"user_id": "789", "event_type": "GATE_OUT", "event_time": datetime(2023, 1, 2, 9, 0)},
+        {"user_id": "456", "event_type": "GATE_IN", "event_time": datetime(2023, 1, 2, 9, 0)},
+    ]
+
+
+def test_numpy_engine_matches_reference(events):
+    assert calculate_time_and_days(events, engine="numpy") == calculate_time_and_days(events)
+    assert calculate_longest_session(events, engine="numpy") == calculate_longest_session(events)
+    assert calculate_longest_session(events, engine="numpy") == [
+        {"user_id": "123", "session_length": 9.0},  # 9:00-12:00 + 14:00-18:00, the 8:00 IN is replaced
+        {"user_id": "456", "session_length": 10799 / 3600},  # 13:00:01-16:00, not merged with 8:30-11:00
+        {"user_id": "789", "session_length": 0},
+    ]
+
+
+def test_numpy_engine_on_store(events):
+    store = EventStore.from_events(events)
+    assert calculate_analytics(store, engine="numpy") == calculate_analytics(events)
+
+
+def test_numpy_engine_no_events():
+    assert calculate_time_and_days([], engine="numpy") == []
+    assert calculate_longest_session([], engine="numpy") == []
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Unknown analytics engine"):
+        calculate_time_and_days([], engine="fortran")